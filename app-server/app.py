@@ -11,12 +11,13 @@ from backend.routes.delete_comment import delete_comment_bp
 from backend.routes.load_comments import load_comment_bp
 from backend.routes.admin import admin_bp
 from backend.routes.moderation import moderation_bp
+from backend.commands import register_commands
+from backend.image_utils import register_template_filters
 # from backend.limiter import init_limiter
 from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv 
 from models import db
-from managers.authentication_manager import bcrypt
 import firebase_admin
 from firebase_admin import credentials, storage, _DEFAULT_APP_NAME
 from flask_wtf import CSRFProtect
@@ -57,7 +58,6 @@ def create_app(test_config=None):
     }
 
     db.init_app(app)
-    bcrypt.init_app(app)
     if not IS_TESTING:
         csrf.init_app(app)
         if FILE_LOCATION and BUCKET:
@@ -83,6 +83,8 @@ def create_app(test_config=None):
     app.register_blueprint(load_comment_bp, url_prefix='/load_comments')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(moderation_bp, url_prefix='/moderation')
+    register_commands(app)
+    register_template_filters(app)
     storage_uri = "redis://10.20.0.5:6379" if IS_TESTING else None
     # init_limiter(app, storage_uri=storage_uri)
     return app
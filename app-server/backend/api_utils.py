@@ -0,0 +1,125 @@
+import os
+from datetime import datetime
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import text
+from models import db
+from backend.cursor_utils import encode_cursor, decode_cursor
+
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '500'))
+# Rows fetched from the server-side cursor at a time while streaming NDJSON
+API_STREAM_BATCH_SIZE = int(os.environ.get('API_STREAM_BATCH_SIZE', '500'))
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+class Listing:
+    """
+    Keyset-paginated listing of a table for the JSON API. fields maps each API field name to the SQL
+    expression that selects it; rows are ordered by (time_column, id_column) and converters post-process
+    values such as 0/1 flags.
+    """
+    def __init__(self, table, fields, time_column, id_column, descending=True, converters=None):
+        self.table = table
+        self.fields = fields
+        self.time_column = time_column
+        self.id_column = id_column
+        self.descending = descending
+        self.converters = converters or {}
+
+    def parse_fields(self, value):
+        """The fields listed in ?fields=, or all of them; ValueError for unknown names"""
+        if not value:
+            return list(self.fields)
+        requested = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in self.fields]
+        if unknown or not requested:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested")
+        return requested
+
+    def _statement(self, fields, where, cursor, limit):
+        # The keyset columns are always selected so the next cursor can be built from the last row
+        columns = [f"{self.time_column} AS _cursor_time", f"{self.id_column} AS _cursor_id"]
+        columns += [f"{self.fields[name]} AS `{name}`" for name in fields]
+        conditions = [where] if where else []
+        if cursor:
+            op = '<' if self.descending else '>'
+            conditions.append(f"""({self.time_column} {op} :cursor_time
+                OR ({self.time_column} = :cursor_time AND {self.id_column} {op} :cursor_id))""")
+        direction = 'DESC' if self.descending else 'ASC'
+        return text(f"""
+            SELECT {', '.join(columns)}
+            FROM {self.table}
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY {self.time_column} {direction}, {self.id_column} {direction}
+            {'LIMIT :limit' if limit is not None else ''}
+        """)
+
+    def _params(self, params, cursor, limit):
+        params = dict(params or {})
+        if cursor:
+            params['cursor_time'], params['cursor_id'] = cursor
+        if limit is not None:
+            params['limit'] = limit
+        return params
+
+    def _cursor(self, row):
+        timestamp = row._cursor_time
+        if isinstance(timestamp, str):
+            # SQLite hands DATETIME columns back as strings from raw SQL
+            timestamp = datetime.fromisoformat(timestamp)
+        return encode_cursor(timestamp, row._cursor_id)
+
+    def _item(self, row, fields):
+        mapping = row._mapping
+        return {name: self.converters.get(name, lambda value: value)(mapping[name]) for name in fields}
+
+    def page(self, fields, where='', params=None, cursor=None, limit=API_PAGE_SIZE):
+        """Returns (items, next_cursor); next_cursor is None on the last page"""
+        rows = db.session.execute(self._statement(fields, where, cursor, limit + 1),
+                                  self._params(params, cursor, limit + 1)).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._cursor(rows[-1])
+        return [self._item(row, fields) for row in rows], next_cursor
+
+    def stream(self, fields, where='', params=None, cursor=None, limit=None):
+        """
+        NDJSON response with one object per row, read from a server-side cursor in API_STREAM_BATCH_SIZE
+        batches so memory use doesn't grow with the table. Each object carries its "cursor" for resuming.
+        """
+        statement = self._statement(fields, where, cursor, limit)
+        params = self._params(params, cursor, limit)
+
+        def generate():
+            result = db.session.execute(statement, params, execution_options={'yield_per': API_STREAM_BATCH_SIZE})
+            try:
+                for row in result:
+                    item = self._item(row, fields)
+                    item['cursor'] = self._cursor(row)
+                    yield current_app.json.dumps(item) + '\n'
+            finally:
+                result.close()
+
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def wants_ndjson():
+    """Whether the request asked for a streamed NDJSON response (?format=ndjson or the Accept header)"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def listing_args(streaming=False):
+    """
+    (fields value, cursor position, limit) from the query string; ValueError for a bad cursor or limit.
+    Pages default to API_PAGE_SIZE rows and are capped at API_MAX_PAGE_SIZE; streams are unlimited by default.
+    """
+    cursor = request.args.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+    if cursor and (position is None or position[0] is None):
+        raise ValueError("Invalid cursor")
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+    if not streaming:
+        limit = min(limit or API_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    return request.args.get('fields'), position, limit
@@ -0,0 +1,77 @@
+import hashlib
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from models import db, StoredImage
+from backend.storage_utils import get_storage
+from backend.image_utils import variant_keys
+
+HASH_CHUNK_BYTES = 64 * 1024
+
+def content_hash(file):
+    """SHA-256 of an uploaded file, read in chunks; the file is rewound afterwards"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+def acquire_image(key):
+    """Take a reference to a content-addressed image; returns True if it is already stored and needn't be written"""
+    for _ in range(2):
+        updated = db.session.execute(
+            text("UPDATE stored_image SET refCount = refCount + 1 WHERE imageKey = :key"), {"key": key}
+        ).rowcount
+        if updated:
+            stored = db.session.execute(
+                text("SELECT stored FROM stored_image WHERE imageKey = :key"), {"key": key}
+            ).scalar()
+            db.session.commit()
+            return bool(stored)
+        try:
+            db.session.add(StoredImage(imageKey=key, refCount=1, stored=False))
+            db.session.commit()
+            return False
+        except IntegrityError:
+            # A concurrent upload of the same content inserted the row first; count this one against it
+            db.session.rollback()
+    raise RuntimeError(f"Could not take a reference to {key}")
+
+def mark_image_stored(key):
+    """Record that the image and its variants have been written, so later duplicates skip the upload"""
+    db.session.execute(text("UPDATE stored_image SET stored = :stored WHERE imageKey = :key"), {"stored": True, "key": key})
+    db.session.commit()
+
+def release_image(key, storage=None):
+    """
+    Drop one reference to an image; the last one deletes it and its variants from storage.
+    Images uploaded before deduplication have no row and are deleted straight away.
+    Returns True if the image was deleted.
+    """
+    storage = storage or get_storage()
+    # The row stays locked until the objects are gone, so a concurrent duplicate can't reuse them meanwhile
+    image = db.session.query(StoredImage).filter_by(imageKey=key).with_for_update().first()
+    if image is not None and image.refCount > 1:
+        image.refCount -= 1
+        db.session.commit()
+        return False
+    for object_key in [key] + variant_keys(key):
+        try:
+            storage.delete(object_key)
+        except Exception as e:
+            print(f"Error deleting {object_key} from storage: {e}")
+    if image is not None:
+        db.session.delete(image)
+    db.session.commit()
+    return True
+
+def release_image_url(url):
+    """release_image for the URL stored on a post or profile; URLs outside our storage are ignored"""
+    try:
+        key = get_storage().key_from_url(url)
+        if key:
+            return release_image(key)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error releasing image {url}: {e}")
+    return False
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from backend.redis_utils import get_redis_client
+
+CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', '300'))  # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))  # per cache, per process
+# Set CACHE_REDIS_ENABLED to false to keep caches process-local even when REDIS_URL is set
+CACHE_REDIS_ENABLED = os.getenv("CACHE_REDIS_ENABLED", "true").lower() == "true"
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+# Identifies this process so it ignores its own invalidation messages
+_PROCESS_ID = uuid.uuid4().hex
+
+class LocalCache:
+    """Bounded in-process LRU cache where every entry expires after ttl seconds"""
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at), least recently used first
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (found, value)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class TieredCache:
+    """
+    Named cache with a local LRU+TTL tier and an optional shared Redis tier.
+    Values must be JSON serializable. Deletes are broadcast so other processes drop their local copy.
+    """
+    def __init__(self, name, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_DEFAULT_TTL, use_redis=CACHE_REDIS_ENABLED):
+        self.name = name
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.local = LocalCache(max_entries, ttl)
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis(self):
+        if not self.use_redis:
+            return None
+        client = get_redis_client()
+        if client is not None:
+            _start_invalidation_listener(client)
+        return client
+
+    def _redis_key(self, key):
+        return f'cache:{self.name}:{key}'
+
+    def get(self, key):
+        """Returns (found, value)"""
+        found, value = self.local.get(key)
+        if found:
+            self.hits += 1
+            return True, value
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = client.get(self._redis_key(key))
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.local.set(key, value)
+                    self.hits += 1
+                    self.redis_hits += 1
+                    return True, value
+            except Exception as e:
+                print(f"Error reading cache {self.name} from Redis: {e}")
+        self.misses += 1
+        return False, None
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        client = self._redis()
+        if client is not None:
+            try:
+                client.setex(self._redis_key(key), self.ttl, json.dumps(value))
+            except Exception as e:
+                print(f"Error writing cache {self.name} to Redis: {e}")
+
+    def delete(self, key):
+        """Drop the key here, in Redis, and in every other process' local tier"""
+        self.local.delete(key)
+        client = self._redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(self._redis_key(key))
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps({'origin': _PROCESS_ID, 'cache': self.name, 'key': key}))
+                pipe.execute()
+            except Exception as e:
+                print(f"Error invalidating cache {self.name} in Redis: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': len(self.local),
+            'max_entries': self.local.max_entries,
+            'hits': self.hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'evictions': self.local.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+_listener_started = False
+_listener_lock = threading.Lock()
+
+def _start_invalidation_listener(client):
+    """Start (once per process) a daemon thread applying other processes' invalidations to the local tiers"""
+    global _listener_started
+    if _listener_started:
+        return
+    with _listener_lock:
+        if _listener_started:
+            return
+        _listener_started = True
+        threading.Thread(target=_listen_for_invalidations, args=(client,), name='cache-invalidation', daemon=True).start()
+
+def _listen_for_invalidations(client):
+    while True:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                # Poll instead of listen() so the client's short socket timeout doesn't end the subscription
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                data = json.loads(message['data'])
+                cache = _caches.get(data.get('cache'))
+                if cache is not None and data.get('origin') != _PROCESS_ID:
+                    cache.local.delete(data.get('key'))
+        except Exception as e:
+            print(f"Cache invalidation listener error, resubscribing: {e}")
+            time.sleep(5)
+
+def get_cache(name, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_DEFAULT_TTL):
+    """Returns the process-wide cache with this name, creating it on first use"""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TieredCache(name, max_entries, ttl)
+        return _caches[name]
+
+def get_cache_stats():
+    """Hit/miss counters for every cache in this process"""
+    return [cache.stats() for cache in _caches.values()]
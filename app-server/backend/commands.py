@@ -0,0 +1,100 @@
+import click
+from backend.redis_utils import get_redis_client
+
+def register_commands(app):
+    """Registers maintenance commands, run with `flask --app app <command>`"""
+
+    @app.cli.command('rebuild-timelines')
+    def rebuild_timelines():
+        """Rebuild the precomputed home timelines from the database."""
+        from managers import get_feed_manager
+        if get_redis_client() is None:
+            click.echo("REDIS_URL is not set or unreachable; with TIMELINE_LOCAL_FALLBACK the in-process store warms itself on first use.")
+            return
+        stats = get_feed_manager().rebuild_timelines()
+        click.echo(f"Rebuilt timelines for {stats['users']} users ({stats['authors']} authors with posts)")
+
+    @app.cli.command('ensure-feed-indexes')
+    def ensure_feed_indexes():
+        """Create the post index used by keyset pagination of the feed and /api/posts."""
+        from managers import get_feed_manager
+        created = get_feed_manager().ensure_feed_indexes()
+        click.echo(f"Created indexes: {', '.join(created)}" if created else "All feed indexes already exist")
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters():
+        """Recompute post/follower/following counters and fix rows that have drifted."""
+        from backend.counter_utils import reconcile_user_counters
+        from managers import get_profile_manager
+        fixed = reconcile_user_counters()
+        profile_manager = get_profile_manager()
+        for user_id in fixed:
+            profile_manager._clear_user_cache(user_id)
+        click.echo(f"Reconciled counters for {len(fixed)} users")
+
+    @app.cli.command('ensure-like-constraints')
+    def ensure_like_constraints():
+        """Deduplicate post_likes and add the unique key needed by ATOMIC_LIKES."""
+        from managers import get_post_manager
+        result = get_post_manager().ensure_like_constraint()
+        if not result['success']:
+            click.echo(result['error'])
+            return
+        click.echo(f"{result['message']} ({result['duplicates_removed']} duplicate likes removed)")
+
+    @app.cli.command('ensure-log-indexes')
+    def ensure_log_indexes():
+        """Create the composite indexes used by the moderation application log."""
+        from managers import get_moderator_manager
+        created = get_moderator_manager().ensure_application_log_indexes()
+        click.echo(f"Created indexes: {', '.join(created)}" if created else "All application_log indexes already exist")
+
+    @app.cli.command('ensure-search-indexes')
+    def ensure_search_indexes():
+        """Create the ngram FULLTEXT indexes used by user and post search."""
+        from backend.search_utils import ensure_search_indexes
+        created = ensure_search_indexes()
+        click.echo(f"Created indexes: {', '.join(created)}" if created else "All search indexes already exist")
+
+    @app.cli.command('ensure-comment-schema')
+    def ensure_comment_schema():
+        """Add the commentType column, retype old __LIKE__ marker comments and create the comment thread index."""
+        from backend.comment_utils import ensure_comment_schema
+        added, retyped, indexed = ensure_comment_schema()
+        click.echo(f"commentType column {'added' if added else 'already present'}; {retyped} like markers retyped; "
+                   f"thread index {'created' if indexed else 'already present'}")
+
+    @app.cli.command('build-typeahead-snapshot')
+    def build_typeahead_snapshot():
+        """Rebuild the username autocomplete snapshot that worker processes load at startup."""
+        from backend.typeahead_utils import get_username_typeahead
+        typeahead = get_username_typeahead()
+        trie, _ = typeahead.build(get_redis_client())
+        click.echo(f"Wrote {len(trie)} usernames to {typeahead.snapshot_path}")
+
+    @app.cli.command('archive-logs')
+    @click.option('--days', default=None, type=int, help='Keep this many days in application_log (default LOG_RETENTION_DAYS).')
+    def archive_logs(days):
+        """Move old application_log rows into gzip JSON-lines archives, one file per day."""
+        from backend.log_archive import archive_application_log, LOG_RETENTION_DAYS, LOG_ARCHIVE_DIR
+        days = LOG_RETENTION_DAYS if days is None else days
+        archived = archive_application_log(days)
+        click.echo(f"Archived {archived} application_log rows older than {days} days to {LOG_ARCHIVE_DIR}")
+
+    @app.cli.command('mail-sink')
+    @click.option('--port', default=1025, type=int)
+    def mail_sink(port):
+        """Run a local SMTP server that prints every message instead of delivering it."""
+        from backend.mail_utils import LocalSMTPSink
+        sink = LocalSMTPSink(port=port, on_message=lambda message: click.echo(f"To: {', '.join(message['to'])}\n{message['data']}"))
+        click.echo(f"Mail sink listening on localhost:{port}; set SMTP_SERVER=localhost SMTP_PORT={port} SMTP_STARTTLS=false")
+        sink.serve_forever()
+
+    @app.cli.command('build-breach-corpus')
+    @click.argument('source')
+    @click.argument('output')
+    def build_corpus(source, output):
+        """Convert a downloaded HIBP SHA-1 dump (file or directory of range files) into the local breach corpus."""
+        from backend.hibp_utils import build_breach_corpus
+        records = build_breach_corpus(source, output)
+        click.echo(f"Wrote {records} hashes to {output}; set HIBP_CORPUS_PATH={output} to check passwords offline")
@@ -0,0 +1,68 @@
+import os
+from sqlalchemy import text, bindparam
+from models import db
+from models.enums import CommentType
+from backend.api_utils import Listing
+from backend.schema_utils import ensure_column, ensure_index
+
+COMMENT_PAGE_SIZE = int(os.environ.get('COMMENT_PAGE_SIZE', '10'))
+REPLY_PAGE_SIZE = int(os.environ.get('REPLY_PAGE_SIZE', '10'))
+COMMENT_THREAD_INDEX = ('idx_comment_thread', ['postId', 'parentCommentId', 'timestamp'])
+
+COMMENT_FIELDS = {
+    'commentId': 'c.commentId',
+    'commentContent': 'c.commentContent',
+    'timestamp': 'c.timestamp',
+    'edited_at': 'c.edited_at',
+    'parentCommentId': 'c.parentCommentId',
+    'username': 'u.username',
+    'profilePicture': 'u.profilePicture',
+}
+COMMENT_TABLE = 'comment c JOIN user u ON c.authorId = u.userId'
+# Top-level comments newest first; replies oldest first, in conversation order
+TOP_LEVEL_COMMENTS = Listing(COMMENT_TABLE, COMMENT_FIELDS, time_column='c.timestamp', id_column='c.commentId')
+REPLIES = Listing(COMMENT_TABLE, COMMENT_FIELDS, time_column='c.timestamp', id_column='c.commentId', descending=False)
+
+def comment_page(post_id, parent_id=None, cursor=None, limit=None):
+    """
+    A page of the top-level comments of a post, or of the replies to parent_id, with each comment's reply count.
+    Returns (comments, next_cursor) like Listing.page.
+    """
+    params = {"post_id": post_id, "comment_type": CommentType.COMMENT.value}
+    if parent_id is None:
+        listing, limit = TOP_LEVEL_COMMENTS, limit or COMMENT_PAGE_SIZE
+        where = "c.postId = :post_id AND c.parentCommentId IS NULL AND c.commentType = :comment_type"
+    else:
+        listing, limit = REPLIES, limit or REPLY_PAGE_SIZE
+        where = "c.postId = :post_id AND c.parentCommentId = :parent_id AND c.commentType = :comment_type"
+        params["parent_id"] = parent_id
+    comments, next_cursor = listing.page(list(COMMENT_FIELDS), where, params, cursor, limit)
+    counts = reply_counts(post_id, [comment['commentId'] for comment in comments])
+    for comment in comments:
+        comment['reply_count'] = counts.get(comment['commentId'], 0)
+    return comments, next_cursor
+
+def reply_counts(post_id, comment_ids):
+    """commentId -> number of replies, for comments of the same post"""
+    rows = db.session.execute(text("""
+        SELECT parentCommentId, COUNT(*) AS replies
+        FROM comment
+        WHERE postId = :post_id AND parentCommentId IN :ids AND commentType = :comment_type
+        GROUP BY parentCommentId
+    """).bindparams(bindparam('ids', expanding=True)),
+        {"post_id": post_id, "ids": list(comment_ids), "comment_type": CommentType.COMMENT.value})
+    return {row.parentCommentId: row.replies for row in rows}
+
+def ensure_comment_schema():
+    """
+    Adds commentType to a comment table created before it existed, marks the old __LIKE__ content markers as
+    likes and creates the thread index. Returns (column added, like markers retyped, index created).
+    """
+    added = ensure_column('comment', 'commentType', "VARCHAR(20) NOT NULL DEFAULT 'comment'")
+    result = db.session.execute(text("""
+        UPDATE comment SET commentType = :like
+        WHERE commentType = :comment AND commentContent LIKE '\\_\\_LIKE\\_\\_%'
+    """), {"like": CommentType.LIKE.value, "comment": CommentType.COMMENT.value})
+    db.session.commit()
+    name, columns = COMMENT_THREAD_INDEX
+    return added, result.rowcount, ensure_index('comment', name, columns)
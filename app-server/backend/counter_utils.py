@@ -0,0 +1,99 @@
+from models import db
+from sqlalchemy import text
+
+# Recomputes counts from the source tables; used to seed missing rows and by reconciliation
+COUNT_QUERY = """
+    SELECT u.userId,
+        COALESCE(p.cnt, 0) AS posts_count,
+        COALESCE(fr.cnt, 0) AS followers_count,
+        COALESCE(fg.cnt, 0) AS following_count
+    FROM user u
+    LEFT JOIN (SELECT authorId, COUNT(*) AS cnt FROM post GROUP BY authorId) p ON p.authorId = u.userId
+    LEFT JOIN (SELECT followedUserId, COUNT(*) AS cnt FROM followers WHERE status = 'accepted' GROUP BY followedUserId) fr
+        ON fr.followedUserId = u.userId
+    LEFT JOIN (SELECT followerUserId, COUNT(*) AS cnt FROM followers WHERE status = 'accepted' GROUP BY followerUserId) fg
+        ON fg.followerUserId = u.userId
+"""
+
+UPSERT_COUNTERS = text("""
+    INSERT INTO user_counters (userId, postsCount, followersCount, followingCount, updatedAt)
+    VALUES (:user_id, :posts_count, :followers_count, :following_count, NOW())
+    ON DUPLICATE KEY UPDATE postsCount = VALUES(postsCount), followersCount = VALUES(followersCount),
+        followingCount = VALUES(followingCount), updatedAt = NOW()
+""")
+
+def adjust_user_counters(user_id, posts=0, followers=0, following=0):
+    """
+    Apply counter deltas inside the caller's transaction, so they commit or roll back with the write.
+    A user without a counters row is left alone; the row is seeded from the source tables on the next read.
+    """
+    db.session.execute(text("""
+        UPDATE user_counters
+        SET postsCount = GREATEST(postsCount + :posts, 0),
+            followersCount = GREATEST(followersCount + :followers, 0),
+            followingCount = GREATEST(followingCount + :following, 0),
+            updatedAt = NOW()
+        WHERE userId = :user_id
+    """), {"user_id": user_id, "posts": posts, "followers": followers, "following": following})
+
+def release_user_counters(user_id):
+    """Before deleting an account: decrement everyone it follows or is followed by, and drop its row"""
+    db.session.execute(text("""
+        UPDATE user_counters uc JOIN followers f ON f.followedUserId = uc.userId
+        SET uc.followersCount = GREATEST(uc.followersCount - 1, 0), uc.updatedAt = NOW()
+        WHERE f.followerUserId = :user_id AND f.status = 'accepted'
+    """), {"user_id": user_id})
+    db.session.execute(text("""
+        UPDATE user_counters uc JOIN followers f ON f.followerUserId = uc.userId
+        SET uc.followingCount = GREATEST(uc.followingCount - 1, 0), uc.updatedAt = NOW()
+        WHERE f.followedUserId = :user_id AND f.status = 'accepted'
+    """), {"user_id": user_id})
+    db.session.execute(text("DELETE FROM user_counters WHERE userId = :user_id"), {"user_id": user_id})
+
+def get_user_counters(user_id):
+    """Returns the stats dict for a user from user_counters, seeding the row on first read"""
+    row = db.session.execute(text("""
+        SELECT postsCount, followersCount, followingCount FROM user_counters WHERE userId = :user_id
+    """), {"user_id": user_id}).fetchone()
+    if row:
+        return {'posts_count': row.postsCount, 'followers_count': row.followersCount, 'following_count': row.followingCount}
+
+    counts = db.session.execute(text(COUNT_QUERY + " WHERE u.userId = :user_id"), {"user_id": user_id}).fetchone()
+    if not counts:
+        return {'posts_count': 0, 'followers_count': 0, 'following_count': 0}
+    stats = {'posts_count': counts.posts_count, 'followers_count': counts.followers_count, 'following_count': counts.following_count}
+    try:
+        # Seed on a separate connection so the caller's transaction is not committed here
+        with db.engine.begin() as connection:
+            connection.execute(text("""
+                INSERT IGNORE INTO user_counters (userId, postsCount, followersCount, followingCount, updatedAt)
+                VALUES (:user_id, :posts_count, :followers_count, :following_count, NOW())
+            """), {"user_id": user_id, **stats})
+    except Exception as e:
+        print(f"Error seeding user counters: {e}")
+    return stats
+
+def reconcile_user_counters(batch_size=1000):
+    """Recompute every user's counts in bulk and rewrite rows that are missing or have drifted"""
+    drifted = db.session.execute(text(f"""
+        SELECT c.userId, c.posts_count, c.followers_count, c.following_count
+        FROM ({COUNT_QUERY}) c
+        LEFT JOIN user_counters uc ON uc.userId = c.userId
+        WHERE uc.userId IS NULL
+            OR uc.postsCount != c.posts_count
+            OR uc.followersCount != c.followers_count
+            OR uc.followingCount != c.following_count
+    """)).fetchall()
+
+    fixed = []
+    for start in range(0, len(drifted), batch_size):
+        batch = drifted[start:start + batch_size]
+        db.session.execute(UPSERT_COUNTERS, [{
+            "user_id": row.userId,
+            "posts_count": row.posts_count,
+            "followers_count": row.followers_count,
+            "following_count": row.following_count
+        } for row in batch])
+        db.session.commit()
+        fixed.extend(row.userId for row in batch)
+    return fixed
@@ -0,0 +1,25 @@
+import base64
+import json
+from datetime import datetime
+
+def encode_cursor(timestamp, row_id):
+    """
+    Encodes a (timestamp, id) keyset position into an opaque, URL-safe token.
+    """
+    if row_id is None:
+        return None
+    payload = json.dumps([timestamp.isoformat() if timestamp else None, int(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """
+    Decodes a token produced by encode_cursor. Returns (timestamp, id) or None if the token is invalid.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return (datetime.fromisoformat(timestamp) if timestamp else None, int(row_id))
+    except (ValueError, TypeError, UnicodeError):
+        return None
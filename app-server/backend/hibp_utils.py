@@ -1,22 +1,142 @@
 import requests, hashlib
+import mmap
+import os
+import struct
+import threading
+from backend.cache_utils import LocalCache
 
-def check_password_breach(password):
-    # Hash the password using SHA-1
-    sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
-    prefix = sha1_hash[:5]
-    suffix = sha1_hash[5:]
+# Local breach corpus built with `flask build-breach-corpus`; when present, no request leaves the server
+HIBP_CORPUS_PATH = os.environ.get('HIBP_CORPUS_PATH', '')
+HIBP_TIMEOUT = float(os.environ.get('HIBP_TIMEOUT', '3'))  # seconds
+HIBP_CACHE_SIZE = int(os.environ.get('HIBP_CACHE_SIZE', '2048'))  # range responses kept
+HIBP_CACHE_TTL = 24 * 3600  # seconds
+
+# Corpus layout: magic, then 65537 big-endian uint64 record indexes (first record for each 2-byte digest prefix,
+# plus the total), then fixed-size records of SHA-1 digest + uint32 count sorted by digest
+CORPUS_MAGIC = b'HIBPSHA1'
+INDEX_ENTRIES = 65537
+DIGEST_SIZE = 20
+RECORD = struct.Struct('>20sI')
+INDEX_OFFSET = len(CORPUS_MAGIC)
+RECORDS_OFFSET = INDEX_OFFSET + INDEX_ENTRIES * 8
+
+class BreachCorpus:
+    """Memory-mapped, sorted SHA-1 breach corpus answered by binary search"""
+    def __init__(self, path):
+        with open(path, 'rb') as corpus:
+            self._mm = mmap.mmap(corpus.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:INDEX_OFFSET] != CORPUS_MAGIC:
+            raise ValueError(f"{path} is not a breach corpus")
+
+    def __len__(self):
+        return self._index(INDEX_ENTRIES - 1)
+
+    def _index(self, bucket):
+        return struct.unpack_from('>Q', self._mm, INDEX_OFFSET + bucket * 8)[0]
+
+    def count(self, digest):
+        """Breach count for a 20-byte SHA-1 digest, 0 if absent"""
+        bucket = int.from_bytes(digest[:2], 'big')
+        low, high = self._index(bucket), self._index(bucket + 1)
+        while low < high:
+            middle = (low + high) // 2
+            offset = RECORDS_OFFSET + middle * RECORD.size
+            current = self._mm[offset:offset + DIGEST_SIZE]
+            if current < digest:
+                low = middle + 1
+            elif current > digest:
+                high = middle
+            else:
+                return RECORD.unpack_from(self._mm, offset)[1]
+        return 0
+
+    def close(self):
+        self._mm.close()
 
-    # Query the HIBP API with the prefix
+def _dump_lines(source):
+    """(hex digest, count) pairs from a HIBP dump: one HASH:COUNT file, or a directory of PREFIX.txt range files"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            prefix = name.split('.')[0].upper()
+            with open(os.path.join(source, name)) as range_file:
+                for line in range_file:
+                    if line.strip():
+                        suffix, count = line.strip().split(':')
+                        yield prefix + suffix.upper(), int(count)
+    else:
+        with open(source) as dump:
+            for line in dump:
+                if line.strip():
+                    digest, count = line.strip().split(':')
+                    yield digest.upper(), int(count)
+
+def build_breach_corpus(source, path):
+    """Convert a downloaded HIBP SHA-1 dump into the corpus format; returns the number of records written"""
+    index = [0] * INDEX_ENTRIES
+    records = 0
+    previous = b''
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as corpus:
+        corpus.write(CORPUS_MAGIC)
+        corpus.write(b'\0' * (INDEX_ENTRIES * 8))
+        for hex_digest, count in _dump_lines(source):
+            digest = bytes.fromhex(hex_digest)
+            if len(digest) != DIGEST_SIZE or digest <= previous:
+                raise ValueError(f"Dump is not sorted SHA-1 hashes at {hex_digest}")
+            previous = digest
+            index[int.from_bytes(digest[:2], 'big') + 1] += 1
+            corpus.write(RECORD.pack(digest, min(count, 0xFFFFFFFF)))
+            records += 1
+        # Turn per-prefix counts into the index of each prefix's first record
+        for bucket in range(1, INDEX_ENTRIES):
+            index[bucket] += index[bucket - 1]
+        corpus.seek(INDEX_OFFSET)
+        corpus.write(struct.pack(f'>{INDEX_ENTRIES}Q', *index))
+    os.replace(tmp_path, path)
+    return records
+
+_corpus = None
+_corpus_lock = threading.Lock()
+_session = requests.Session()
+_range_cache = LocalCache(HIBP_CACHE_SIZE, HIBP_CACHE_TTL)
+
+def get_breach_corpus():
+    """Returns the mapped local corpus, or None when HIBP_CORPUS_PATH is not set"""
+    global _corpus
+    if _corpus is None and HIBP_CORPUS_PATH:
+        with _corpus_lock:
+            if _corpus is None:
+                _corpus = BreachCorpus(HIBP_CORPUS_PATH)
+    return _corpus
+
+def _fetch_range(prefix):
+    """suffix -> count for one k-anonymity range, from the LRU cache or the HIBP API"""
+    found, hashes = _range_cache.get(prefix)
+    if found:
+        return hashes
     url = f"https://api.pwnedpasswords.com/range/{prefix}"
-    response = requests.get(url)
+    response = _session.get(url, timeout=HIBP_TIMEOUT)
 
     if response.status_code != 200:
         raise RuntimeError("Error fetching data from HIBP")
 
-    # Check if the suffix is in the returned hashes
-    hashes = (line.split(":") for line in response.text.splitlines())
-    for hash_suffix, count in hashes:
-        if hash_suffix == suffix:
-            return int(count)
+    hashes = {}
+    for line in response.text.splitlines():
+        hash_suffix, count = line.split(":")
+        hashes[hash_suffix] = int(count)
+    _range_cache.set(prefix, hashes)
+    return hashes
+
+def check_password_breach(password):
+    # Hash the password using SHA-1
+    sha1 = hashlib.sha1(password.encode('utf-8'))
+    corpus = get_breach_corpus()
+    if corpus is not None:
+        return corpus.count(sha1.digest())
+
+    sha1_hash = sha1.hexdigest().upper()
+    prefix = sha1_hash[:5]
+    suffix = sha1_hash[5:]
 
-    return 0
\ No newline at end of file
+    # Only the prefix leaves the server; the range is checked for the suffix locally
+    return _fetch_range(prefix).get(suffix, 0)
@@ -0,0 +1,109 @@
+import io
+import re
+from PIL import Image, ImageOps
+
+# Widths of the WebP variants generated for post images, used in srcset
+POST_IMAGE_WIDTHS = (320, 640, 1080)
+# Square WebP thumbnails generated for profile pictures
+AVATAR_SIZES = (64, 160)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 90
+# Refuse images that would take excessive memory to decode
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Uploads with variants are stored as <prefix>/<id>/original.<ext>, with each variant beside it
+PROCESSED_IMAGE = re.compile(r'^(?P<base>.*/(?P<kind>posts|profile_pics)/[0-9a-f-]+/)original\.(?:jpg|jpeg|png)$')
+
+def processed_image_key(prefix, upload_id, filename):
+    """Storage key for an upload that will get variants, e.g. posts/<sha256>/original.png"""
+    ext = filename.rsplit('.', 1)[-1].lower()
+    if ext == 'jpeg':
+        ext = 'jpg'
+    return f'{prefix}/{upload_id}/original.{ext}'
+
+def _open(file):
+    image = Image.open(file)
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image is too large to process ({image.width}x{image.height})")
+    image_format = image.format
+    # Apply the EXIF orientation before the metadata is dropped
+    return ImageOps.exif_transpose(image), image_format
+
+def _encode(image, image_format, **options):
+    """Re-encode without EXIF or other metadata; only the colour profile is kept"""
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    elif image_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    output = io.BytesIO()
+    icc_profile = image.info.get('icc_profile')
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(output, image_format, **options)
+    output.seek(0)
+    return output
+
+def _original(image, image_format, key):
+    if image_format == 'PNG':
+        return key, _encode(image, 'PNG', optimize=True), 'image/png'
+    return key, _encode(image, 'JPEG', quality=JPEG_QUALITY, optimize=True), 'image/jpeg'
+
+def post_image_variants(file, key):
+    """The metadata-stripped original plus one WebP per POST_IMAGE_WIDTHS, never upscaled"""
+    image, image_format = _open(file)
+    base = key.rsplit('/', 1)[0]
+    objects = [_original(image, image_format, key)]
+    for width in POST_IMAGE_WIDTHS:
+        variant = image.copy()
+        variant.thumbnail((width, width * 10), Image.LANCZOS)
+        objects.append((f'{base}/{width}w.webp', _encode(variant, 'WEBP', quality=WEBP_QUALITY, method=4), 'image/webp'))
+    return objects
+
+def avatar_variants(file, key):
+    """The metadata-stripped original plus a square WebP thumbnail per AVATAR_SIZES"""
+    image, image_format = _open(file)
+    base = key.rsplit('/', 1)[0]
+    objects = [_original(image, image_format, key)]
+    for size in AVATAR_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        objects.append((f'{base}/{size}px.webp', _encode(thumbnail, 'WEBP', quality=WEBP_QUALITY, method=4), 'image/webp'))
+    return objects
+
+def variant_keys(key):
+    """Keys of the variants stored beside an original, for deleting them together"""
+    match = PROCESSED_IMAGE.match('/' + key)
+    if not match:
+        return []
+    base = key.rsplit('/', 1)[0]
+    if match.group('kind') == 'posts':
+        return [f'{base}/{width}w.webp' for width in POST_IMAGE_WIDTHS]
+    return [f'{base}/{size}px.webp' for size in AVATAR_SIZES]
+
+def image_variant(url, width):
+    """URL of the post image variant closest to width (at least as wide), or the original for older uploads"""
+    match = PROCESSED_IMAGE.match(url or '')
+    if not match or match.group('kind') != 'posts':
+        return url
+    width = next((w for w in POST_IMAGE_WIDTHS if w >= width), POST_IMAGE_WIDTHS[-1])
+    return f"{match.group('base')}{width}w.webp"
+
+def image_srcset(url):
+    """srcset value listing every width of a post image; empty for uploads without variants"""
+    match = PROCESSED_IMAGE.match(url or '')
+    if not match or match.group('kind') != 'posts':
+        return ''
+    return ', '.join(f"{match.group('base')}{width}w.webp {width}w" for width in POST_IMAGE_WIDTHS)
+
+def avatar_url(url, size):
+    """URL of the smallest avatar thumbnail covering size pixels, or the original for older uploads"""
+    match = PROCESSED_IMAGE.match(url or '')
+    if not match or match.group('kind') != 'profile_pics':
+        return url
+    size = next((s for s in AVATAR_SIZES if s >= size), AVATAR_SIZES[-1])
+    return f"{match.group('base')}{size}px.webp"
+
+def register_template_filters(app):
+    """Registers the image URL filters used by the templates"""
+    app.add_template_filter(image_variant)
+    app.add_template_filter(image_srcset)
+    app.add_template_filter(avatar_url)
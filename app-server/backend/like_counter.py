@@ -0,0 +1,206 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from sqlalchemy import text
+from backend.redis_utils import get_redis_client
+
+# Buffer like/unlike deltas and write them to post.like in batches instead of on every like
+LIKE_BUFFER_ENABLED = os.getenv("LIKE_BUFFER_ENABLED", "false").lower() == "true"
+LIKE_FLUSH_INTERVAL = float(os.environ.get('LIKE_FLUSH_INTERVAL', '2'))  # seconds between flushes
+LIKE_BUFFER_SHARDS = 16
+
+PENDING_KEY = 'likes:pending'
+
+FLUSH_QUERY = text("UPDATE post SET `like` = GREATEST(COALESCE(`like`, 0) + :delta, 0) WHERE postId = :post_id")
+
+class LocalLikeBuffer:
+    """In-process deltas split over independently locked shards so concurrent likes rarely contend"""
+    def __init__(self, shards=LIKE_BUFFER_SHARDS):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def _shard(self, post_id):
+        return self._shards[post_id % len(self._shards)]
+
+    def add(self, post_id, delta):
+        counts, lock = self._shard(post_id)
+        with lock:
+            counts[post_id] = counts.get(post_id, 0) + delta
+
+    def pending(self, post_ids):
+        result = {}
+        for post_id in post_ids:
+            counts, lock = self._shard(post_id)
+            with lock:
+                if counts.get(post_id):
+                    result[post_id] = counts[post_id]
+        return result
+
+    def drain(self):
+        """Take every pending delta, leaving the buffer empty"""
+        drained = {}
+        for counts, lock in self._shards:
+            with lock:
+                drained.update((post_id, delta) for post_id, delta in counts.items() if delta)
+                counts.clear()
+        return drained
+
+    def restore(self, deltas):
+        for post_id, delta in deltas.items():
+            self.add(post_id, delta)
+
+class RedisLikeBuffer:
+    """Deltas shared by every worker process in a Redis hash (field = postId)"""
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, post_id, delta):
+        self.client.hincrby(PENDING_KEY, post_id, delta)
+
+    def pending(self, post_ids):
+        if not post_ids:
+            return {}
+        values = self.client.hmget(PENDING_KEY, [str(post_id) for post_id in post_ids])
+        return {post_id: int(value) for post_id, value in zip(post_ids, values) if value and int(value)}
+
+    def drain(self):
+        # RENAME is atomic, so increments arriving during the flush land in a fresh hash
+        flushing_key = f'likes:flushing:{uuid.uuid4().hex}'
+        try:
+            self.client.rename(PENDING_KEY, flushing_key)
+        except Exception:
+            return {}  # nothing pending
+        values = self.client.hgetall(flushing_key)
+        self.client.delete(flushing_key)
+        return {int(post_id): int(delta) for post_id, delta in values.items() if int(delta)}
+
+    def restore(self, deltas):
+        pipe = self.client.pipeline(transaction=False)
+        for post_id, delta in deltas.items():
+            pipe.hincrby(PENDING_KEY, post_id, delta)
+        pipe.execute()
+
+class LikeCounter:
+    """Write-behind like counts: deltas are buffered and flushed to post.like on a timer"""
+    def __init__(self, flush_interval=LIKE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._local = LocalLikeBuffer()
+        self._app = None
+        self._flusher = None
+        self._lock = threading.Lock()
+
+    def _buffer(self):
+        client = get_redis_client()
+        if client is not None:
+            return RedisLikeBuffer(client)
+        return self._local
+
+    def add(self, post_id, delta):
+        """Record a like (+1) or unlike (-1) to be written by the next flush"""
+        self._ensure_flusher()
+        try:
+            self._buffer().add(post_id, delta)
+        except Exception as e:
+            print(f"Error buffering like for post {post_id}, buffering locally: {e}")
+            self._local.add(post_id, delta)
+
+    def pending(self, post_ids):
+        """Pending deltas for the given posts, to be added to the stored counts when reading"""
+        buffer = self._buffer()
+        if buffer is self._local:
+            return self._local.pending(post_ids)
+        try:
+            pending = buffer.pending(post_ids)
+        except Exception as e:
+            print(f"Error reading pending likes: {e}")
+            pending = {}
+        # Deltas buffered locally while Redis was unavailable are not visible anywhere else
+        for post_id, delta in self._local.pending(post_ids).items():
+            pending[post_id] = pending.get(post_id, 0) + delta
+        return pending
+
+    def flush(self):
+        """Write all pending deltas to post.like in one batch; returns the number of posts updated"""
+        from models import db
+        flushed = 0
+        buffers = [self._local]
+        client = get_redis_client()
+        if client is not None:
+            buffers.insert(0, RedisLikeBuffer(client))
+        for buffer in buffers:
+            deltas = buffer.drain()
+            if not deltas:
+                continue
+            try:
+                db.session.execute(FLUSH_QUERY, [{"post_id": post_id, "delta": delta} for post_id, delta in deltas.items()])
+                db.session.commit()
+                flushed += len(deltas)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error flushing like counts, will retry: {e}")
+                buffer.restore(deltas)
+        return flushed
+
+    def _ensure_flusher(self):
+        """Start the background flush thread for this process on first use"""
+        if self._flusher is not None:
+            return
+        from flask import current_app
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._app = current_app._get_current_object()
+            self._flusher = threading.Thread(target=self._run, name='like-counter-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self._flush_in_app)
+
+    def _flush_in_app(self):
+        with self._app.app_context():
+            try:
+                self.flush()
+            finally:
+                from models import db
+                db.session.remove()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self._flush_in_app()
+            except Exception as e:
+                print(f"Like counter flush failed: {e}")
+
+def merge_pending_likes(posts, counter):
+    """
+    Add pending deltas to the like counts of posts about to be rendered.
+    Feed items are replaced; ORM posts are updated without being marked dirty, so the merged count is never written back.
+    """
+    if counter is None or not posts:
+        return posts
+    pending = counter.pending([post.postId for post in posts])
+    if not pending:
+        return posts
+    from sqlalchemy.orm.attributes import set_committed_value
+    merged = []
+    for post in posts:
+        delta = pending.get(post.postId)
+        if delta:
+            like = max(0, (post.like or 0) + delta)
+            if hasattr(post, '_replace'):
+                post = post._replace(like=like)
+            else:
+                set_committed_value(post, 'like', like)
+        merged.append(post)
+    return merged
+
+_like_counter = None
+
+def get_like_counter():
+    """Returns the process-wide LikeCounter, or None when LIKE_BUFFER_ENABLED is off"""
+    global _like_counter
+    if not LIKE_BUFFER_ENABLED:
+        return None
+    if _like_counter is None:
+        _like_counter = LikeCounter()
+    return _like_counter
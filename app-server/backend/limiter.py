@@ -1,4 +1,4 @@
-    
+
 # from flask_limiter import Limiter
 # from backend.splunk_utils import get_real_ip
 
@@ -9,34 +9,135 @@
 #     limiter.storage_uri = storage_uri
 #     limiter.init_app(app)
 
-from collections import defaultdict
+import math
+import os
+import threading
 import time
+from functools import wraps
 from flask import request, jsonify
+from backend.cache_utils import LocalCache
+from backend.redis_utils import get_redis_client
 from backend.splunk_utils import get_real_ip
 
-request_data = defaultdict(list)
-
-def check_rate_limit(ip, request_data, max_requests=5, time_window=15):
-    """Check if the IP has exceeded the rate limit"""
-    current_time = time.time()
-    request_data[ip] = [timestamp for timestamp in request_data[ip] if current_time - timestamp < time_window]
-    if len(request_data[ip]) >= max_requests:
-        return False  ## Rate limit exceeded
-    return True
-
-def rate_limit_required(func):
-    """Custom decorator to apply rate limiting"""
-    from functools import wraps
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        ip = get_real_ip()
-        if request.method == "POST":
-            if not check_rate_limit(ip, request_data=request_data):
-                return jsonify({"error": "Rate limit exceeded"}), 429
-        
-        ## Record the request by adding the current time --
-        request_data[ip].append(time.time())
-        return func(*args, **kwargs)
-
-    return wrapper
\ No newline at end of file
+SLIDING_WINDOW = 'sliding_window'
+TOKEN_BUCKET = 'token_bucket'
+
+# Keys tracked per process when Redis is unavailable; the least recently seen are evicted first
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+
+# Sliding window counter: this window's count plus the previous window's, weighted by how much of it still overlaps
+SLIDING_WINDOW_SCRIPT = """
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local limit, window, elapsed = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+if previous * (1 - elapsed / window) + current >= limit then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], math.ceil(window * 2))
+return 1
+"""
+
+# Token bucket holding up to `limit` tokens, refilled at limit/window tokens per second
+TOKEN_BUCKET_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local limit, window, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or limit
+local updated = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - updated) * limit / window)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+return allowed
+"""
+
+class RateLimiter:
+    """
+    Sliding-window-counter and token-bucket rate limits with constant state per key.
+    Limits are shared by all processes through Redis (each check is one atomic Lua script) and
+    kept in a bounded in-process LRU when Redis is unavailable.
+    """
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self._local = LocalCache(max_keys, ttl=0)
+        self._lock = threading.Lock()
+        self._scripts = {}
+
+    def _script(self, client, algorithm):
+        # Scripts are cached by Redis and invoked with EVALSHA after the first call
+        if algorithm not in self._scripts:
+            source = SLIDING_WINDOW_SCRIPT if algorithm == SLIDING_WINDOW else TOKEN_BUCKET_SCRIPT
+            self._scripts[algorithm] = client.register_script(source)
+        return self._scripts[algorithm]
+
+    def hit(self, key, limit, window, algorithm=SLIDING_WINDOW):
+        """Count one request against key; returns whether it is allowed"""
+        now = time.time()
+        client = get_redis_client()
+        if client is not None:
+            try:
+                return bool(self._redis_hit(client, key, limit, window, algorithm, now))
+            except Exception as e:
+                print(f"Error checking rate limit in Redis, using in-process limits: {e}")
+        with self._lock:
+            if algorithm == SLIDING_WINDOW:
+                return self._local_sliding_window(key, limit, window, now)
+            return self._local_token_bucket(key, limit, window, now)
+
+    def _redis_hit(self, client, key, limit, window, algorithm, now):
+        if algorithm == SLIDING_WINDOW:
+            current = int(now // window)
+            keys = [f'ratelimit:{key}:{current}', f'ratelimit:{key}:{current - 1}']
+            return self._script(client, algorithm)(keys=keys, args=[limit, window, now - current * window])
+        return self._script(client, algorithm)(keys=[f'ratelimit:{key}'], args=[limit, window, now])
+
+    def _local_sliding_window(self, key, limit, window, now):
+        current = int(now // window)
+        found, state = self._local.get(key)
+        window_index, count, previous = state if found else (current, 0, 0)
+        if window_index != current:
+            # Roll forward; a gap of more than one window leaves nothing overlapping
+            previous = count if window_index == current - 1 else 0
+            window_index, count = current, 0
+        elapsed = now - current * window
+        allowed = previous * (1 - elapsed / window) + count < limit
+        if allowed:
+            count += 1
+        self._local.set(key, (window_index, count, previous), ttl=window * 2)
+        return allowed
+
+    def _local_token_bucket(self, key, limit, window, now):
+        found, state = self._local.get(key)
+        tokens, updated = state if found else (limit, now)
+        tokens = min(limit, tokens + max(0.0, now - updated) * limit / window)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._local.set(key, (tokens, now), ttl=window)
+        return allowed
+
+_rate_limiter = RateLimiter()
+
+def rate_limit_required(func=None, *, limit=5, window=15, algorithm=SLIDING_WINDOW, scope='default', methods=('POST',)):
+    """
+    Custom decorator to apply rate limiting, per client IP.
+    Used bare it applies the default policy, shared by every route that uses it; pass a scope to give a
+    route its own budget, e.g. @rate_limit_required(limit=7, window=60, scope='login').
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in methods:
+                if not _rate_limiter.hit(f'{scope}:{get_real_ip()}', limit, window, algorithm):
+                    response = jsonify({"error": "Rate limit exceeded"})
+                    response.headers['Retry-After'] = str(math.ceil(window if algorithm == SLIDING_WINDOW else window / limit))
+                    return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
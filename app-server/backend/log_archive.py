@@ -0,0 +1,179 @@
+import gzip
+import json
+import os
+import threading
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+from models import db
+
+# Rows older than this many days are moved from application_log to the archive
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', '90'))
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'log_archive'))
+ARCHIVE_BATCH_SIZE = 5000
+
+# day -> list of gzip members of that day's file, each {"offset", "first", "last", "counts"}: its byte offset,
+# its first and last (timestamp, id) and its row counts by action and user id. Readers use it to open only the
+# members that can hold matching rows, and to count archived rows without reading any file.
+MANIFEST_FILE = 'manifest.json'
+
+ArchivedLogRow = namedtuple('ArchivedLogRow', ['id', 'user_id', 'action', 'target_type', 'target_id', 'timestamp'])
+
+_manifest_lock = threading.Lock()
+
+def _day_path(archive_dir, day):
+    return os.path.join(archive_dir, f'application_log-{day}.jsonl.gz')
+
+def _read_manifest(archive_dir):
+    try:
+        with open(os.path.join(archive_dir, MANIFEST_FILE)) as manifest:
+            return json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(archive_dir, manifest):
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as tmp:
+        json.dump(manifest, tmp, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def _key(record):
+    return datetime.fromisoformat(record['timestamp']), record['id']
+
+def _member_key(pair):
+    """(timestamp, id) from a member's "first" or "last" """
+    return datetime.fromisoformat(pair[0]), pair[1]
+
+def _summarize(records, offset):
+    counts = {}
+    for record in records:
+        by_user = counts.setdefault(record['action'], {})
+        by_user[str(record['user_id'])] = by_user.get(str(record['user_id']), 0) + 1
+    return {'offset': offset, 'first': [records[0]['timestamp'], records[0]['id']],
+            'last': [records[-1]['timestamp'], records[-1]['id']], 'counts': counts}
+
+def _member_count(member, action=None, user_id=None):
+    return sum(count for member_action, by_user in member['counts'].items() if not action or member_action == action
+               for member_user, count in by_user.items() if not user_id or member_user == str(user_id))
+
+def _read_member(path, offset):
+    """Records of the gzip member starting at offset"""
+    with open(path, 'rb') as archive:
+        archive.seek(offset)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        while not decompressor.eof:
+            data = archive.read(65536)
+            if not data:
+                break
+            chunks.append(decompressor.decompress(data))
+    return [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines() if line]
+
+def archive_application_log(days=LOG_RETENTION_DAYS, archive_dir=LOG_ARCHIVE_DIR, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move application_log rows older than `days` into one gzip JSON-lines file per day, oldest first.
+    Each batch is appended to its files as a new gzip member and recorded in the manifest before it is deleted.
+    Rows at or before a day's last recorded key were archived by an interrupted run and are only deleted.
+    Returns the number of rows archived.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+    with _manifest_lock:
+        manifest = _read_manifest(archive_dir)
+    archived = 0
+    while True:
+        rows = db.session.execute(text("""
+            SELECT id, user_id, action, target_type, target_id, timestamp FROM application_log
+            WHERE timestamp < :cutoff
+            ORDER BY timestamp, id
+            LIMIT :limit
+        """).columns(timestamp=db.DateTime), {"cutoff": cutoff, "limit": batch_size}).fetchall()
+        if not rows:
+            return archived
+
+        by_day = {}
+        for row in rows:
+            day = row.timestamp.date().isoformat()
+            members = manifest.get(day, [])
+            if members and (row.timestamp, row.id) <= _member_key(members[-1]['last']):
+                continue
+            by_day.setdefault(day, []).append({
+                'id': row.id,
+                'user_id': row.user_id,
+                'action': row.action,
+                'target_type': row.target_type,
+                'target_id': row.target_id,
+                'timestamp': row.timestamp.isoformat()
+            })
+        for day, records in by_day.items():
+            path = _day_path(archive_dir, day)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            # Appending adds a new gzip member at the old end of the file
+            with gzip.open(path, 'at', encoding='utf-8') as archive:
+                archive.write(''.join(json.dumps(record) + '\n' for record in records))
+            manifest.setdefault(day, []).append(_summarize(records, offset))
+        with _manifest_lock:
+            _write_manifest(archive_dir, manifest)
+
+        db.session.execute(
+            text("DELETE FROM application_log WHERE id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {"ids": [row.id for row in rows]}
+        )
+        db.session.commit()
+        archived += sum(len(records) for records in by_day.values())
+
+def _days_in_range(manifest, start_date=None, end_date=None):
+    for day in manifest:
+        day_date = datetime.fromisoformat(day)
+        if start_date and day_date < datetime.combine(start_date.date(), datetime.min.time()):
+            continue
+        if end_date and day_date > end_date:
+            continue
+        yield day
+
+def archived_log_count(archive_dir=LOG_ARCHIVE_DIR, action=None, user_id=None, start_date=None, end_date=None):
+    """Number of archived rows matching the application log filters, from the manifest alone"""
+    manifest = _read_manifest(archive_dir)
+    return sum(_member_count(member, action, user_id)
+               for day in _days_in_range(manifest, start_date, end_date)
+               for member in manifest[day])
+
+def read_archived_log(limit, position=None, direction='older', action=None, user_id=None, start_date=None,
+                      end_date=None, archive_dir=LOG_ARCHIVE_DIR):
+    """
+    Archived rows in the same order and keyset semantics as the application log browser:
+    newest first before `position`, or oldest first after it when direction is 'newer'.
+    Only the gzip members whose key range and counts say they can hold matching rows are read.
+    """
+    newer = direction == 'newer'
+    position = tuple(position) if position else None
+    manifest = _read_manifest(archive_dir)
+    rows = []
+    for day in sorted(_days_in_range(manifest, start_date, end_date), reverse=not newer):
+        path = _day_path(archive_dir, day)
+        for member in sorted(manifest[day], key=lambda m: _member_key(m['first']), reverse=not newer):
+            first, last = _member_key(member['first']), _member_key(member['last'])
+            if position and ((newer and last <= position) or (not newer and first >= position)):
+                continue
+            if (action or user_id) and not _member_count(member, action, user_id):
+                continue
+            records = _read_member(path, member['offset'])
+            for record in sorted(records, key=_key, reverse=not newer):
+                row = ArchivedLogRow(**dict(record, timestamp=datetime.fromisoformat(record['timestamp'])))
+                if position:
+                    key = (row.timestamp, row.id)
+                    if (newer and key <= position) or (not newer and key >= position):
+                        continue
+                if action and row.action != action:
+                    continue
+                if user_id and row.user_id != user_id:
+                    continue
+                if start_date and row.timestamp < start_date:
+                    continue
+                if end_date and row.timestamp >= end_date + timedelta(days=1):
+                    continue
+                rows.append(row)
+                if len(rows) >= limit:
+                    return rows
+    return rows
@@ -1,19 +1,171 @@
-from sqlalchemy import text
+from sqlalchemy import text, event
+from sqlalchemy.orm import Session
 from models import db
+from models.enums import LogActionTypes
+from collections import deque
+from datetime import datetime, timedelta
+import atexit
+import os
+import threading
+import time
+
+# sync writes every record inside the caller's transaction; async queues all but SYNC_ACTIONS for bulk inserts
+AUDIT_LOG_MODE = os.getenv("AUDIT_LOG_MODE", "async").lower()
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1'))  # seconds
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', '100000'))
+
+# Security-relevant actions are always written in the same transaction as the change they record
+SYNC_ACTIONS = {
+    LogActionTypes.LOGIN.value,
+    LogActionTypes.LOGOUT.value,
+    LogActionTypes.UPDATE_EMAIL.value,
+    LogActionTypes.CHANGE_PASSWORD.value,
+    LogActionTypes.RESET_PASSWORD.value,
+}
+
+PENDING_KEY = 'pending_audit_records'
+
+class AuditLogWriter:
+    """Queues application_log records and writes them with multi-row INSERTs from a background thread"""
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL, queue_size=AUDIT_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def enqueue(self, records):
+        self._ensure_thread()
+        with self._lock:
+            overflow = len(self._queue) + len(records) - self.queue_size
+            if overflow > 0:
+                # Only reached if the database has been unavailable for a long time
+                for _ in range(min(overflow, len(self._queue))):
+                    self._queue.popleft()
+                self.dropped += overflow
+                print(f"Audit log queue full, dropped {overflow} oldest records")
+            self._queue.extend(records)
+
+    def _insert(self, connection, batch):
+        # Timestamps stay on the database server's clock and time zone, as when records were written with NOW():
+        # the server's current time less how long each record waited in the queue
+        server_now = connection.execute(text("SELECT CURRENT_TIMESTAMP")).scalar()
+        if isinstance(server_now, str):
+            server_now = datetime.fromisoformat(server_now)  # SQLite
+        now = time.monotonic()
+        rows = []
+        params = {}
+        for i, record in enumerate(batch):
+            rows.append(f"(:user_id_{i}, :action_{i}, :target_id_{i}, :target_type_{i}, :timestamp_{i})")
+            params.update({f"{key}_{i}": record[key] for key in ('user_id', 'action', 'target_id', 'target_type')})
+            params[f"timestamp_{i}"] = server_now - timedelta(seconds=now - record['queued_at'])
+        connection.execute(text(
+            "INSERT INTO application_log (user_id, action, target_id, target_type, timestamp) VALUES " + ", ".join(rows)
+        ), params)
+
+    def flush(self):
+        """Write everything queued in batches of batch_size; returns the number of records written"""
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return written
+            started = time.perf_counter()
+            try:
+                with db.engine.begin() as connection:
+                    self._insert(connection, batch)
+            except Exception as e:
+                self.failures += 1
+                print(f"Error writing audit log batch, will retry: {e}")
+                with self._lock:
+                    self._queue.extendleft(reversed(batch))
+                return written
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+            self.flushed += len(batch)
+            written += len(batch)
+
+    def metrics(self):
+        return {
+            'queue_depth': len(self._queue),
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failures': self.failures,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        from flask import current_app
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_in_app)
+
+    def _flush_in_app(self):
+        with self._app.app_context():
+            self.flush()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self._flush_in_app()
+            except Exception as e:
+                print(f"Audit log flush failed: {e}")
+
+_writer = AuditLogWriter()
+
+def get_audit_log_metrics():
+    """Queue depth and flush latency of the background audit log writer"""
+    return _writer.metrics()
+
+@event.listens_for(Session, 'after_commit')
+def _queue_committed_records(session):
+    records = session.info.pop(PENDING_KEY, None)
+    if records:
+        _writer.enqueue(records)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back_records(session, previous_transaction):
+    # A savepoint rollback leaves the outer transaction, and its records, in place
+    if not previous_transaction.nested:
+        session.info.pop(PENDING_KEY, None)
 
 def log_action(user_id: int, action: str, target_id: int, target_type: str):
         """
         Logs an action to the application_log table.
+        Outside sync mode, records are held until the caller commits and then written in bulk.
         """
-        sql = """
-        INSERT INTO application_log 
-        (user_id, action, target_id, target_type, timestamp)
-        VALUES (:user_id, :action, :target_id, :target_type, NOW())
-        """
-
-        db.session.execute(text(sql), {
+        record = {
             "user_id": user_id,
             "action": action,
             "target_id": target_id,
             "target_type": target_type,
-        })
+        }
+
+        if AUDIT_LOG_MODE == 'sync' or action in SYNC_ACTIONS:
+            sql = """
+            INSERT INTO application_log
+            (user_id, action, target_id, target_type, timestamp)
+            VALUES (:user_id, :action, :target_id, :target_type, CURRENT_TIMESTAMP)
+            """
+            db.session.execute(text(sql), record)
+            return
+
+        record["queued_at"] = time.monotonic()
+        db.session.info.setdefault(PENDING_KEY, []).append(record)
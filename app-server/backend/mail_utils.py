@@ -0,0 +1,263 @@
+import atexit
+import os
+import queue
+import smtplib
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+EMAIL_USER = os.environ.get('EMAIL_USER', '')
+EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', '')
+# Set SMTP_STARTTLS to false for servers without TLS, such as the local mail sink
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+# Deliver from background workers so requests don't wait on SMTP; set to false to send inline
+MAIL_ASYNC = os.getenv("MAIL_ASYNC", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '2'))  # connections, and delivery workers
+MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', '1000'))
+MAIL_MAX_RETRIES = 3
+SMTP_TIMEOUT = 10  # seconds
+SMTP_IDLE_CHECK = 30  # seconds idle before a pooled connection is checked with NOOP
+MAIL_STATUS_LIMIT = 10000  # delivery statuses remembered
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP connections open between messages and replaces ones the server has dropped"""
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=EMAIL_USER, password=EMAIL_PASSWORD,
+                 starttls=SMTP_STARTTLS, size=SMTP_POOL_SIZE, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self._idle = []  # (connection, released_at), most recently used last
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        self.opened += 1
+        return connection
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, released_at = self._idle.pop()
+            if time.monotonic() - released_at < SMTP_IDLE_CHECK:
+                return connection
+            try:
+                if connection.noop()[0] == 250:
+                    return connection
+            except smtplib.SMTPException:
+                pass
+            self.discard(connection)
+        return self._connect()
+
+    def release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def send(self, message):
+        """Send over a pooled connection; a connection that fails is closed rather than reused"""
+        connection = self.acquire()
+        try:
+            connection.send_message(message)
+        except Exception:
+            self.discard(connection)
+            raise
+        self.release(connection)
+
+def _is_permanent(error):
+    # 5xx replies and refused recipients will fail the same way on every retry
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+class Mailer:
+    """
+    Delivers email through an SMTPConnectionPool, from background workers when MAIL_ASYNC is on.
+    Each message gets an id whose delivery status is kept in memory: queued, sent, retrying or failed.
+    """
+    def __init__(self, pool=None, workers=SMTP_POOL_SIZE, queue_size=MAIL_QUEUE_SIZE,
+                 max_retries=MAIL_MAX_RETRIES, backoff=1.0):
+        self.pool = pool or SMTPConnectionPool()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _set_status(self, message_id, status, attempts=0, error=None):
+        with self._lock:
+            self._statuses[message_id] = {'status': status, 'attempts': attempts, 'error': error}
+            self._statuses.move_to_end(message_id)
+            while len(self._statuses) > MAIL_STATUS_LIMIT:
+                self._statuses.popitem(last=False)
+
+    def status(self, message_id):
+        """Delivery status for a message id, or None once it has aged out"""
+        with self._lock:
+            status = self._statuses.get(message_id)
+            return dict(status) if status else None
+
+    def send(self, message):
+        """Queue a message for delivery; returns its id, or None if the queue is full"""
+        message_id = uuid.uuid4().hex
+        self._set_status(message_id, 'queued')
+        try:
+            self._queue.put_nowait((message_id, message))
+        except queue.Full:
+            self._set_status(message_id, 'failed', error='Mail queue full')
+            print(f"Error queueing email to {message['To']}: mail queue full")
+            return None
+        return message_id
+
+    def deliver(self, message_id, message):
+        """Send now, retrying transient failures with backoff; returns whether the message was sent"""
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                self.pool.send(message)
+                self._set_status(message_id, 'sent', attempt)
+                return True
+            except Exception as e:
+                if _is_permanent(e) or attempt > self.max_retries:
+                    self._set_status(message_id, 'failed', attempt, str(e))
+                    print(f"Error sending email to {message['To']}: {e}")
+                    return False
+                self._set_status(message_id, 'retrying', attempt, str(e))
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    def _run(self):
+        while True:
+            message_id, message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                self.deliver(message_id, message)
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until everything queued so far has been delivered or has failed"""
+        self._queue.join()
+
+    def close(self, timeout=10):
+        """Deliver what is queued, stop the workers and close pooled connections"""
+        for _ in self._threads:
+            self._queue.put((None, None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self.pool.close()
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    """Returns the process-wide Mailer, started on first use and drained at exit"""
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer()
+                atexit.register(_mailer.close)
+    return _mailer
+
+def send_email(message):
+    """Send a message through the shared pool; returns whether it was queued (or sent, when MAIL_ASYNC is off)"""
+    mailer = get_mailer()
+    if MAIL_ASYNC:
+        return mailer.send(message) is not None
+    return mailer.deliver(uuid.uuid4().hex, message)
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        self.reply('220 localhost LaterGram mail sink')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                self.server.received.append({'from': sender, 'to': recipients, 'data': b''.join(lines).decode('utf-8', 'replace')})
+                if self.server.on_message:
+                    self.server.on_message(self.server.received[-1])
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+class LocalSMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server that accepts every message and keeps it in `received`, for tests and local debugging.
+    Point the app at it with SMTP_SERVER=localhost, SMTP_PORT=<port> and SMTP_STARTTLS=false.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='localhost', port=0, on_message=None):
+        super().__init__((host, port), _SinkHandler)
+        self.received = []
+        self.on_message = on_message
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+# Cost factor for new hashes; stored hashes with a different cost are rehashed at the next successful login
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+# Hashes running or waiting at once; past this, callers wait up to PASSWORD_HASH_TIMEOUT for a slot
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))  # seconds
+
+class PasswordHasherBusy(Exception):
+    """Raised when no hashing slot frees up within the timeout"""
+
+def _hash_cost(pw_hash):
+    try:
+        return int(pw_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool instead of the request thread. bcrypt releases the GIL while hashing,
+    so the workers hash in parallel; the pending cap keeps a login burst from queueing without limit.
+    Hashes are compatible with Flask-Bcrypt's.
+    """
+    def __init__(self, rounds=BCRYPT_LOG_ROUNDS, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('Too many password checks in progress')
+        submitted = time.perf_counter()
+
+        def timed():
+            queue_ms = (time.perf_counter() - submitted) * 1000
+            with self._lock:
+                self.completed += 1
+                self.total_queue_ms += queue_ms
+                self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+            return fn(*args)
+
+        try:
+            return self._executor.submit(timed).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost, as a str"""
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8'))
+
+    def check(self, pw_hash, password):
+        """Whether password matches pw_hash; malformed hashes never match"""
+        def checkpw():
+            try:
+                return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+            except ValueError:
+                return False
+        return self._run(checkpw)
+
+    def needs_rehash(self, pw_hash):
+        return _hash_cost(pw_hash) != self.rounds
+
+    def verify_and_update(self, account, password):
+        """
+        Check password against account.password. On a match with an outdated cost the stored hash is
+        replaced in the current session, to be saved by the caller's commit.
+        """
+        if not account.password or not self.check(account.password, password):
+            return False
+        if self.needs_rehash(account.password):
+            account.password = self.hash(password)
+            with self._lock:
+                self.rehashed += 1
+        return True
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'avg_queue_ms': round(self.total_queue_ms / self.completed, 2) if self.completed else 0.0,
+                'max_queue_ms': round(self.max_queue_ms, 2)
+            }
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+def get_password_hasher():
+    """Returns the process-wide PasswordHasher"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
@@ -1,6 +1,19 @@
 import os
 import json
 import re
+import threading
+import time
+
+# Seconds between checks of words.json for changes
+PROFANITY_RELOAD_INTERVAL = float(os.environ.get('PROFANITY_RELOAD_INTERVAL', '5'))
+
+# Common character substitutions; the word list is normalized with them and the text may use any of them
+LEET_TABLE = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '@': 'a', '$': 's', '!': 'i', '+': 't'}
+
+def normalize(word):
+    """Lowercase, undo leetspeak and collapse whitespace runs"""
+    word = re.sub(r'\s+', ' ', word.lower())
+    return ''.join(LEET_TABLE.get(c, c) for c in word)
 
 def load_profanity_list(filename):
     base_path = os.path.dirname(os.path.abspath(__file__))
@@ -10,9 +23,79 @@ def load_profanity_list(filename):
         words = json.load(f)
         return set(word.strip().lower() for word in words if isinstance(word, str) and word.strip())
 
+class ProfanityMatcher:
+    """
+    Trie of the normalized word list compiled into a single regular expression, so the text is scanned once
+    by the regex engine. Each trie edge accepts every spelling of its character ('s' matches s, 5 or $) and
+    phrase spaces accept any run of whitespace. A word or phrase only counts when it is not part of a longer word.
+    """
+    def __init__(self, words):
+        spellings = {}
+        for source, target in LEET_TABLE.items():
+            spellings.setdefault(target, [target]).append(source)
+        self._spellings = spellings
+        trie = {}
+        for word in words:
+            node = trie
+            for c in normalize(word):
+                node = node.setdefault(c, {})
+            node[''] = {}  # end of a word
+        # Starting with a non-word character lets the engine skip straight to word boundaries;
+        # matches() prefixes a space so a match can start at the beginning of the text
+        self._pattern = re.compile(r'[^\w](?:' + self._compile(trie) + r')(?!\w)' if trie else r'(?!)')
 
-PROFANE_WORDS = load_profanity_list('words.json')
-def check_profanity(text):
-    words = re.findall(r'\b\w+\b', text.lower())
-    return any(word in PROFANE_WORDS for word in words)
+    def _edge(self, c):
+        if c == ' ':
+            return r'\s+'
+        options = self._spellings.get(c)
+        if not options:
+            return re.escape(c)
+        return '[' + ''.join(re.escape(option) for option in options) + ']'
+
+    def _compile(self, node):
+        branches = [self._edge(c) + self._compile(child) for c, child in sorted(node.items()) if c]
+        if not branches:
+            return ''
+        if '' in node:
+            return '(?:' + '|'.join(branches) + ')?'
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    def matches(self, text):
+        """Whether text contains a listed word or phrase"""
+        return self._pattern.search(' ' + text.lower()) is not None
 
+class ReloadingProfanityMatcher:
+    """Rebuilds the matcher when words.json changes, checking at most every PROFANITY_RELOAD_INTERVAL seconds"""
+    def __init__(self, filename, reload_interval=PROFANITY_RELOAD_INTERVAL):
+        self.path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+        self.filename = filename
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(self.path)
+        self._checked_at = time.monotonic()
+        self._matcher = ProfanityMatcher(load_profanity_list(filename))
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                # Build the new matcher before swapping it in; other threads keep using the old one meanwhile
+                self._matcher = ProfanityMatcher(load_profanity_list(self.filename))
+                self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Error reloading profanity list, keeping the current one: {e}")
+        finally:
+            self._lock.release()
+
+    def matches(self, text):
+        self._maybe_reload()
+        return self._matcher.matches(text)
+
+PROFANITY_MATCHER = ReloadingProfanityMatcher('words.json')
+
+def check_profanity(text):
+    return PROFANITY_MATCHER.matches(text)
@@ -0,0 +1,31 @@
+import os
+import time
+import redis
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+RETRY_INTERVAL = 30  # seconds to wait before retrying an unreachable Redis
+
+_client = None
+_last_failure = 0.0
+
+def get_redis_client():
+    """
+    Returns a shared Redis client, or None if REDIS_URL is not set or Redis is unreachable.
+    Callers are expected to fall back to an in-process implementation when None is returned.
+    """
+    global _client, _last_failure
+    if not REDIS_URL:
+        return None
+    if _client is not None:
+        return _client
+    if time.time() - _last_failure < RETRY_INTERVAL:
+        return None
+    try:
+        client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        client.ping()
+        _client = client
+    except Exception as e:
+        print(f"Redis unavailable at {REDIS_URL}, using in-process fallback: {e}")
+        _last_failure = time.time()
+        return None
+    return _client
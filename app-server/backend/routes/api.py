@@ -1,19 +1,62 @@
-from flask import request, jsonify, Blueprint, redirect, url_for, session, flash
-from models import db, Post, User, Report, Comment
+from flask import request, jsonify, Blueprint, redirect, url_for, session, flash, current_app
+from models import db, Post, User, Report
 from datetime import datetime, timezone
-from models.enums import ReportStatus, ReportTarget, LogActionTypes
+from models.enums import ReportStatus, ReportTarget, LogActionTypes, CommentType
 from backend.splunk_utils import log_to_splunk
 from backend.profanity_helper import check_profanity
 from backend.logging_utils import log_action
-from managers import get_auth_manager, get_profile_manager, get_post_manager
+from managers import get_auth_manager, get_profile_manager, get_post_manager, get_feed_manager
 # from backend.limiter import limiter
 from backend.limiter import rate_limit_required
+from backend.typeahead_utils import get_username_typeahead, TYPEAHEAD_ENABLED
+from backend.search_utils import followed_author_ids, can_see_posts
+from backend.api_utils import Listing, listing_args, wants_ndjson
 
 api_bp = Blueprint('api', __name__)
 
 profile_manager = get_profile_manager()
 post_manager = get_post_manager()
 auth_manager = get_auth_manager()
+feed_manager = get_feed_manager()
+
+# Newest first, served from idx_post_time_id
+POST_LISTING = Listing('post p', {
+    'postId': 'p.postId',
+    'authorId': 'p.authorId',
+    'title': 'p.title',
+    'content': 'p.content',
+    'timeOfPost': 'p.timeOfPost',
+    'like': 'p.`like`',
+    'image': 'p.image',
+}, time_column='p.timeOfPost', id_column='p.postId')
+
+# Oldest first, the order comments are shown under a post
+COMMENT_LISTING = Listing('comment c', {
+    'commentId': 'c.commentId',
+    'postId': 'c.postId',
+    'authorId': 'c.authorId',
+    'commentContent': 'c.commentContent',
+    'timestamp': 'c.timestamp',
+    'edited_at': 'c.edited_at',
+    'is_edited': 'c.edited_at IS NOT NULL',
+    'parentCommentId': 'c.parentCommentId',
+}, time_column='c.timestamp', id_column='c.commentId', descending=False, converters={'is_edited': bool})
+
+def list_rows(listing, key, where='', params=None):
+    """
+    A page of listing as {'success', key: [...], 'next_cursor'}, or every row after ?cursor= as streamed NDJSON.
+    ?fields= selects the fields returned and ?limit= the number of rows.
+    """
+    streaming = wants_ndjson()
+    try:
+        fields, cursor, limit = listing_args(streaming)
+        fields = listing.parse_fields(fields)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if streaming:
+        return listing.stream(fields, where, params, cursor, limit)
+    items, next_cursor = listing.page(fields, where, params, cursor, limit)
+    return jsonify({'success': True, key: items, 'next_cursor': next_cursor})
 
 @api_bp.route('/report_post/<int:post_id>', methods=['POST'])
 def api_report_post(post_id):
@@ -226,30 +269,35 @@ def api_update_profile(user_id):
 
 @api_bp.route('/posts', methods=['GET'])
 def api_get_posts():
-    posts = Post.query.all()
-    return jsonify([{
-        'postId': post.postId,
-        'authorId': post.authorId,
-        'title': post.title,
-        'content': post.content,
-        'timeOfPost': post.timeOfPost,
-        'like': post.like,
-        'image': post.image
-    } for post in posts])
+    return list_rows(POST_LISTING, 'posts')
+
+@api_bp.route('/feed', methods=['GET'])
+def api_get_feed():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not logged in'}), 401
+    cursor = request.args.get('cursor')
+    if request.args.get('following') == '1':
+        posts = feed_manager.filter_by_following(session['user_id'], cursor=cursor)
+    else:
+        posts = feed_manager.load_more_posts(session['user_id'], cursor=cursor)
+    return jsonify({
+        'success': True,
+        'posts': [{
+            'postId': post.postId,
+            'authorId': post.authorId,
+            'title': post.title,
+            'content': post.content,
+            'timeOfPost': post.timeOfPost,
+            'like': post.like,
+            'image': post.image
+        } for post in posts],
+        'next_cursor': feed_manager.get_next_cursor(posts)
+    })
 
 @api_bp.route('/comments/<int:post_id>', methods=['GET'])
 def api_get_comments(post_id):
-    comments = Comment.query.filter_by(postId=post_id).all()
-    return jsonify([{
-        'commentId': comment.commentId,
-        'postId': comment.postId,
-        'authorId': comment.authorId,
-        'commentContent': comment.commentContent,
-        'timestamp': comment.timestamp,
-        'edited_at': comment.edited_at,
-        'is_edited': comment.is_edited(),
-        'parentCommentId': comment.parentCommentId
-    } for comment in comments])
+    return list_rows(COMMENT_LISTING, 'comments', 'c.postId = :post_id AND c.commentType = :comment_type',
+                     {'post_id': post_id, 'comment_type': CommentType.COMMENT.value})
 
 @api_bp.route('/search_users')
 def api_search_users():
@@ -258,13 +306,27 @@ def api_search_users():
     query = request.args.get('q', '')
     if not query:
         return jsonify({'success': True, 'users': []})
-    search_result = profile_manager.search_users(query, per_page=5)
+    # Answered from the in-memory username trie; the database search is only used until it has loaded.
+    # The trie starts loading on the first search, so CLI commands importing the app never build it.
+    typeahead = get_username_typeahead()
+    if TYPEAHEAD_ENABLED:
+        typeahead.start(current_app._get_current_object())
+    completions = typeahead.complete(query, 5)
+    if completions is not None:
+        viewer_id = session['user_id']
+        followed = set(followed_author_ids(viewer_id)) if completions else set()
+        users = [{'user_id': user_id, 'username': username, 'profile_picture': picture,
+                  'can_see_posts': can_see_posts(viewer_id, user_id, visibility, followed)}
+                 for user_id, username, picture, visibility in completions]
+        return jsonify({'success': True, 'users': users})
+    search_result = profile_manager.search_users(query, per_page=5, viewer_id=session['user_id'])
     if search_result['success']:
         users = [
             {
                 'user_id': u['user']['user_id'],
                 'username': u['user']['username'],
-                'profile_picture': u['user']['profile_picture']
+                'profile_picture': u['user']['profile_picture'],
+                'can_see_posts': u['can_see_posts']
             } for u in search_result['users']
         ]
         return jsonify({'success': True, 'users': users})
@@ -278,7 +340,7 @@ def api_search_posts():
     query = request.args.get('q', '')
     if not query:
         return jsonify({'success': True, 'posts': []})
-    search_result = post_manager.search_posts_by_title(query, per_page=5)
+    search_result = post_manager.search_posts_by_title(query, per_page=5, viewer_id=session['user_id'])
     if search_result['success']:
         posts = [
             {
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, redirect, url_for, session
 from datetime import datetime, timezone
 from models import db, Post, Comment, User
 from managers.authentication_manager import LogActionTypes, ReportTarget
+from models.enums import CommentType
 from backend.splunk_utils import log_to_splunk
 from backend.logging_utils import log_action
 
@@ -46,7 +47,7 @@ def add_comment(post_id):
             return jsonify({
                 'success': True, 
                 'message': 'Comment added successfully',
-                'comment_count': Comment.query.filter_by(postId=post_id, parentCommentId=None).filter(~Comment.commentContent.like('__LIKE__%')).count()
+                'comment_count': Comment.query.filter_by(postId=post_id, parentCommentId=None, commentType=CommentType.COMMENT.value).count()
             })
     
     return redirect(url_for('main.home'))
\ No newline at end of file
@@ -1,6 +1,6 @@
 from flask import jsonify, Blueprint, session
 from models import db, Post, User, Comment
-from models.enums import ReportTarget, LogActionTypes
+from models.enums import ReportTarget, LogActionTypes, CommentType
 from backend.splunk_utils import log_to_splunk
 from backend.logging_utils import log_action
 
@@ -32,7 +32,7 @@ def delete_comment(comment_id):
         db.session.commit()
         
         # Get updated comment count
-        comment_count = Comment.query.filter_by(postId=post_id, parentCommentId=None).filter(~Comment.commentContent.like('__LIKE__%')).count()
+        comment_count = Comment.query.filter_by(postId=post_id, parentCommentId=None, commentType=CommentType.COMMENT.value).count()
         log_to_splunk("Comment", "Comment deleted", username=db.session.get(User, session['user_id']).username, content=[comment_id, comment.commentContent])
         return jsonify({
             'success': True, 
@@ -1,6 +1,7 @@
-from flask import jsonify, Blueprint, session
-from models import db, Post
-from sqlalchemy import text
+from flask import jsonify, Blueprint, request, session
+from models import Post
+from backend.comment_utils import comment_page
+from backend.cursor_utils import decode_cursor
 
 load_comment_bp = Blueprint('load_comments', __name__)
 
@@ -14,42 +15,39 @@ def load_comments(post_id):
         # Get post information to check ownership
         post = Post.query.get_or_404(post_id)
         
-        # Get comments for the post with author information
-        comments_query = text("""
-            SELECT c.commentId, c.commentContent, c.timestamp, c.edited_at, c.parentCommentId,
-                   u.username, u.profilePicture
-            FROM comment c
-            JOIN user u ON c.authorId = u.userId
-            WHERE c.postId = :post_id
-            AND c.parentCommentId IS NULL
-            AND NOT c.commentContent LIKE '__LIKE__%'
-            ORDER BY c.timestamp DESC
-            LIMIT 10
-        """)
-        
-        result = db.session.execute(comments_query, {"post_id": post_id}).fetchall()
+        # A page of top-level comments, or of the replies to ?parent=; ?cursor= continues from next_cursor
+        parent_id = request.args.get('parent', type=int)
+        cursor = request.args.get('cursor')
+        position = decode_cursor(cursor) if cursor else None
+        if cursor and position is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        result, next_cursor = comment_page(post_id, parent_id, position)
         
         comments = []
         for row in result:
             # Format timestamps
-            timestamp_str = row.timestamp.strftime('%b %d, %Y at %I:%M %p') if row.timestamp else ''
-            edited_at_str = row.edited_at.strftime('%b %d, %Y at %I:%M %p') if row.edited_at else None
+            timestamp_str = row['timestamp'].strftime('%b %d, %Y at %I:%M %p') if row['timestamp'] else ''
+            edited_at_str = row['edited_at'].strftime('%b %d, %Y at %I:%M %p') if row['edited_at'] else None
             
             comments.append({
-                'commentId': row.commentId,
-                'content': row.commentContent,
+                'commentId': row['commentId'],
+                'content': row['commentContent'],
                 'timestamp': timestamp_str,
                 'edited_at': edited_at_str,
-                'is_edited': row.edited_at is not None,
+                'is_edited': row['edited_at'] is not None,
+                'parentCommentId': row['parentCommentId'],
+                'reply_count': row['reply_count'],
                 'author': {
-                    'username': row.username,
-                    'profilePicture': row.profilePicture or ''
+                    'username': row['username'],
+                    'profilePicture': row['profilePicture'] or ''
                 }
             })
         
         return jsonify({
             'success': True, 
             'comments': comments,
+            'next_cursor': next_cursor,
+            'parent_id': parent_id,
             'post_owner_id': post.authorId,
             'current_user_id': session['user_id']
         })
@@ -1,17 +1,21 @@
-from flask import Flask, request, jsonify, Blueprint, redirect, url_for, render_template, session, flash
-from managers import get_auth_manager, get_feed_manager, get_profile_manager, get_post_manager
+from flask import Flask, request, jsonify, Blueprint, redirect, url_for, render_template, session, flash, make_response, abort, send_from_directory
+from managers import get_auth_manager, get_feed_manager, get_profile_manager, get_post_manager, get_home_page_loader
 from sqlalchemy import text, or_
 from models import db, User, Moderator, Post, Comment, Report
 from backend.splunk_utils import log_to_splunk
-from backend.captcha_utils import IS_TESTING, verify_recaptcha
+from backend.captcha_utils import verify_recaptcha
 from backend.profanity_helper import check_profanity
 from backend.logging_utils import log_action
-from backend.firebase_utils import ensure_firebase_initialized
+from backend.counter_utils import adjust_user_counters
+from backend.storage_utils import STORAGE_BACKEND, LOCAL_STORAGE_DIR
+from backend.upload_utils import get_upload_pipeline
+from backend.image_utils import processed_image_key, post_image_variants, avatar_variants
+from backend.blob_utils import content_hash, release_image_url
+from backend.typeahead_utils import get_username_typeahead
 from datetime import datetime, timedelta, timezone
 from models.enums import ReportTarget, LogActionTypes
 from werkzeug.utils import secure_filename
-import uuid, re, magic, os
-from firebase_admin import storage
+import re, magic, os
 # from backend.limiter import limiter
 from backend.limiter import rate_limit_required
 from flask_wtf.csrf import generate_csrf
@@ -21,6 +25,7 @@ auth_manager = get_auth_manager()
 feed_manager = get_feed_manager()
 profile_manager = get_profile_manager()
 post_manager = get_post_manager()
+home_page_loader = get_home_page_loader()
 
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
 ALLOWED_MIME_TYPES = {'image/jpeg', 'image/png'}
@@ -45,57 +50,15 @@ def home():
     if 'mod_id' in session:
         return redirect(url_for('moderation.moderation'))
     
-    try:
-        posts = feed_manager.generate_feed(session['user_id'])
-    except Exception as e:
-        print(f"Error getting posts: {e}")
-        posts = []
-    
-    # Get all required data in parallel to reduce sequential database calls
-    user_stats = {'posts_count': 0, 'followers_count': 0, 'following_count': 0}
-    suggested_users = []
-    pending_requests = []
-    liked_posts = {}
-    
-    try:
-        # Get user stats with caching
-        user_stats = profile_manager.get_user_stats_cached(session['user_id'])
-    except Exception as e:
-        print(f"Error getting user stats: {e}")
-    
-    try:
-        # Get suggested users (users not followed) with caching
-        suggested_users = profile_manager.get_suggested_users_cached(session['user_id'])
-    except Exception as e:
-        print(f"Error getting suggested users: {e}")
-    
-    try:
-        # Get pending follow requests
-        follow_requests = profile_manager.get_pending_follow_requests(session['user_id'])
-        pending_requests = follow_requests.get('requests', []) if follow_requests.get('success') else []
-
-    except Exception as e:
-        print(f"Error getting follow requests: {e}")
-    
-    # Check which posts the current user has liked (optimized batch processing)
-    try:
-        if posts:
-            post_ids = [post.postId for post in posts]
-            liked_posts = post_manager.get_posts_with_likes_batch(post_ids, session['user_id'])
-            # get comment counts for all posts
-            comment_counts = feed_manager.get_comment_counts_batch(post_ids)
-        else:
-            liked_posts = {}
-            comment_counts = {}
-    except Exception as e:
-        print(f"Error getting liked posts or comment counts: {e}")
-        liked_posts = {post.postId: False for post in posts} if posts else {}
-        comment_counts = {post.postId: 0 for post in posts} if posts else {}
+    # Opaque keyset cursor for older posts, passed back by the "Load older posts" link
+    cursor = request.args.get('cursor')
+    # Independent sections run concurrently on pooled connections, see HomePageLoader
+    page = home_page_loader.load(session['user_id'], cursor=cursor)
 
-    # Get current user for template context
-    current_user = User.query.filter_by(userId=session['user_id']).first()
-
-    return render_template('home.html', posts=posts, user_stats=user_stats, suggested_users=suggested_users, liked_posts=liked_posts, pending_requests=pending_requests, comment_counts=comment_counts, current_user=current_user)
+    response = make_response(render_template('home.html', posts=page.posts, user_stats=page.user_stats, suggested_users=page.suggested_users, liked_posts=page.liked_posts, pending_requests=page.pending_requests, comment_counts=page.comment_counts, current_user=page.current_user, next_cursor=page.next_cursor))
+    # Per-section timings, visible in the browser dev tools
+    response.headers['Server-Timing'] = page.server_timing()
+    return response
 
 @main_bp.route('/get-csrf-token', methods=['GET'])
 def get_csrf_token():
@@ -282,11 +245,15 @@ def is_allowed_file_secure(file):
     file.seek(0)
     return mime in ALLOWED_MIME_TYPES
 
+@main_bp.route('/media/<path:key>')
+def media(key):
+    """Serves uploads stored by the local storage backend"""
+    if STORAGE_BACKEND != 'local':
+        abort(404)
+    return send_from_directory(LOCAL_STORAGE_DIR, key)
+
 @main_bp.route('/create-post', methods=['GET', 'POST'])
 def create_post():
-    if not IS_TESTING:
-        ensure_firebase_initialized()
-    
     # moderators cannot create posts
     if 'mod_id' in session:
         return redirect(url_for('moderation.moderator'))
@@ -305,8 +272,6 @@ def create_post():
             log_to_splunk("Create Post", "Post creation failed - profanity detected", username=db.session.get(User, session['user_id']).username)
             return jsonify({'success': False, 'error': 'Profanity detected in title or content.'}), 400
 
-        image_url = "https://fastly.picsum.photos/id/404/200/300.jpg?hmac=..."  #default 
-
         # Handle file upload
         image_file = request.files.get('image')
         if image_file and image_file.filename != '':
@@ -322,10 +287,7 @@ def create_post():
                 return jsonify({'success': False, 'error': 'Invalid image format. Allowed: jpg, png'}), 400
             
             filename = secure_filename(image_file.filename)
-            blob = storage.bucket().blob(f'posts/{uuid.uuid4()}_{filename}')
-            blob.upload_from_file(image_file, content_type=image_file.content_type)
-            blob.make_public()
-            image_url = blob.public_url
+            image_key = processed_image_key('posts', content_hash(image_file), filename)
         else:
             log_to_splunk("Create Post", "Post created failed", username=db.session.get(User, session['user_id']).username)
             return jsonify({'success': False, 'error': 'Image upload failed or no image provided.'}), 400
@@ -346,16 +308,30 @@ def create_post():
             timeOfPost=datetime.now(timezone.utc),
             like=0,
             likesId=likes_id,
-            image=image_url
+            image=None  # set by the upload pipeline once the image is stored
         )
 
         db.session.add(new_post)
         db.session.flush()
+        adjust_user_counters(session['user_id'], posts=1)
 
         # Create a new log entry
         log_action(session['user_id'], LogActionTypes.CREATE_POST.value, new_post.postId, ReportTarget.POST.value)
         db.session.commit()
-        log_to_splunk("Create Post", "Post created successfully", username=db.session.get(User, session['user_id']).username, content=[title, content, image_url])
+        post_id, user_id, time_of_post = new_post.postId, session['user_id'], new_post.timeOfPost
+
+        # The post reaches timelines once its image is attached; if the image can't be stored the post is
+        # deleted again, since posts require an image
+        def attach(url):
+            if not post_manager.attach_post_image(post_id, url):
+                return False
+            feed_manager.publish_post(post_id, user_id, time_of_post)
+            return True
+
+        get_upload_pipeline().submit(image_file, image_key, image_file.content_type, ('post', post_id), attach,
+                                     processor=post_image_variants,
+                                     on_failure=lambda: post_manager.delete_post(post_id, user_id))
+        log_to_splunk("Create Post", "Post created successfully", username=db.session.get(User, session['user_id']).username, content=[title, content, image_key])
         flash("Post created successfully!", "success")
         return redirect(url_for('main.home'))
     
@@ -370,14 +346,13 @@ def search():
     query = request.args.get('q', '')
     results = []
     if query:
-        search_result = profile_manager.search_users(query)
+        search_result = profile_manager.search_users(query, viewer_id=session['user_id'])
         if search_result['success']:
             results = search_result['users']
     return redirect(url_for('main.home'))
 
 @main_bp.route('/remove-profile-picture', methods=['POST'])
 def remove_profile_picture():
-    ensure_firebase_initialized()
     if 'user_id' not in session:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify(success=False, message='Not logged in'), 401
@@ -391,21 +366,17 @@ def remove_profile_picture():
         flash(msg, 'warning')
         return redirect(url_for('main.edit_profile'))
 
-    # Delete from Firebase Storage if exists and is a Firebase URL
-    if user.profilePicture and 'appspot.com' in user.profilePicture:
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(user.profilePicture)
-            blob_name = parsed.path.lstrip('/')
-            blob = storage.bucket().blob(blob_name)
-            blob.delete()
-        except Exception as e:
-            print(f"Error deleting profile picture from storage: {e}")
+    # A picture still uploading would otherwise replace the removed one when it finishes
+    get_upload_pipeline().cancel(('profile', user.userId))
 
     # Remove from user profile and commit
+    previous_picture = user.profilePicture
     user.profilePicture = ''  # Set to empty string, not None
     try:
         db.session.commit()
+        get_username_typeahead().record(user.userId, user.username, '', user.visibility)
+        # Deleted from storage only if no other post or profile uses the same image
+        release_image_url(previous_picture)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify(success=True)
         flash('Profile picture removed.', 'success')
@@ -450,7 +421,6 @@ def delete_account():
 
 @main_bp.route('/edit-profile', methods=['GET', 'POST'])
 def edit_profile():
-    ensure_firebase_initialized()
     if 'user_id' not in session:
         return redirect(url_for('main.login'))
     
@@ -464,26 +434,37 @@ def edit_profile():
         bio = request.form.get('bio')
         visibility = request.form.get('visibility')
 
-        # Handle profile picture upload
+        # Check if this is an AJAX request
+        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
         profile_pic_file = request.files.get('profile_picture')
-        profile_pic_url = user.profilePicture  # Default to current
-        if profile_pic_file and profile_pic_file.filename != '':
-            filename = secure_filename(profile_pic_file.filename)
-            blob = storage.bucket().blob(f'profile_pics/{uuid.uuid4()}_{filename}')
-            blob.upload_from_file(profile_pic_file, content_type=profile_pic_file.content_type)
-            blob.make_public()
-            profile_pic_url = blob.public_url
+        has_profile_pic = profile_pic_file and profile_pic_file.filename != ''
+        if has_profile_pic:
+            profile_pic_file.seek(0, 2)
+            too_large = profile_pic_file.tell() > MAX_IMAGE_SIZE_BYTES
+            profile_pic_file.seek(0)
+            if too_large or not is_allowed_file_secure(profile_pic_file):
+                error = f'Invalid image. Allowed: jpg, png up to {MAX_IMAGE_SIZE_MB}MB'
+                if is_ajax:
+                    return jsonify({'success': False, 'error': error})
+                flash(error, 'danger')
+                return render_template('edit_profile.html', user=user, current_user=user)
 
         result = profile_manager.update_profile(
             session['user_id'], 
             display_name=display_name, 
             bio=bio, 
-            visibility=visibility,
-            profile_picture_url=profile_pic_url
+            visibility=visibility
         )
-        
-        # Check if this is an AJAX request
-        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+        # Handle profile picture upload; the picture is swapped in once it and its thumbnails are stored
+        profile_pic_url = user.profilePicture  # Default to current
+        if result['success'] and has_profile_pic:
+            filename = secure_filename(profile_pic_file.filename)
+            profile_pic_url = processed_image_key('profile_pics', content_hash(profile_pic_file), filename)
+            user_id = session['user_id']
+            get_upload_pipeline().submit(profile_pic_file, profile_pic_url, profile_pic_file.content_type, ('profile', user_id),
+                                         lambda url: profile_manager.set_profile_picture(user_id, url), processor=avatar_variants)
         
         if result['success']:
             if is_ajax:
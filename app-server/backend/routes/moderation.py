@@ -1,5 +1,6 @@
 from flask import request, Blueprint, render_template, redirect, url_for, session, flash
 from models import Post, User, Comment
+from models.enums import LogActionTypes
 from datetime import datetime, timezone
 from backend.splunk_utils import log_to_splunk
 from managers import get_moderator_manager
@@ -7,6 +8,8 @@ from managers import get_moderator_manager
 moderation_bp = Blueprint('moderation', __name__)
 moderator_manager = get_moderator_manager()
 
+LOG_ARGS = ('log_cursor', 'log_dir', 'log_action', 'log_user', 'log_from', 'log_to')
+
 # Moderator routes
 @moderation_bp.route('/')
 def moderation():
@@ -16,8 +19,10 @@ def moderation():
 
     # Pagination parameters
     page = request.args.get('page', 1, type=int)
-    log_page = request.args.get('log_page', 1, type=int)
     per_page = 20
+    # Application log filters and keyset position, kept in every pagination link
+    log_args = {key: request.args.get(key) for key in LOG_ARGS if request.args.get(key)}
+    application_log = None
 
     try:
         # Pending reports for the first table
@@ -26,7 +31,15 @@ def moderation():
         all_reports_query = moderator_manager.get_all_reports_query(session['mod_level'])
         paginated_reports = all_reports_query.paginate(page=page, per_page=per_page, error_out=False)
         # Application user log for the log table
-        application_log = moderator_manager.get_application_log(page=log_page, per_page=per_page)
+        application_log = moderator_manager.get_application_log(
+            per_page=per_page,
+            cursor=log_args.get('log_cursor'),
+            direction=log_args.get('log_dir', 'older'),
+            action=log_args.get('log_action'),
+            user_id=_resolve_log_user(log_args.get('log_user')),
+            start_date=_parse_date(log_args.get('log_from')),
+            end_date=_parse_date(log_args.get('log_to'))
+        )
 
     except Exception as e:
         print(f"Error getting reports: {e}")
@@ -38,8 +51,24 @@ def moderation():
         reports=reports,
         paginated_reports=paginated_reports,
         application_log=application_log,
+        log_args=log_args,
+        log_filters={key: value for key, value in log_args.items() if key not in ('log_cursor', 'log_dir')},
+        log_actions=[action.value for action in LogActionTypes],
     )
 
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+def _resolve_log_user(username):
+    """Log filter by username; an unknown name matches nothing"""
+    if not username:
+        return None
+    user = User.query.filter_by(username=username).first()
+    return user.userId if user else -1
+
 @moderation_bp.route('/report/<int:report_id>')
 def report_detail(report_id):
     # moderator check
@@ -0,0 +1,37 @@
+from models import db
+from sqlalchemy import text
+
+def index_exists(table, name):
+    return db.session.execute(text("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :name
+        LIMIT 1
+    """), {"table": table, "name": name}).first() is not None
+
+def column_exists(table, column):
+    return db.session.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :column
+        LIMIT 1
+    """), {"table": table, "column": column}).first() is not None
+
+def ensure_column(table, column, definition):
+    """Adds the column to a table created before it was in the model. Returns True if it was added."""
+    if column_exists(table, column):
+        return False
+    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    db.session.commit()
+    return True
+
+def ensure_index(table, name, columns, kind='', parser=None):
+    """
+    Creates the index on a raw-SQL table (one without a model, so create_all can't) if it is missing.
+    kind is '' for a regular index or e.g. 'FULLTEXT', optionally WITH PARSER parser.
+    Returns True if the index was created.
+    """
+    if index_exists(table, name):
+        return False
+    parser_clause = f" WITH PARSER {parser}" if parser else ''
+    db.session.execute(text(f"CREATE {kind + ' ' if kind else ''}INDEX {name} ON {table} ({', '.join(columns)}){parser_clause}"))
+    db.session.commit()
+    return True
@@ -0,0 +1,114 @@
+import os
+import re
+from sqlalchemy import text
+from models import db
+from backend.cache_utils import LocalCache, get_cache
+from backend.schema_utils import index_exists, ensure_index
+
+# innodb's ngram_token_size; query words shorter than this can't use the FULLTEXT index
+NGRAM_TOKEN_SIZE = int(os.environ.get('NGRAM_TOKEN_SIZE', '2'))
+# Set SEARCH_FULLTEXT_ENABLED to false to always search with LIKE
+SEARCH_FULLTEXT_ENABLED = os.getenv("SEARCH_FULLTEXT_ENABLED", "true").lower() == "true"
+# Viewers following more authors than this are filtered with a followers subquery instead of an id list
+SEARCH_FOLLOWED_AUTHORS_MAX = int(os.environ.get('SEARCH_FOLLOWED_AUTHORS_MAX', '5000'))
+FOLLOWED_AUTHORS_CACHE_SIZE = int(os.environ.get('FOLLOWED_AUTHORS_CACHE_SIZE', '20000'))
+
+# ngram FULLTEXT indexes keep the substring matching of the previous LIKE '%query%' searches
+SEARCH_INDEXES = [
+    ('user', 'ft_user_username', ['username']),
+    ('post', 'ft_post_title', ['title']),
+]
+# Serves prefix matches for queries too short for the ngram index
+PREFIX_INDEXES = [
+    ('post', 'idx_post_title', ['title']),
+]
+
+_index_checks = LocalCache(max_entries=len(SEARCH_INDEXES), ttl=300)
+
+def fulltext_query(query):
+    """
+    Boolean-mode AGAINST() argument requiring every word of the query as a substring, or None if no word
+    is long enough for the ngram index. Operators in the input are dropped rather than interpreted.
+    """
+    words = [word for word in re.findall(r'\w+', query.lower()) if len(word) >= NGRAM_TOKEN_SIZE]
+    if not words:
+        return None
+    return ' '.join(f'+"{word}"' for word in words)
+
+def like_prefix(query):
+    """LIKE pattern for values starting with query, with LIKE wildcards escaped"""
+    return re.sub(r'([\\%_])', r'\\\1', query) + '%'
+
+def fulltext_available(table):
+    """Whether the search index on table exists; rechecked every few minutes so new indexes are picked up"""
+    if not SEARCH_FULLTEXT_ENABLED:
+        return False
+    found, available = _index_checks.get(table)
+    if not found:
+        name = next(name for index_table, name, _ in SEARCH_INDEXES if index_table == table)
+        try:
+            available = index_exists(table, name)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error checking search index on {table}: {e}")
+            available = False
+        _index_checks.set(table, available)
+    return available
+
+def ensure_search_indexes():
+    """Create the FULLTEXT and prefix indexes used by search; returns the names created"""
+    created = []
+    for table, name, columns in SEARCH_INDEXES:
+        # Stopwords would drop every ngram containing e.g. 'a' or 'i'; the setting is read at index creation,
+        # and set again for each index since the session may use a new connection after a commit
+        db.session.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+        if ensure_index(table, name, columns, kind='FULLTEXT', parser='ngram'):
+            created.append(name)
+    created += [name for table, name, columns in PREFIX_INDEXES if ensure_index(table, name, columns)]
+    _index_checks.clear()
+    return created
+
+_followed_authors = get_cache('followed_authors', FOLLOWED_AUTHORS_CACHE_SIZE, 300)
+
+def followed_author_ids(viewer_id):
+    """Ids of the authors viewer_id follows (accepted requests only), cached until a follow change clears them"""
+    if viewer_id is None:
+        return []
+    found, author_ids = _followed_authors.get(viewer_id)
+    if not found:
+        author_ids = [row.followedUserId for row in db.session.execute(text("""
+            SELECT followedUserId FROM followers WHERE followerUserId = :viewer_id AND status = 'accepted'
+        """), {"viewer_id": viewer_id})]
+        _followed_authors.set(viewer_id, author_ids)
+    return author_ids
+
+def forget_followed_authors(user_id):
+    """Drop the cached followed set of user_id in every process, after they follow or unfollow someone"""
+    _followed_authors.delete(user_id)
+
+def visible_author_clause(viewer_id, author_column, visibility_column):
+    """
+    SQL condition for rows whose author viewer_id may see: public authors, the viewer, and followers-only
+    authors the viewer follows. The followed authors come from the viewer's cached set and are inlined as
+    an id list, so the condition is checked on each candidate row without a followers lookup per row.
+    """
+    followed = followed_author_ids(viewer_id)
+    if len(followed) > SEARCH_FOLLOWED_AUTHORS_MAX:
+        followed_condition = f"""EXISTS (
+            SELECT 1 FROM followers f
+            WHERE f.followerUserId = :viewer_id AND f.followedUserId = {author_column} AND f.status = 'accepted'
+        )"""
+    elif followed:
+        followed_condition = f"{author_column} IN ({', '.join(str(int(author_id)) for author_id in followed)})"
+    else:
+        followed_condition = "FALSE"
+    return f"""({visibility_column} = 'Public' OR {author_column} = :viewer_id
+        OR ({visibility_column} = 'FollowersOnly' AND {followed_condition}))"""
+
+def can_see_posts(viewer_id, author_id, visibility, followed=None):
+    """The visible_author_clause rule for one author, with followed the viewer's followed_author_ids"""
+    if visibility == 'Public' or author_id == viewer_id:
+        return True
+    if visibility != 'FollowersOnly':
+        return False
+    return author_id in (followed_author_ids(viewer_id) if followed is None else followed)
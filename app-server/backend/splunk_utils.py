@@ -1,14 +1,120 @@
 from flask import request
+from collections import deque
+from requests.adapters import HTTPAdapter
 import requests
 import json
 import os
+import threading
+import time
+import atexit
 import urllib3
 
-SPLUNK_HEC_TOKEN = os.environ.get('SPLUNK_HEC_TOKEN', '') 
-SPLUNK_HEC_URL = os.environ.get('SPLUNK_HEC_URL', '') 
+SPLUNK_HEC_TOKEN = os.environ.get('SPLUNK_HEC_TOKEN', '')
+SPLUNK_HEC_URL = os.environ.get('SPLUNK_HEC_URL', '')
+# Ship events from a background thread in batches; set to false to post each event inline
+SPLUNK_ASYNC = os.getenv("SPLUNK_ASYNC", "true").lower() == "true"
+SPLUNK_QUEUE_SIZE = int(os.environ.get('SPLUNK_QUEUE_SIZE', '10000'))  # oldest events are dropped past this
+SPLUNK_BATCH_SIZE = int(os.environ.get('SPLUNK_BATCH_SIZE', '100'))
+SPLUNK_FLUSH_INTERVAL = float(os.environ.get('SPLUNK_FLUSH_INTERVAL', '1'))  # seconds
+SPLUNK_MAX_RETRIES = 3
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+class SplunkShipper:
+    """
+    Queues HEC events in a bounded buffer and POSTs them in batches from a background thread,
+    using HEC's multi-event format over one keep-alive session.
+    """
+    def __init__(self, url, token, queue_size=SPLUNK_QUEUE_SIZE, batch_size=SPLUNK_BATCH_SIZE,
+                 flush_interval=SPLUNK_FLUSH_INTERVAL, max_retries=SPLUNK_MAX_RETRIES, backoff=0.5):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Splunk {token}",
+            "Content-Type": "application/json"
+        })
+        self.session.verify = False
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self._queue = deque(maxlen=queue_size)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='splunk-shipper', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, payload):
+        """Queue an event without blocking; the oldest queued event is dropped when the buffer is full"""
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(payload)
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+    def _next_batch(self):
+        with self._condition:
+            if len(self._queue) < self.batch_size and not self._closed:
+                self._condition.wait(self.flush_interval)
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _send(self, batch):
+        # Multi-event format: one JSON object per event in a single request body
+        body = '\n'.join(json.dumps(payload) for payload in batch)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, data=body, timeout=5)
+                if response.status_code == 200:
+                    self.sent += len(batch)
+                    return True
+                # Client errors won't succeed on retry
+                if response.status_code < 500 and response.status_code != 429:
+                    print(f"Splunk HEC error: {response.status_code} - {response.text}")
+                    break
+                print(f"Splunk HEC unavailable: {response.status_code}")
+            except Exception as e:
+                print(f"Failed to send logs to Splunk: {e}")
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        self.dropped += len(batch)
+        print(f"Dropped {len(batch)} Splunk events after {self.max_retries} retries")
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+            elif self._closed:
+                return
+
+    def close(self, timeout=5):
+        """Flush what is queued and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        self.session.close()
+
+_shipper = None
+_shipper_lock = threading.Lock()
+
+def get_splunk_shipper():
+    """Returns the process-wide shipper, started on first use and flushed at exit"""
+    global _shipper
+    if _shipper is None:
+        with _shipper_lock:
+            if _shipper is None:
+                _shipper = SplunkShipper(SPLUNK_HEC_URL, SPLUNK_HEC_TOKEN)
+                atexit.register(_shipper.close)
+    return _shipper
+
 def get_real_ip():
     forwarded_for = request.headers.get('X-Forwarded-For')
     if forwarded_for:
@@ -16,8 +122,10 @@ def get_real_ip():
     return request.remote_addr
 
 def log_to_splunk(event_type, event_data=None, username=None, content=None):
-    client_ip = get_real_ip() 
+    client_ip = get_real_ip()
     payload = {
+        # Event time, since batched events reach Splunk after a delay
+        "time": time.time(),
         "event": {
             "type": event_type,  # e.g., "login", "create_post", etc.
             "message": event_data or {},
@@ -32,6 +140,10 @@ def log_to_splunk(event_type, event_data=None, username=None, content=None):
         "host": client_ip
     }
 
+    if SPLUNK_ASYNC and SPLUNK_HEC_URL:
+        get_splunk_shipper().enqueue(payload)
+        return
+
     headers = {
         "Authorization": f"Splunk {SPLUNK_HEC_TOKEN}",
         "Content-Type": "application/json"
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+# 'firebase' stores uploads in the Firebase bucket; 'local' writes them under LOCAL_STORAGE_DIR and serves them from /media
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'firebase').lower()
+LOCAL_STORAGE_DIR = os.environ.get('LOCAL_STORAGE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads'))
+LOCAL_STORAGE_URL = os.environ.get('LOCAL_STORAGE_URL', '/media/')
+
+class FirebaseStorage:
+    """Public objects in the Firebase Storage bucket"""
+    def _bucket(self):
+        from backend.firebase_utils import ensure_firebase_initialized
+        return ensure_firebase_initialized()
+
+    def put(self, key, file, content_type):
+        """Store the file under key and return its public URL"""
+        blob = self._bucket().blob(key)
+        blob.upload_from_file(file, content_type=content_type)
+        blob.make_public()
+        return blob.public_url
+
+    def url(self, key):
+        """Public URL of an object stored under key"""
+        return self._bucket().blob(key).public_url
+
+    def delete(self, key):
+        self._bucket().blob(key).delete()
+
+    def key_from_url(self, url):
+        """The object key of a URL returned by put, or None for URLs outside the bucket"""
+        if not url:
+            return None
+        bucket = self._bucket()
+        parsed = urlparse(url)
+        if parsed.netloc != 'storage.googleapis.com' or not parsed.path.startswith(f'/{bucket.name}/'):
+            return None
+        return parsed.path[len(bucket.name) + 2:]
+
+class LocalStorage:
+    """Files under a local directory, for development and offline tests"""
+    def __init__(self, root=LOCAL_STORAGE_DIR, base_url=LOCAL_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url
+
+    def path(self, key):
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.realpath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key, file, content_type):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name first so a file is never visible half-written
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+            shutil.copyfileobj(file, tmp)
+        os.replace(tmp.name, path)
+        return self.url(key)
+
+    def url(self, key):
+        return self.base_url + key
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def key_from_url(self, url):
+        if not url or not url.startswith(self.base_url):
+            return None
+        return url[len(self.base_url):]
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """Returns the configured storage backend"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = LocalStorage() if STORAGE_BACKEND == 'local' else FirebaseStorage()
+    return _storage
@@ -0,0 +1,149 @@
+import bisect
+import calendar
+import os
+import threading
+from datetime import datetime
+from backend.redis_utils import get_redis_client
+
+TIMELINE_MAX_LENGTH = int(os.environ.get('TIMELINE_MAX_LENGTH', '800'))  # entries kept per timeline
+# Without Redis, keep timelines in process memory. Each process only sees its own fan-out, so this is only
+# correct when the app runs as a single process; deployments with several workers need REDIS_URL.
+TIMELINE_LOCAL_FALLBACK = os.getenv("TIMELINE_LOCAL_FALLBACK", "false").lower() == "true"
+
+PUBLIC_KEY = 'timeline:public'
+READY_KEY = 'timeline:ready'
+CELEBRITIES_KEY = 'timeline:celebrities'
+
+def inbox_key(user_id):
+    return f'timeline:inbox:{user_id}'
+
+def author_key(user_id):
+    return f'timeline:author:{user_id}'
+
+def to_score(time_of_post):
+    """Convert a post timestamp (naive UTC from MySQL or timezone-aware) into a sorted set score"""
+    if time_of_post is None:
+        return 0.0
+    if isinstance(time_of_post, (int, float)):
+        return float(time_of_post)
+    if isinstance(time_of_post, str):
+        time_of_post = datetime.fromisoformat(time_of_post)
+    if time_of_post.tzinfo is not None:
+        return time_of_post.timestamp()
+    return calendar.timegm(time_of_post.timetuple()) + time_of_post.microsecond / 1e6
+
+class RedisTimelineBackend:
+    """Timelines stored as Redis sorted sets (member = postId, score = timeOfPost)"""
+    def __init__(self, client):
+        self.client = client
+
+    def add_many(self, key, entries):
+        if not entries:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(key, {str(post_id): score for post_id, score in entries})
+        # Trim to the newest TIMELINE_MAX_LENGTH entries
+        pipe.zremrangebyrank(key, 0, -(TIMELINE_MAX_LENGTH + 1))
+        pipe.execute()
+
+    def remove(self, keys, post_ids):
+        if not post_ids:
+            return
+        members = [str(post_id) for post_id in post_ids]
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(key, *members)
+        pipe.execute()
+
+    def entries(self, key, max_score=None, limit=50):
+        """Newest entries first as (post_id, score), optionally at or below max_score"""
+        max_value = '+inf' if max_score is None else max_score
+        rows = self.client.zrevrangebyscore(key, max_value, '-inf', start=0, num=limit, withscores=True)
+        return [(int(member), score) for member, score in rows]
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def set_add(self, key, value):
+        self.client.sadd(key, value)
+
+    def set_remove(self, key, value):
+        self.client.srem(key, value)
+
+    def set_members(self, key):
+        return {int(member) for member in self.client.smembers(key)}
+
+    def is_ready(self):
+        return bool(self.client.exists(READY_KEY))
+
+    def mark_ready(self):
+        self.client.set(READY_KEY, datetime.utcnow().isoformat())
+
+class LocalTimelineBackend:
+    """In-process fallback with the same interface, for single-process deployments without Redis"""
+    def __init__(self):
+        self._timelines = {}  # key -> ascending list of (score, post_id)
+        self._sets = {}
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _insert(self, key, post_id, score):
+        # Replace any existing entry for the post
+        timeline = [entry for entry in self._timelines.get(key, []) if entry[1] != post_id]
+        bisect.insort(timeline, (score, post_id))
+        self._timelines[key] = timeline
+        if len(timeline) > TIMELINE_MAX_LENGTH:
+            del timeline[:len(timeline) - TIMELINE_MAX_LENGTH]
+
+    def add_many(self, key, entries):
+        with self._lock:
+            for post_id, score in entries:
+                self._insert(key, int(post_id), score)
+
+    def remove(self, keys, post_ids):
+        removed = {int(post_id) for post_id in post_ids}
+        with self._lock:
+            for key in keys:
+                if key in self._timelines:
+                    self._timelines[key] = [entry for entry in self._timelines[key] if entry[1] not in removed]
+
+    def entries(self, key, max_score=None, limit=50):
+        with self._lock:
+            timeline = self._timelines.get(key, [])
+            end = len(timeline) if max_score is None else bisect.bisect_right(timeline, (max_score, float('inf')))
+            newest = timeline[max(0, end - limit):end]
+        return [(post_id, score) for score, post_id in reversed(newest)]
+
+    def delete(self, key):
+        with self._lock:
+            self._timelines.pop(key, None)
+
+    def set_add(self, key, value):
+        with self._lock:
+            self._sets.setdefault(key, set()).add(int(value))
+
+    def set_remove(self, key, value):
+        with self._lock:
+            self._sets.get(key, set()).discard(int(value))
+
+    def set_members(self, key):
+        with self._lock:
+            return set(self._sets.get(key, set()))
+
+    def is_ready(self):
+        return self._ready
+
+    def mark_ready(self):
+        self._ready = True
+
+_local_backend = LocalTimelineBackend()
+
+def get_timeline_store():
+    """
+    Returns the Redis timeline backend when available, otherwise the in-process fallback if
+    TIMELINE_LOCAL_FALLBACK is set, otherwise None (the feed query is used)
+    """
+    client = get_redis_client()
+    if client is not None:
+        return RedisTimelineBackend(client)
+    return _local_backend if TIMELINE_LOCAL_FALLBACK else None
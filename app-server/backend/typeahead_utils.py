@@ -0,0 +1,289 @@
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+from sqlalchemy import text
+from backend.redis_utils import get_redis_client
+
+TYPEAHEAD_ENABLED = os.getenv("TYPEAHEAD_ENABLED", "true").lower() == "true"
+TYPEAHEAD_SNAPSHOT_PATH = os.environ.get(
+    'TYPEAHEAD_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'typeahead', 'usernames.trie'))
+# Without Redis, other processes' changes are picked up by reloading this often (seconds)
+TYPEAHEAD_REFRESH_INTERVAL = int(os.environ.get('TYPEAHEAD_REFRESH_INTERVAL', '300'))
+# Redis stream of username changes, replayed on top of the snapshot by every process
+TYPEAHEAD_STREAM = 'typeahead:usernames'
+TYPEAHEAD_STREAM_MAXLEN = 100000
+
+SNAPSHOT_MAGIC = b'LGTRIE02'
+SNAPSHOT_HEADER = struct.Struct('<8sQQ')  # magic, node count, users JSON length
+
+class UsernameTrie:
+    """
+    Prefix trie of lowercased UTF-8 usernames held in flat arrays. Node i has a byte label, its first child,
+    its next sibling (siblings are kept in label order) and the id of the user whose name ends there, or -1.
+    Users are kept beside it as id -> (username, profile picture, visibility).
+    """
+    def __init__(self):
+        self.label = array('B', [0])
+        self.child = array('i', [-1])
+        self.sibling = array('i', [-1])
+        self.value = array('i', [-1])
+        self.users = {}
+        self.garbage = 0  # names removed since the arrays were built; their nodes stay until compacted
+
+    def __len__(self):
+        return len(self.users)
+
+    def _find(self, key):
+        node = 0
+        for c in key:
+            node = self.child[node]
+            while node != -1 and self.label[node] < c:
+                node = self.sibling[node]
+            if node == -1 or self.label[node] != c:
+                return -1
+        return node
+
+    def _child(self, node, c):
+        """The child of node labelled c, created in label order if it is missing"""
+        previous, current = -1, self.child[node]
+        while current != -1 and self.label[current] < c:
+            previous, current = current, self.sibling[current]
+        if current != -1 and self.label[current] == c:
+            return current
+        # Fill in the new node before linking it, so concurrent readers never see a half-added node
+        self.label.append(c)
+        self.child.append(-1)
+        self.sibling.append(current)
+        self.value.append(-1)
+        new = len(self.label) - 1
+        if previous == -1:
+            self.child[node] = new
+        else:
+            self.sibling[previous] = new
+        return new
+
+    def add(self, user_id, username, picture='', visibility='Public'):
+        """Insert or update a user; the old name of a renamed user is removed"""
+        previous = self.users.get(user_id)
+        if previous and previous[0].lower() != username.lower():
+            self._unset(previous[0], user_id)
+        node = 0
+        for c in username.lower().encode('utf-8'):
+            node = self._child(node, c)
+        self.value[node] = user_id
+        self.users[user_id] = (username, picture or '', visibility)
+
+    def remove(self, user_id):
+        previous = self.users.pop(user_id, None)
+        if previous:
+            self._unset(previous[0], user_id)
+
+    def _unset(self, username, user_id):
+        node = self._find(username.lower().encode('utf-8'))
+        if node != -1 and self.value[node] == user_id:
+            self.value[node] = -1
+            self.garbage += 1
+
+    def complete(self, prefix, limit):
+        """Up to limit (user_id, username, picture, visibility) whose name starts with prefix, in name order"""
+        node = self._find(prefix.lower().encode('utf-8'))
+        if node == -1:
+            return []
+        found = [self.value[node]] if self.value[node] != -1 else []
+        stack = [self.child[node]] if self.child[node] != -1 else []
+        # Preorder walk: a node, then its subtree, then its next sibling
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if self.sibling[node] != -1:
+                stack.append(self.sibling[node])
+            if self.value[node] != -1:
+                found.append(self.value[node])
+            if self.child[node] != -1:
+                stack.append(self.child[node])
+        return [(user_id,) + self.users[user_id] for user_id in found[:limit] if user_id in self.users]
+
+    def compacted(self):
+        """A copy without the nodes of removed names"""
+        trie = UsernameTrie()
+        for user_id, user in sorted(self.users.items(), key=lambda item: item[1][0].lower()):
+            trie.add(user_id, *user)
+        return trie
+
+    def save(self, path, position=None):
+        """Write the arrays and users to path, atomically; position is the last change stream entry included"""
+        users = json.dumps({'position': position, 'users': [[user_id, *user] for user_id, user in self.users.items()]})
+        users = users.encode('utf-8')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(self.label), len(users)))
+            for values in (self.label, self.child, self.sibling, self.value):
+                values.tofile(f)
+            f.write(users)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Returns (trie, position) read from a file written by save"""
+        trie = cls()
+        with open(path, 'rb') as f:
+            magic, nodes, users_length = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a username trie snapshot")
+            for name, typecode in (('label', 'B'), ('child', 'i'), ('sibling', 'i'), ('value', 'i')):
+                values = array(typecode)
+                values.fromfile(f, nodes)
+                setattr(trie, name, values)
+            data = json.loads(f.read(users_length))
+        trie.users = {user_id: tuple(user) for user_id, *user in data['users']}
+        return trie, data['position']
+
+class UsernameTypeahead:
+    """
+    Username autocomplete answered from an in-process UsernameTrie, without querying MySQL.
+    Each process starts from the snapshot file and applies the Redis stream of changes made since it was
+    written; without Redis it reloads from the database every TYPEAHEAD_REFRESH_INTERVAL seconds instead.
+    """
+    def __init__(self, snapshot_path=TYPEAHEAD_SNAPSHOT_PATH, refresh_interval=TYPEAHEAD_REFRESH_INTERVAL):
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self._trie = None
+        self._position = None  # last applied stream entry
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self, app):
+        """Load in the background and keep following changes; complete() returns None until loaded"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, args=(app,), name='typeahead', daemon=True).start()
+
+    def complete(self, prefix, limit=5):
+        trie = self._trie
+        if trie is None:
+            return None
+        return trie.complete(prefix, limit)
+
+    def record(self, user_id, username, picture='', visibility='Public'):
+        """A user was registered or changed name, picture or visibility"""
+        self._change({'op': 'set', 'user_id': user_id, 'username': username, 'picture': picture or '',
+                      'visibility': visibility})
+
+    def forget(self, user_id):
+        """A user was deleted"""
+        self._change({'op': 'delete', 'user_id': user_id})
+
+    def _change(self, change):
+        self._apply(change)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.xadd(TYPEAHEAD_STREAM, {'change': json.dumps(change)}, maxlen=TYPEAHEAD_STREAM_MAXLEN, approximate=True)
+            except Exception as e:
+                print(f"Error publishing typeahead change: {e}")
+
+    def _apply(self, change):
+        with self._lock:
+            trie = self._trie
+            if trie is None:
+                return
+            if change['op'] == 'set':
+                trie.add(change['user_id'], change['username'], change['picture'], change['visibility'])
+            else:
+                trie.remove(change['user_id'])
+            if trie.garbage > max(1000, len(trie)):
+                self._trie = trie.compacted()
+
+    def load(self):
+        """Load the snapshot if it can be brought up to date, otherwise rebuild from the database"""
+        client = get_redis_client()
+        trie, position = None, None
+        if os.path.exists(self.snapshot_path):
+            try:
+                trie, position = UsernameTrie.load(self.snapshot_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading typeahead snapshot, rebuilding: {e}")
+        if trie is not None and client is None:
+            # Nothing to replay; only trust a snapshot written within the refresh interval
+            if time.time() - os.path.getmtime(self.snapshot_path) > self.refresh_interval:
+                trie = None
+        elif trie is not None and not self._replayable(client, position):
+            trie = None
+        if trie is None:
+            trie, position = self.build(client)
+        with self._lock:
+            self._trie, self._position = trie, position
+        if client is not None:
+            self._follow(client, block=None)
+
+    def build(self, client=None):
+        """Build from the user table and write the snapshot; returns (trie, position)"""
+        from models import db
+        position = None
+        if client is not None:
+            # Taken before reading the table, so changes made during the scan are replayed afterwards
+            latest = client.xrevrange(TYPEAHEAD_STREAM, count=1)
+            position = latest[0][0].decode() if latest else '0-0'
+        trie = UsernameTrie()
+        rows = db.session.execute(text("SELECT userId, username, profilePicture, visibility FROM user ORDER BY username"))
+        for row in rows:
+            trie.add(row.userId, row.username, row.profilePicture, row.visibility)
+        db.session.commit()
+        try:
+            trie.save(self.snapshot_path, position)
+        except OSError as e:
+            print(f"Error writing typeahead snapshot: {e}")
+        return trie, position
+
+    def _replayable(self, client, position):
+        """Whether every change after position is still in the (trimmed) stream"""
+        if position is None:
+            return False
+        first = client.xrange(TYPEAHEAD_STREAM, count=1)
+        return not first or _stream_id(first[0][0].decode()) <= _stream_id(position)
+
+    def _follow(self, client, block=1000):
+        """Apply the stream entries after the current position; blocks up to block ms for new ones"""
+        response = client.xread({TYPEAHEAD_STREAM: self._position or '0-0'}, count=1000, block=block)
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                self._apply(json.loads(fields[b'change']))
+                self._position = entry_id.decode()
+
+    def _run(self, app):
+        while True:
+            try:
+                with app.app_context():
+                    self.load()
+                    client = get_redis_client()
+                    while client is not None:
+                        self._follow(client)
+                    while True:
+                        time.sleep(self.refresh_interval)
+                        trie, position = self.build()
+                        with self._lock:
+                            self._trie, self._position = trie, position
+            except Exception as e:
+                print(f"Typeahead error, reloading: {e}")
+                time.sleep(5)
+
+def _stream_id(entry_id):
+    milliseconds, sequence = entry_id.split('-')
+    return int(milliseconds), int(sequence)
+
+_typeahead = None
+_typeahead_lock = threading.Lock()
+
+def get_username_typeahead():
+    """Returns the process-wide UsernameTypeahead"""
+    global _typeahead
+    if _typeahead is None:
+        with _typeahead_lock:
+            if _typeahead is None:
+                _typeahead = UsernameTypeahead()
+    return _typeahead
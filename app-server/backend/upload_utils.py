@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from models import db
+from backend.storage_utils import get_storage
+from backend.blob_utils import acquire_image, mark_image_stored, release_image
+
+# Upload images from a background pool so requests return before the transfer finishes; false uploads inline
+UPLOAD_ASYNC = os.getenv("UPLOAD_ASYNC", "true").lower() == "true"
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '4'))
+UPLOAD_SPOOL_BYTES = 1024 * 1024  # larger uploads are spooled to a temporary file
+
+class UploadPipeline:
+    """
+    Copies an uploaded file out of the request and stores it from a worker pool. When the upload finishes,
+    on_complete(url) attaches it to its target (a post, a profile) and returns False if the target is gone.
+    Keys are content addressed: each attached upload holds a reference to its key, an upload whose key is
+    already stored only takes a reference, and objects are deleted when their last reference is released.
+    Only the latest upload for a target is attached; superseded or orphaned uploads release their reference.
+    An optional processor(file, key) turns the upload into [(key, file, content_type), ...] to store: the
+    original under key first, then its variants (see image_utils.variant_keys).
+    If storing the latest upload for a target fails, on_failure() is called so the target isn't left without it.
+    """
+    def __init__(self, storage=None, workers=UPLOAD_WORKERS, run_async=UPLOAD_ASYNC):
+        self.storage = storage or get_storage()
+        self.run_async = run_async
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload')
+        self._latest = {}  # target -> id of its most recent upload
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.deduplicated = 0
+
+    def submit(self, file, key, content_type, target, on_complete, processor=None, on_failure=None):
+        """Queue an upload; returns a Future for its URL (None if it failed or was discarded)"""
+        from flask import current_app
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+        shutil.copyfileobj(file, spool)
+        spool.seek(0)
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._latest[target] = upload_id
+        args = (current_app._get_current_object(), spool, key, content_type, target, upload_id, on_complete, processor,
+                on_failure)
+        if self.run_async:
+            return self._executor.submit(self._upload, *args)
+        future = Future()
+        future.set_result(self._upload(*args))
+        return future
+
+    def cancel(self, target):
+        """Discard the pending upload for target, if any, instead of attaching it"""
+        with self._lock:
+            self._latest.pop(target, None)
+
+    def _upload(self, app, spool, key, content_type, target, upload_id, on_complete, processor=None, on_failure=None):
+        with app.app_context():
+            try:
+                return self._store_and_attach(spool, key, content_type, target, upload_id, on_complete, processor,
+                                              on_failure)
+            finally:
+                spool.close()
+                db.session.remove()
+
+    def _store_and_attach(self, spool, key, content_type, target, upload_id, on_complete, processor, on_failure=None):
+        acquired = False
+        try:
+            stored = acquire_image(key)
+            acquired = True
+            if stored:
+                # Identical content is already stored: attaching it is only a metadata update
+                self.deduplicated += 1
+            else:
+                objects = processor(spool, key) if processor else [(key, spool, content_type)]
+                for object_key, data, object_type in objects:
+                    self.storage.put(object_key, data, object_type)
+                mark_image_stored(key)
+            url = self.storage.url(key)
+        except Exception as e:
+            self.failures += 1
+            db.session.rollback()
+            print(f"Error uploading {key}: {e}")
+            if acquired:
+                self._discard(key)
+            if self._take_latest(target, upload_id) and on_failure:
+                try:
+                    on_failure()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error handling failed upload {key}: {e}")
+            return None
+
+        latest = self._take_latest(target, upload_id)
+        try:
+            attached = latest and on_complete(url)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error attaching upload {key}: {e}")
+            attached = False
+        if not attached:
+            self._discard(key)
+            return None
+        return url
+
+    def _take_latest(self, target, upload_id):
+        """Whether upload_id is still the latest upload for target; it stops being pending either way"""
+        with self._lock:
+            latest = self._latest.get(target) == upload_id
+            if latest:
+                del self._latest[target]
+        return latest
+
+    def _discard(self, key):
+        try:
+            release_image(key, self.storage)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error deleting discarded upload {key}: {e}")
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_upload_pipeline():
+    """Returns the process-wide UploadPipeline"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = UploadPipeline()
+    return _pipeline
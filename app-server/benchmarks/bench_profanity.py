@@ -0,0 +1,38 @@
+"""
+Compares check_profanity's compiled trie matcher with the previous tokenize-and-lookup implementation.
+Run from app-server: python -m benchmarks.bench_profanity
+"""
+import random
+import re
+import timeit
+from backend.profanity_helper import PROFANITY_MATCHER, load_profanity_list
+
+PROFANE_WORDS = load_profanity_list('words.json')
+VOCABULARY = ['the', 'sunset', 'from', 'our', 'trip', 'was', 'amazing', 'photo', 'latergram', 'friends', 'coffee',
+              'morning', 'beach', 'classic', 'assessment', 'passing', 'scrapbook', 'weekend', 'hiking', 'city']
+
+def tokenize_check(text):
+    """The implementation check_profanity used before the automaton"""
+    words = re.findall(r'\b\w+\b', text.lower())
+    return any(word in PROFANE_WORDS for word in words)
+
+def make_text(words, rng):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+def main():
+    rng = random.Random(42)
+    cases = [
+        ('title, clean (8 words)', make_text(8, rng)),
+        ('post, clean (200 words)', make_text(200, rng)),
+        ('post, clean (2000 words)', make_text(2000, rng)),
+        ('post, profane at end (2000 words)', make_text(2000, rng) + ' shit'),
+    ]
+    print(f"{'case':38} {'tokenize us':>12} {'trie us':>13}")
+    for name, text in cases:
+        number = max(1, 20000 // len(text.split()))
+        old = min(timeit.repeat(lambda: tokenize_check(text), number=number, repeat=5)) / number * 1e6
+        new = min(timeit.repeat(lambda: PROFANITY_MATCHER.matches(text), number=number, repeat=5)) / number * 1e6
+        print(f"{name:38} {old:12.1f} {new:13.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares the LIKE '%query%' search with the ngram FULLTEXT search on a scratch table of synthetic post titles.
+Needs the MySQL server configured by the DB_* variables; the bench_search table is dropped afterwards.
+Run from app-server: python -m benchmarks.bench_search --rows 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from sqlalchemy import text
+from app import create_app
+from models import db
+from backend.search_utils import fulltext_query, like_prefix
+
+VOCABULARY = ['the', 'sunset', 'from', 'our', 'trip', 'was', 'amazing', 'photo', 'latergram', 'friends', 'coffee',
+              'morning', 'beach', 'classic', 'weekend', 'hiking', 'city', 'dinner', 'puppy', 'birthday', 'concert',
+              'mountain', 'lake', 'garden', 'street', 'vintage', 'sunrise', 'road', 'snow', 'museum']
+QUERIES = ['sunset', 'beach hik', 'puppy birthday', 'latergr', 'zzzz']
+BATCH_SIZE = 10000
+
+def populate(rows, rng):
+    db.session.execute(text("DROP TABLE IF EXISTS bench_search"))
+    db.session.execute(text("CREATE TABLE bench_search (postId INT PRIMARY KEY AUTO_INCREMENT, title VARCHAR(255) NOT NULL)"))
+    for start in range(0, rows, BATCH_SIZE):
+        titles = [{"title": ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 8)))}
+                  for _ in range(min(BATCH_SIZE, rows - start))]
+        db.session.execute(text("INSERT INTO bench_search (title) VALUES (:title)"), titles)
+        db.session.commit()
+    db.session.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+    db.session.execute(text("CREATE FULLTEXT INDEX ft_bench_title ON bench_search (title) WITH PARSER ngram"))
+    db.session.execute(text("CREATE INDEX idx_bench_title ON bench_search (title)"))
+    db.session.commit()
+
+def timed(statement, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.session.execute(text(statement), params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"Inserting {args.rows} titles...")
+        populate(args.rows, random.Random(42))
+        try:
+            print(f"{'query':18} {'LIKE %q% ms':>12} {'FULLTEXT ms':>12} {'prefix ms':>10}")
+            for query in QUERIES:
+                like = timed("SELECT postId FROM bench_search WHERE title LIKE :pattern ORDER BY postId DESC LIMIT 5",
+                             {"pattern": f'%{query}%'}, args.repeat)
+                score = "MATCH(title) AGAINST(:match IN BOOLEAN MODE)"
+                fulltext = timed(f"SELECT postId FROM bench_search WHERE {score} ORDER BY {score} DESC, postId DESC LIMIT 5",
+                                 {"match": fulltext_query(query)}, args.repeat)
+                prefix = timed("SELECT postId FROM bench_search WHERE title LIKE :pattern ORDER BY title LIMIT 5",
+                               {"pattern": like_prefix(query[:1])}, args.repeat)
+                print(f"{query:18} {like:12.1f} {fulltext:12.1f} {prefix:10.1f}")
+        finally:
+            db.session.execute(text("DROP TABLE IF EXISTS bench_search"))
+            db.session.commit()
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ from .feed_manager import FeedManager
 from .moderator_manager import ModeratorManager
 from .post_manager import PostManager
 from .profile_manager import ProfileManager
+from .home_page_loader import HomePageLoader
 
 # Create singleton instances for better performance
 _auth_manager = None
@@ -10,6 +11,7 @@ _feed_manager = None
 _post_manager = None
 _profile_manager = None
 _moderator_manager = None
+_home_page_loader = None
 
 def get_auth_manager():
     global _auth_manager
@@ -41,14 +43,22 @@ def get_moderator_manager():
         _moderator_manager = ModeratorManager()
     return _moderator_manager
 
+def get_home_page_loader():
+    global _home_page_loader
+    if _home_page_loader is None:
+        _home_page_loader = HomePageLoader(get_feed_manager(), get_profile_manager())
+    return _home_page_loader
+
 __all__ = [
     "AuthenticationManager",
     "FeedManager", 
     "ModeratorManager",
     "PostManager",
     "ProfileManager",
+    "HomePageLoader",
     "get_auth_manager",
     "get_feed_manager", 
     "get_post_manager",
-    "get_profile_manager"
+    "get_profile_manager",
+    "get_home_page_loader"
 ] 
\ No newline at end of file
@@ -1,20 +1,20 @@
 from typing import Optional, List, Dict, Any
 from models import db, User, Moderator
 from models.enums import VisibilityType, ReportTarget, LogActionTypes
-from flask_bcrypt import Bcrypt
 from sqlalchemy import or_
 from datetime import datetime, timedelta
 import re
-from sqlalchemy import text
-import smtplib
+from backend.logging_utils import log_action
+from backend.mail_utils import send_email, MAIL_ASYNC
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 import random
 import time
 from backend.hibp_utils import check_password_breach
+from backend.password_utils import get_password_hasher, PasswordHasherBusy
+from backend.typeahead_utils import get_username_typeahead
 
-bcrypt = Bcrypt()
 PLAYWRIGHT = os.getenv("PLAYWRIGHT", "false").lower() == "true"
 
 class AuthenticationManager:
@@ -29,22 +29,24 @@ class AuthenticationManager:
         """Generate a 6-digit OTP"""
         return str(random.randint(100000, 999999)).zfill(6)
     
+    def _check_password(self, account, password: str) -> bool:
+        """Check a user or moderator password off the request thread, saving a rehash if the cost factor changed"""
+        stored_hash = account.password
+        if not get_password_hasher().verify_and_update(account, password):
+            return False
+        if account.password != stored_hash:
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving rehashed password: {e}")
+        return True
+
     def log_action(self, user_id: int, action: str, target_id: int):
         """
         Logs an action to the application_log table.
         """
-        sql = """
-        INSERT INTO application_log 
-        (user_id, action, target_id, target_type, timestamp)
-        VALUES (:user_id, :action, :target_id, :target_type, NOW())
-        """
-
-        db.session.execute(text(sql), {
-            "user_id": user_id,
-            "action": action,
-            "target_id": target_id,
-            "target_type": ReportTarget.USER.value
-        })
+        log_action(user_id, action, target_id, ReportTarget.USER.value)
 
     def login(self, username_or_email: str, password: str) -> Dict[str, Any]:
         """Authenticate user login - supports both username and email"""
@@ -69,8 +71,11 @@ class AuthenticationManager:
         ).first()
 
         if user:
-            if not bcrypt.check_password_hash(user.password, password):
-                return {'success': False, 'error': 'Error logging in. Try again.'}
+            try:
+                if not self._check_password(user, password):
+                    return {'success': False, 'error': 'Error logging in. Try again.'}
+            except PasswordHasherBusy:
+                return {'success': False, 'error': 'The server is busy. Please try again shortly.'}
             
             # enforce account disablement period
             if user.disabledUntil and user.disabledUntil > datetime.utcnow():
@@ -102,8 +107,11 @@ class AuthenticationManager:
                 or_(Moderator.username == username_or_email, Moderator.email == username_or_email)
             ).first()
             if moderator:
-                if not bcrypt.check_password_hash(moderator.password, password):
-                    return {'success': False, 'error': 'Error logging in. Try again.'}
+                try:
+                    if not self._check_password(moderator, password):
+                        return {'success': False, 'error': 'Error logging in. Try again.'}
+                except PasswordHasherBusy:
+                    return {'success': False, 'error': 'The server is busy. Please try again shortly.'}
                 return {
                     'success': True,
                     'login_type': 'moderator',
@@ -143,7 +151,10 @@ class AuthenticationManager:
             if existing_user.username.lower() == username.lower():
                 return {'success': False, 'errors': ['Username already exists']}
         
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        try:
+            hashed_password = get_password_hasher().hash(password)
+        except PasswordHasherBusy:
+            return {'success': False, 'error': 'The server is busy. Please try again shortly.'}
         
         return {
             'success': True,
@@ -163,6 +174,7 @@ class AuthenticationManager:
             )
             db.session.add(user)
             db.session.commit()
+            get_username_typeahead().record(user.userId, user.username, visibility=user.visibility)
             
             return {
                 'success': True,
@@ -294,13 +306,8 @@ class AuthenticationManager:
             
             msg.attach(MIMEText(body, 'plain'))
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            server.send_message(msg)
-            server.quit()
-            
-            return True
+            # Delivered over a pooled connection, by a background worker unless MAIL_ASYNC is off
+            return send_email(msg)
         except Exception as e:
             print(f"Error sending email: {str(e)}")
             return False
@@ -316,7 +323,8 @@ class AuthenticationManager:
                     return {'success': False, 'error': 'Failed to send OTP email.'}
 
             user = User.query.filter_by(email=email).first()
-            delay = 5 # Dummy delay against timing attacks :)
+            # Dummy delay against timing attacks :) matching how long a real send keeps the request waiting
+            delay = 0 if MAIL_ASYNC else 5
             if user:
                 if user.last_otp_request:
                     # Bootleg rate limiting
@@ -409,13 +417,8 @@ class AuthenticationManager:
             
             msg.attach(MIMEText(body, 'plain'))
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            server.send_message(msg)
-            server.quit()
-            
-            return True
+            # Delivered over a pooled connection, by a background worker unless MAIL_ASYNC is off
+            return send_email(msg)
         except Exception as e:
             print(f"Error sending moderator email: {str(e)}")
             return False
@@ -493,8 +496,11 @@ class AuthenticationManager:
         if not user:
             return {'success': False, 'error': 'User not found'}
 
-        if not bcrypt.check_password_hash(user.password, password):
-            return {'success': False, 'error': 'Invalid password'}
+        try:
+            if not self._check_password(user, password):
+                return {'success': False, 'error': 'Invalid password'}
+        except PasswordHasherBusy:
+            return {'success': False, 'error': 'The server is busy. Please try again shortly.'}
         
         # Check if account is disabled
         if user.disabledUntil and user.disabledUntil > datetime.utcnow():
@@ -550,8 +556,11 @@ class AuthenticationManager:
         if not moderator:
             return {'success': False, 'error': 'Moderator not found'}
 
-        if not bcrypt.check_password_hash(moderator.password, password):
-            return {'success': False, 'error': 'Invalid password'}
+        try:
+            if not self._check_password(moderator, password):
+                return {'success': False, 'error': 'Invalid password'}
+        except PasswordHasherBusy:
+            return {'success': False, 'error': 'The server is busy. Please try again shortly.'}
         
         # Generate and send OTP
         otp_result = self.generate_and_send_moderator_otp(moderator.email, 'login')
@@ -616,7 +625,7 @@ class AuthenticationManager:
         
         try:
             # Update password
-            hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            hashed_password = get_password_hasher().hash(new_password)
             user.password = hashed_password
             user.login_attempts = 0  # Reset login attempts
             user.disabledUntil = None  # Remove any account locks
@@ -659,7 +668,7 @@ class AuthenticationManager:
 
         try:
             # Update password
-            hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            hashed_password = get_password_hasher().hash(new_password)
             moderator.password = hashed_password
             moderator.login_attempts = 0  # Reset login attempts
             
@@ -783,7 +792,7 @@ class AuthenticationManager:
         
         try:
             # OTP is valid, update password
-            user.password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            user.password = get_password_hasher().hash(new_password)
             user.clear_otp()
             user.login_attempts = 0
             db.session.commit()
@@ -1,11 +1,76 @@
-from models import Post, User, db
+from models import User, db
 from models.enums import VisibilityType
-from sqlalchemy import text
-from typing import Dict
+from sqlalchemy import text, bindparam
+from typing import Dict, List
+from collections import namedtuple
+from backend.cursor_utils import encode_cursor, decode_cursor
+from backend.schema_utils import ensure_index
+from backend.like_counter import get_like_counter, merge_pending_likes
+from backend.timeline_store import (get_timeline_store, to_score, inbox_key, author_key,
+                                    PUBLIC_KEY, CELEBRITIES_KEY, TIMELINE_MAX_LENGTH, LocalTimelineBackend)
+import os
+import threading
+
+# Read the home feed from the precomputed timeline store instead of the visibility JOIN
+TIMELINE_ENABLED = os.getenv("FEED_TIMELINE_ENABLED", "false").lower() == "true"
+# FollowersOnly authors above this many followers are merged at read time instead of fanned out
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "5000"))
+
+# Keyset pagination of the feed (and /api/posts) on (timeOfPost, postId). Declared on the Post model for new
+# databases; existing ones get it from `flask ensure-feed-indexes`
+FEED_INDEXES = [
+    ('idx_post_time_id', ['timeOfPost', 'postId']),
+]
+
+# Every column a feed card needs, so a page is rendered from a single query
+FEED_COLUMNS = """
+    p.postId, p.authorId, p.title, p.timeOfPost, p.updatedAt, p.like, p.likesId, p.image, p.content,
+    u.username, u.profilePicture, u.visibility
+"""
+
+class FeedAuthor(namedtuple('FeedAuthor', ['userId', 'username', 'profilePicture', 'visibility'])):
+    """Read-only author details for a feed card"""
+    __slots__ = ()
+
+class FeedItem(namedtuple('FeedItem', ['postId', 'authorId', 'title', 'timeOfPost', 'updatedAt', 'like',
+                                       'likesId', 'image', 'content', 'author'])):
+    """Read-only feed post built directly from a feed query row, so templates never lazy-load post.author"""
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(
+            postId=row.postId,
+            authorId=row.authorId,
+            title=row.title,
+            timeOfPost=row.timeOfPost,
+            updatedAt=row.updatedAt,
+            like=row.like,
+            likesId=row.likesId,
+            image=row.image,
+            content=row.content,
+            author=FeedAuthor(row.authorId, row.username, row.profilePicture, row.visibility)
+        )
+
+# Visibility predicate shared by the feed query and timeline verification
+VISIBLE_POST_PREDICATE = """
+    u.visibility = 'Public'
+    OR p.authorId = :current_user_id
+    OR (u.visibility = 'FollowersOnly' AND EXISTS (
+        SELECT 1 FROM followers f
+        WHERE f.followerUserId = :current_user_id 
+        AND f.followedUserId = p.authorId
+        AND f.status = 'accepted'
+    ))
+"""
 
 class FeedManager:
     def __init__(self):
         self.default_page_size = 20  # Load only 20 posts at a time
+        self.timeline_enabled = TIMELINE_ENABLED
+        self.fanout_follower_limit = TIMELINE_FANOUT_LIMIT
+        self._warm_lock = threading.Lock()
+        self._warming = False
     
     def _can_view_user_posts(self, viewer_user_id, post_author_id):
         """Check if a user can view posts from another user based on visibility settings"""
@@ -43,103 +108,101 @@ class FeedManager:
         # Default to deny if visibility setting is unknown
         return False
     
-    def generate_feed(self, user_id, page=1, per_page=None):
+    def _pagination_clause(self, page, per_page, cursor=None):
+        """Build the keyset (cursor) or offset pagination clause for a feed query"""
+        position = decode_cursor(cursor) if cursor else None
+        if position and position[0] is not None:
+            cursor_time, cursor_id = position
+            # Keyset pagination on (timeOfPost, postId) so deep pages cost the same as page one
+            where = """
+                AND (p.timeOfPost < :cursor_time
+                     OR (p.timeOfPost = :cursor_time AND p.postId < :cursor_id))
+            """
+            return where, "LIMIT :limit", {"limit": per_page, "cursor_time": cursor_time, "cursor_id": cursor_id}
+        offset = (page - 1) * per_page
+        return "", "LIMIT :limit OFFSET :offset", {"limit": per_page, "offset": offset}
+
+    def get_next_cursor(self, posts, per_page=None):
+        """Return the opaque cursor for the page after `posts`, or None if there are no more posts"""
+        if per_page is None:
+            per_page = self.default_page_size
+        if not posts or len(posts) < per_page:
+            return None
+        last_post = posts[-1]
+        return encode_cursor(last_post.timeOfPost, last_post.postId)
+
+    def generate_feed(self, user_id, page=1, per_page=None, cursor=None):
         """Generate feed with pagination and visibility filtering for better performance"""
         if per_page is None:
             per_page = self.default_page_size
             
-        # Calculate offset for manual pagination
-        offset = (page - 1) * per_page
+        # Serve from the precomputed timeline when enabled; None means use the feed query
+        if self.timeline_enabled and (cursor or page == 1):
+            posts = self._generate_feed_from_timeline(user_id, per_page, cursor)
+            if posts is not None:
+                return posts
+        
+        # Use keyset pagination when a cursor is given, otherwise fall back to offset pagination
+        cursor_clause, limit_clause, page_params = self._pagination_clause(page, per_page, cursor)
         
         try:
             # Query posts with user info and filter based on visibility - optimized with indexes
-            posts_query = text("""
-                SELECT p.postId, p.authorId, p.title, p.timeOfPost, p.like, p.likesId, p.image, p.content,
-                       u.username, u.profilePicture, u.visibility
+            posts_query = text(f"""
+                SELECT {FEED_COLUMNS}
                 FROM post p
                 JOIN user u ON p.authorId = u.userId
-                WHERE 
-                    u.visibility = 'Public'
-                    OR p.authorId = :current_user_id
-                    OR (u.visibility = 'FollowersOnly' AND EXISTS (
-                        SELECT 1 FROM followers f
-                        WHERE f.followerUserId = :current_user_id 
-                        AND f.followedUserId = p.authorId
-                    ))
-                ORDER BY p.timeOfPost DESC
-                LIMIT :limit OFFSET :offset
+                WHERE ({VISIBLE_POST_PREDICATE})
+                {cursor_clause}
+                ORDER BY p.timeOfPost DESC, p.postId DESC
+                {limit_clause}
             """)
             
             result = db.session.execute(posts_query, {
                 "current_user_id": user_id,
-                "limit": per_page,
-                "offset": offset
+                **page_params
             }).fetchall()
             
         except Exception as e:
             print(f"Error with optimized query, falling back to simple query: {e}")
             # Fallback to simpler query without complex visibility logic
             try:
-                fallback_query = text("""
-                    SELECT p.postId, p.authorId, p.title, p.timeOfPost, p.like, p.likesId, p.image, p.content,
-                           u.username, u.profilePicture, u.visibility
+                fallback_query = text(f"""
+                    SELECT {FEED_COLUMNS}
                     FROM post p
                     JOIN user u ON p.authorId = u.userId
-                    WHERE u.visibility = 'Public' OR p.authorId = :current_user_id
-                    ORDER BY p.timeOfPost DESC
-                    LIMIT :limit OFFSET :offset
+                    WHERE (u.visibility = 'Public' OR p.authorId = :current_user_id)
+                    {cursor_clause}
+                    ORDER BY p.timeOfPost DESC, p.postId DESC
+                    {limit_clause}
                 """)
                 
                 result = db.session.execute(fallback_query, {
                     "current_user_id": user_id,
-                    "limit": per_page,
-                    "offset": offset
+                    **page_params
                 }).fetchall()
             except Exception as fallback_error:
                 print(f"Fallback query also failed: {fallback_error}")
                 return []
         
-        # Convert results to Post objects efficiently using bulk query
-        if not result:
-            return []
-        
-        post_ids = [row[0] for row in result]
-        posts = Post.query.filter(Post.postId.in_(post_ids)).order_by(Post.timeOfPost.desc()).all()
-        
-        # Prefetch user profiles for better performance
-        try:
-            from managers import get_profile_manager
-            profile_manager = get_profile_manager()
-            author_ids = list(set([post.authorId for post in posts]))
-            profile_manager.prefetch_user_profiles(author_ids)
-        except Exception as e:
-            print(f"Error prefetching profiles: {e}")
-            # Continue without prefetching if it fails
-        
-        # Maintain the original order from the query
-        post_dict = {post.postId: post for post in posts}
-        ordered_posts = [post_dict[post_id] for post_id in post_ids if post_id in post_dict]
-        
-        return ordered_posts
+        return self._to_feed_items(result)
 
-    def refresh_feed(self, user_id=None, page=1):
+    def refresh_feed(self, user_id=None, page=1, cursor=None):
         """Refresh feed with pagination"""
-        return self.generate_feed(user_id, page)
+        return self.generate_feed(user_id, page, cursor=cursor)
 
-    def load_more_posts(self, user_id, page):
+    def load_more_posts(self, user_id, page=1, cursor=None):
         """Load more posts for infinite scroll"""
-        return self.generate_feed(user_id, page)
+        return self.generate_feed(user_id, page, cursor=cursor)
 
-    def filter_by_following(self, user_id, page=1):
+    def filter_by_following(self, user_id, page=1, cursor=None):
         """Filter feed to show only posts from followed users with visibility filtering"""
         per_page = self.default_page_size
-        offset = (page - 1) * per_page
+        cursor_clause, limit_clause, page_params = self._pagination_clause(page, per_page, cursor)
         
         try:
             # Query posts only from users that the current user follows, respecting visibility - optimized
-            posts_query = text("""
-                SELECT p.postId, p.authorId, p.title, p.timeOfPost, p.like, p.likesId, p.image, p.content,
-                       u.username, u.profilePicture, u.visibility
+            posts_query = text(f"""
+                SELECT {FEED_COLUMNS}
                 FROM post p
                 JOIN user u ON p.authorId = u.userId
                 JOIN followers f ON f.followedUserId = p.authorId
@@ -149,65 +212,298 @@ class FeedManager:
                         OR u.visibility = 'FollowersOnly'
                         OR p.authorId = :current_user_id
                     )
-                ORDER BY p.timeOfPost DESC
-                LIMIT :limit OFFSET :offset
+                    {cursor_clause}
+                ORDER BY p.timeOfPost DESC, p.postId DESC
+                {limit_clause}
             """)
             
             result = db.session.execute(posts_query, {
                 "current_user_id": user_id,
-                "limit": per_page,
-                "offset": offset
+                **page_params
             }).fetchall()
             
         except Exception as e:
             print(f"Error with following query, falling back to simple query: {e}")
             # Fallback to simpler query
             try:
-                fallback_query = text("""
-                    SELECT p.postId, p.authorId, p.title, p.timeOfPost, p.like, p.likesId, p.image, p.content,
-                           u.username, u.profilePicture, u.visibility
+                fallback_query = text(f"""
+                    SELECT {FEED_COLUMNS}
                     FROM post p
                     JOIN user u ON p.authorId = u.userId
                     JOIN followers f ON f.followedUserId = p.authorId
                     WHERE f.followerUserId = :current_user_id
-                    ORDER BY p.timeOfPost DESC
-                    LIMIT :limit OFFSET :offset
+                    {cursor_clause}
+                    ORDER BY p.timeOfPost DESC, p.postId DESC
+                    {limit_clause}
                 """)
                 
                 result = db.session.execute(fallback_query, {
                     "current_user_id": user_id,
-                    "limit": per_page,
-                    "offset": offset
+                    **page_params
                 }).fetchall()
             except Exception as fallback_error:
                 print(f"Fallback following query also failed: {fallback_error}")
                 return []
         
-        # Convert results to Post objects efficiently using bulk query
-        if not result:
+        return self._to_feed_items(result)
+
+    def _to_feed_items(self, result) -> List[FeedItem]:
+        """Build feed items from the feed query rows, keeping the query order"""
+        # Include likes still waiting in the write-behind buffer
+        return merge_pending_likes([FeedItem.from_row(row) for row in result], get_like_counter())
+
+    ##########################
+    ### Timeline (fan-out) ###
+    ##########################
+    def _generate_feed_from_timeline(self, user_id, per_page, cursor=None):
+        """Read a feed page from the timeline store, or return None if the feed query should be used"""
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return None
+            if not store.is_ready():
+                # The in-process store is warmed in the background; the Redis store is built with
+                # `flask rebuild-timelines`. The feed query serves requests until then.
+                if isinstance(store, LocalTimelineBackend):
+                    self._warm_local_store(store)
+                return None
+
+            max_score, cursor_id = None, None
+            if cursor:
+                position = decode_cursor(cursor)
+                if not position or position[0] is None:
+                    return None
+                max_score, cursor_id = to_score(position[0]), position[1]
+
+            # Public posts, fanned-out FollowersOnly posts, own posts and followed large accounts (fan-out-on-read)
+            keys = [PUBLIC_KEY, inbox_key(user_id), author_key(user_id)]
+            keys += [author_key(author_id) for author_id in self._followed_large_authors(store, user_id)]
+
+            candidates = {}
+            for key in keys:
+                for post_id, score in store.entries(key, max_score, per_page + 10):
+                    if max_score is not None and score == max_score and post_id >= cursor_id:
+                        continue
+                    candidates[post_id] = score
+            ordered = sorted(candidates.items(), key=lambda entry: (entry[1], entry[0]), reverse=True)[:per_page]
+            # Timelines are trimmed, so a short page means the query has to go deeper than the store
+            if len(ordered) < per_page:
+                return None
+
+            # Re-check visibility so stale entries (deleted posts, visibility changes) never leak
+            verify_query = text(f"""
+                SELECT {FEED_COLUMNS}
+                FROM post p
+                JOIN user u ON p.authorId = u.userId
+                WHERE p.postId IN :post_ids AND ({VISIBLE_POST_PREDICATE})
+                ORDER BY p.timeOfPost DESC, p.postId DESC
+            """).bindparams(bindparam('post_ids', expanding=True))
+            result = db.session.execute(verify_query, {
+                "current_user_id": user_id,
+                "post_ids": [post_id for post_id, _ in ordered]
+            }).fetchall()
+            if len(result) < per_page:
+                return None
+            return self._to_feed_items(result)
+        except Exception as e:
+            print(f"Error reading timeline store, falling back to feed query: {e}")
+            return None
+
+    def _warm_local_store(self, store):
+        """Build the in-process store once, from a background thread"""
+        from flask import current_app
+        with self._warm_lock:
+            if self._warming:
+                return
+            self._warming = True
+        app = current_app._get_current_object()
+
+        def warm():
+            with app.app_context():
+                try:
+                    self.rebuild_timelines(store)
+                except Exception as e:
+                    print(f"Error warming timeline store: {e}")
+                finally:
+                    db.session.remove()
+                    with self._warm_lock:
+                        self._warming = False
+
+        threading.Thread(target=warm, name='timeline-warm', daemon=True).start()
+
+    def _followed_large_authors(self, store, user_id):
+        """FollowersOnly authors followed by user_id whose posts are merged at read time"""
+        large_authors = store.set_members(CELEBRITIES_KEY)
+        if not large_authors:
             return []
-        
-        post_ids = [row[0] for row in result]
-        posts = Post.query.filter(Post.postId.in_(post_ids)).order_by(Post.timeOfPost.desc()).all()
-        
-        # Prefetch user profiles for better performance
+        query = text("""
+            SELECT followedUserId FROM followers
+            WHERE followerUserId = :user_id AND status = 'accepted' AND followedUserId IN :author_ids
+        """).bindparams(bindparam('author_ids', expanding=True))
+        rows = db.session.execute(query, {"user_id": user_id, "author_ids": list(large_authors)}).fetchall()
+        return [row[0] for row in rows]
+
+    def _accepted_follower_ids(self, author_id):
+        rows = db.session.execute(text("""
+            SELECT followerUserId FROM followers
+            WHERE followedUserId = :author_id AND status = 'accepted'
+        """), {"author_id": author_id}).fetchall()
+        return [row[0] for row in rows]
+
+    def _index_author_posts(self, store, author_id, visibility, entries):
+        """Place an author's timeline entries into the public timeline or their followers' inboxes"""
+        if not entries:
+            return
+        if visibility == VisibilityType.PUBLIC.value:
+            store.add_many(PUBLIC_KEY, entries)
+        elif visibility == VisibilityType.FOLLOWERS_ONLY.value:
+            follower_ids = self._accepted_follower_ids(author_id)
+            if len(follower_ids) > self.fanout_follower_limit:
+                store.set_add(CELEBRITIES_KEY, author_id)
+            else:
+                for follower_id in follower_ids:
+                    store.add_many(inbox_key(follower_id), entries)
+
+    def _unindex_author_posts(self, store, author_id, post_ids):
+        """Remove an author's posts from the public timeline and their followers' inboxes"""
+        if not post_ids:
+            return
+        keys = [PUBLIC_KEY] + [inbox_key(follower_id) for follower_id in self._accepted_follower_ids(author_id)]
+        store.remove(keys, post_ids)
+
+    def publish_post(self, post_id, author_id, time_of_post):
+        """Fan a newly created post out to the timelines that should show it"""
+        if not self.timeline_enabled:
+            return
         try:
-            from managers import get_profile_manager
-            profile_manager = get_profile_manager()
-            author_ids = list(set([post.authorId for post in posts]))
-            profile_manager.prefetch_user_profiles(author_ids)
+            store = get_timeline_store()
+            if store is None:
+                return
+            author = db.session.get(User, author_id)
+            if not author:
+                return
+            entry = [(post_id, to_score(time_of_post))]
+            store.add_many(author_key(author_id), entry)
+            self._index_author_posts(store, author_id, author.visibility, entry)
         except Exception as e:
-            print(f"Error prefetching profiles: {e}")
-            # Continue without prefetching if it fails
-        
-        # Maintain the original order from the query  
-        post_dict = {post.postId: post for post in posts}
-        ordered_posts = [post_dict[post_id] for post_id in post_ids if post_id in post_dict]
-        
-        return ordered_posts
-    
+            print(f"Error publishing post {post_id} to timelines: {e}")
+
+    def retract_post(self, post_id, author_id):
+        """Remove a deleted post from every timeline"""
+        if not self.timeline_enabled:
+            return
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return
+            store.remove([author_key(author_id)], [post_id])
+            self._unindex_author_posts(store, author_id, [post_id])
+        except Exception as e:
+            print(f"Error retracting post {post_id} from timelines: {e}")
+
+    def retract_author(self, author_id, post_ids):
+        """Remove all posts of a deleted account from the shared timelines"""
+        if not self.timeline_enabled:
+            return
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return
+            store.remove([PUBLIC_KEY], post_ids)
+            store.set_remove(CELEBRITIES_KEY, author_id)
+            store.delete(author_key(author_id))
+            store.delete(inbox_key(author_id))
+        except Exception as e:
+            print(f"Error retracting author {author_id} from timelines: {e}")
+
+    def on_follow_accepted(self, follower_id, followed_id):
+        """Backfill the follower's inbox with a FollowersOnly author's recent posts"""
+        if not self.timeline_enabled:
+            return
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return
+            author = db.session.get(User, followed_id)
+            if not author or author.visibility != VisibilityType.FOLLOWERS_ONLY.value:
+                return
+            if followed_id in store.set_members(CELEBRITIES_KEY):
+                return
+            store.add_many(inbox_key(follower_id), store.entries(author_key(followed_id), None, TIMELINE_MAX_LENGTH))
+        except Exception as e:
+            print(f"Error updating timeline after follow: {e}")
+
+    def on_unfollow(self, follower_id, followed_id):
+        """Drop an author's posts from a former follower's inbox"""
+        if not self.timeline_enabled:
+            return
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return
+            post_ids = [post_id for post_id, _ in store.entries(author_key(followed_id), None, TIMELINE_MAX_LENGTH)]
+            store.remove([inbox_key(follower_id)], post_ids)
+        except Exception as e:
+            print(f"Error updating timeline after unfollow: {e}")
+
+    def on_visibility_changed(self, author_id):
+        """Re-place an author's posts after their profile visibility changes"""
+        if not self.timeline_enabled:
+            return
+        try:
+            store = get_timeline_store()
+            if store is None:
+                return
+            author = db.session.get(User, author_id)
+            if not author:
+                return
+            entries = store.entries(author_key(author_id), None, TIMELINE_MAX_LENGTH)
+            self._unindex_author_posts(store, author_id, [post_id for post_id, _ in entries])
+            # Re-added below if the author is still a FollowersOnly author above the fan-out limit
+            store.set_remove(CELEBRITIES_KEY, author_id)
+            self._index_author_posts(store, author_id, author.visibility, entries)
+        except Exception as e:
+            print(f"Error updating timeline after visibility change: {e}")
+
+    def rebuild_timelines(self, store=None) -> Dict[str, int]:
+        """Rebuild every timeline from the post and followers tables"""
+        if store is None:
+            store = get_timeline_store()
+            if store is None:
+                return {'users': 0, 'authors': 0}
+
+        users = db.session.execute(text("SELECT userId, visibility FROM user")).fetchall()
+        store.delete(PUBLIC_KEY)
+        for user in users:
+            store.delete(author_key(user.userId))
+            store.delete(inbox_key(user.userId))
+            store.set_remove(CELEBRITIES_KEY, user.userId)
+
+        # Newest TIMELINE_MAX_LENGTH posts per author
+        author_entries = {}
+        rows = db.session.execute(text("""
+            SELECT postId, authorId, timeOfPost FROM post
+            ORDER BY timeOfPost DESC, postId DESC
+        """))
+        for row in rows:
+            entries = author_entries.setdefault(row.authorId, [])
+            if len(entries) < TIMELINE_MAX_LENGTH:
+                entries.append((row.postId, to_score(row.timeOfPost)))
+
+        for user in users:
+            entries = author_entries.get(user.userId, [])
+            store.add_many(author_key(user.userId), entries)
+            self._index_author_posts(store, user.userId, user.visibility, entries)
+
+        store.mark_ready()
+        return {'users': len(users), 'authors': len(author_entries)}
+
+    def ensure_feed_indexes(self):
+        """Create the FEED_INDEXES missing from the post table; returns the names created"""
+        return [name for name, columns in FEED_INDEXES if ensure_index('post', name, columns)]
+
     def get_comment_counts_batch(self, post_ids: list) -> Dict[int, int]:
-        """Get comment counts for multiple posts in a single query"""
+        """Get top-level comment counts for multiple posts in a single query"""
         if not post_ids:
             return {}
         
@@ -216,7 +512,11 @@ class FeedManager:
             post_ids_str = ','.join(map(str, post_ids))
             
             comment_counts = db.session.execute(
-                text(f"SELECT postId, COUNT(*) as count FROM comment WHERE postId IN ({post_ids_str}) GROUP BY postId")
+                text(f"""
+                    SELECT postId, COUNT(*) as count FROM comment
+                    WHERE postId IN ({post_ids_str}) AND parentCommentId IS NULL AND commentType = 'comment'
+                    GROUP BY postId
+                """)
             ).fetchall()
             
             counts = {row.postId: row.count for row in comment_counts}
@@ -0,0 +1,123 @@
+from models import User, db
+from sqlalchemy import text, bindparam
+from typing import Any, Dict, List, NamedTuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+import os, time
+
+# Worker threads used to run the independent home page sections concurrently, 0 runs them in the request thread
+HOME_LOADER_WORKERS = int(os.getenv("HOME_LOADER_WORKERS", "4"))
+
+# Liked flag and top-level comment count (as shown under each post) for every post on the page in one statement
+ENGAGEMENT_QUERY = text("""
+    SELECT p.postId,
+        (SELECT COUNT(*) FROM comment c
+         WHERE c.postId = p.postId AND c.parentCommentId IS NULL AND c.commentType = 'comment') AS comment_count,
+        EXISTS (
+            SELECT 1 FROM post_likes pl WHERE pl.post_id = p.postId AND pl.user_id = :user_id
+        ) AS liked
+    FROM post p
+    WHERE p.postId IN :post_ids
+""").bindparams(bindparam('post_ids', expanding=True))
+
+class HomePageData(NamedTuple):
+    """Everything the home template needs, plus how long each section took in milliseconds"""
+    posts: List[Any]
+    next_cursor: Optional[str]
+    user_stats: Dict[str, int]
+    suggested_users: List[Dict]
+    pending_requests: List[Dict]
+    liked_posts: Dict[int, bool]
+    comment_counts: Dict[int, int]
+    current_user: Optional[User]
+    timings: Dict[str, float]
+
+    def server_timing(self) -> str:
+        """Timings formatted for the Server-Timing response header"""
+        return ', '.join(f"{section};dur={duration:.1f}" for section, duration in self.timings.items())
+
+class HomePageLoader:
+    def __init__(self, feed_manager, profile_manager, workers=HOME_LOADER_WORKERS):
+        self.feed_manager = feed_manager
+        self.profile_manager = profile_manager
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='home-loader') if workers > 0 else None
+
+    def _timed(self, timings, section, func, default):
+        """Run one section, recording its duration and falling back to default on error"""
+        started = time.perf_counter()
+        try:
+            return func()
+        except Exception as e:
+            print(f"Error loading home page {section}: {e}")
+            return default
+        finally:
+            timings[section] = (time.perf_counter() - started) * 1000
+
+    def _submit(self, timings, section, func, default):
+        """Run a section on a pooled connection in a worker thread with its own app context and session"""
+        if self._executor is None:
+            return self._timed(timings, section, func, default)
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    return self._timed(timings, section, func, default)
+                finally:
+                    db.session.remove()
+        return self._executor.submit(run)
+
+    def _pending_requests(self, user_id):
+        follow_requests = self.profile_manager.get_pending_follow_requests(user_id)
+        return follow_requests.get('requests', []) if follow_requests.get('success') else []
+
+    def _current_user(self, user_id):
+        user = db.session.get(User, user_id)
+        if user is not None:
+            # Keep the loaded columns usable after the worker session is removed
+            db.session.expunge(user)
+        return user
+
+    def _engagement(self, post_ids, user_id):
+        rows = db.session.execute(ENGAGEMENT_QUERY, {"post_ids": post_ids, "user_id": user_id}).fetchall()
+        by_post = {row.postId: row for row in rows}
+        liked_posts = {post_id: bool(by_post[post_id].liked) if post_id in by_post else False for post_id in post_ids}
+        comment_counts = {post_id: by_post[post_id].comment_count if post_id in by_post else 0 for post_id in post_ids}
+        return liked_posts, comment_counts
+
+    def load(self, user_id, cursor=None) -> HomePageData:
+        """Load the home page for a user, running the sections that don't depend on the feed concurrently"""
+        timings = {}
+        started = time.perf_counter()
+        pending = {
+            'stats': self._submit(timings, 'stats', lambda: self.profile_manager.get_user_stats_cached(user_id),
+                                  {'posts_count': 0, 'followers_count': 0, 'following_count': 0}),
+            'suggestions': self._submit(timings, 'suggestions', lambda: self.profile_manager.get_suggested_users_cached(user_id), []),
+            'requests': self._submit(timings, 'requests', lambda: self._pending_requests(user_id), []),
+            'user': self._submit(timings, 'user', lambda: self._current_user(user_id), None),
+        }
+
+        posts = self._timed(timings, 'feed', lambda: self.feed_manager.generate_feed(user_id, cursor=cursor), [])
+        next_cursor = self.feed_manager.get_next_cursor(posts)
+        post_ids = [post.postId for post in posts]
+        if post_ids:
+            liked_posts, comment_counts = self._timed(timings, 'engagement', lambda: self._engagement(post_ids, user_id),
+                                                      ({post_id: False for post_id in post_ids}, {post_id: 0 for post_id in post_ids}))
+        else:
+            liked_posts, comment_counts = {}, {}
+
+        results = {section: value.result() if self._executor is not None else value for section, value in pending.items()}
+        timings['total'] = (time.perf_counter() - started) * 1000
+
+        return HomePageData(
+            posts=posts,
+            next_cursor=next_cursor,
+            user_stats=results['stats'],
+            suggested_users=results['suggestions'],
+            pending_requests=results['requests'],
+            liked_posts=liked_posts,
+            comment_counts=comment_counts,
+            current_user=results['user'],
+            timings=timings
+        )
@@ -1,13 +1,36 @@
 from datetime import datetime, timedelta
 from models import db, Report, Post, Comment, User, Moderator
 from models.enums import ReportStatus, UserDisableDays, ReportTarget
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from collections import namedtuple
+from backend.counter_utils import adjust_user_counters
+from backend.cursor_utils import encode_cursor, decode_cursor
+from backend.cache_utils import get_cache
+from backend.schema_utils import ensure_index
+from backend.blob_utils import release_image_url
+from backend.log_archive import read_archived_log, archived_log_count
+
+# Composite indexes for the application log browser: keyset order, and each filter followed by the keyset
+APPLICATION_LOG_INDEXES = [
+    ('idx_application_log_time_id', ['timestamp', 'id']),
+    ('idx_application_log_action_time', ['action', 'timestamp', 'id']),
+    ('idx_application_log_user_time', ['user_id', 'timestamp', 'id']),
+]
+LOG_COUNT_CACHE_TTL = 60  # seconds
+
+# Actions whose target author is shown in the application log
+POST_AUTHOR_ACTIONS = {'like_post', 'unlike_post'}
+COMMENT_AUTHOR_ACTIONS = {'create_comment', 'update_comment', 'delete_comment'}
+
+LogEntry = namedtuple('LogEntry', ['id', 'user_id', 'user_username', 'action', 'target_type', 'target_id',
+                                   'target_username', 'target_author_username', 'timestamp'])
 
 class ModeratorManager:
     def __init__(self, moderator: Moderator = None):
         # if moderator.role != 'moderator':
         #     raise ValueError("User is not a moderator")
         self.moderator = moderator
+        self._log_count_cache = get_cache('application_log_count', 1000, LOG_COUNT_CACHE_TTL)
 
     def review_report(self, report_id, mod_id, mod_level):
         report = Report.query.get(report_id)
@@ -99,10 +122,16 @@ class ModeratorManager:
                 )
             
                 # Delete the post and auto-resolve the report
+                image = post.image
                 db.session.delete(post)
+                adjust_user_counters(post.authorId, posts=-1)
                 report.status = ReportStatus.RESOLVED.value
 
                 db.session.commit()
+                release_image_url(image)
+
+                from managers import get_feed_manager
+                get_feed_manager().retract_post(post.postId, post.authorId)
                 return {'success': True, 'message': 'Post deleted successfully'}    
             except Exception as e:
                 db.session.rollback()
@@ -198,49 +227,151 @@ class ModeratorManager:
         # Logic to check moderator level
         pass 
 
-    def get_application_log(self, page=1, per_page=20):
-        sql = """
-        SELECT
-            l.*,
-            u.username AS user_username,
-            CASE
-                WHEN l.target_type = 'Post' AND l.action IN ('like_post', 'unlike_post')
-                THEN (SELECT p_author.username FROM post p
-                      JOIN user p_author ON p.authorId = p_author.userId
-                      WHERE p.postId = l.target_id)
-                WHEN l.target_type = 'Comment' AND l.action IN ('create_comment', 'update_comment', 'delete_comment')
-                THEN (SELECT p_author.username FROM post p
-                      JOIN user p_author ON p.authorId = p_author.userId
-                      WHERE p.postId = (SELECT c.postId FROM comment c 
-                            WHERE c.commentId = l.target_id
-                        )
-                )
-                ELSE NULL
-            END AS target_author_username,
-            tu.username AS target_username
-        FROM application_log l
-        JOIN user u ON l.user_id = u.userId
-        LEFT JOIN user tu ON l.target_type = 'User' AND l.target_id IS NOT NULL AND tu.userId = l.target_id
-        ORDER BY l.timestamp DESC
-        LIMIT :limit OFFSET :offset
+    def get_application_log(self, per_page=20, cursor=None, direction='older', action=None, user_id=None,
+                            start_date=None, end_date=None):
         """
-        offset = (page - 1) * per_page
-        result = db.session.execute(text(sql), {"limit": per_page, "offset": offset})
-        logs = result.fetchall()
+        One page of the application log, newest first, paged by a (timestamp, id) keyset cursor.
+        direction='newer' pages back towards the newest entries from the cursor.
+        Pages continue into the archived entries once the application_log table is exhausted.
+        """
+        where, params = self._log_filters(action, user_id, start_date, end_date)
+        position = decode_cursor(cursor)
+        newer = direction == 'newer' and position is not None
+        if position:
+            comparison = '>' if newer else '<'
+            where.append(f"(l.timestamp {comparison} :cursor_time OR (l.timestamp = :cursor_time AND l.id {comparison} :cursor_id))")
+            params.update({"cursor_time": position[0], "cursor_id": position[1]})
+        order = 'ASC' if newer else 'DESC'
+
+        rows = db.session.execute(text(f"""
+            SELECT l.id, l.user_id, l.action, l.target_type, l.target_id, l.timestamp
+            FROM application_log l
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY l.timestamp {order}, l.id {order}
+            LIMIT :limit
+        """), {**params, "limit": per_page + 1}).fetchall()
 
-        # Get total count for pagination
-        count_sql = "SELECT COUNT(*) FROM application_log"
-        total = db.session.execute(text(count_sql)).scalar()
-        total_pages = (total + per_page - 1) // per_page
+        # Archived entries are all older than the table's, so they come after it going older and before it going newer
+        if newer:
+            archived = read_archived_log(per_page + 1, position, 'newer', action, user_id, start_date, end_date)
+            rows = (archived + list(rows))[:per_page + 1]
+        elif len(rows) <= per_page:
+            last = (rows[-1].timestamp, rows[-1].id) if rows else position
+            rows = list(rows) + read_archived_log(per_page + 1 - len(rows), last, 'older', action, user_id, start_date, end_date)
+
+        # The extra row only tells us whether there is another page in this direction
+        has_more = len(rows) > per_page
+        if newer and not has_more:
+            # Reached the newest entries, show a full first page instead of a partial one
+            return self.get_application_log(per_page, action=action, user_id=user_id, start_date=start_date, end_date=end_date)
+        rows = rows[:per_page]
+        if newer:
+            rows.reverse()
+        items = self._resolve_log_names(rows)
 
         return {
-            "items": logs,
-            "page": page,
+            "items": items,
             "per_page": per_page,
-            "total": total,
-            "pages": total_pages,
-            "has_prev": page > 1,
-            "has_next": page < total_pages,
-            "prev_num": page - 1,
-            "next_num": page + 1,
+            "total": self._application_log_total(where, params, action, user_id, start_date, end_date),
+            "has_prev": has_more if newer else position is not None,
+            "has_next": True if newer else has_more,
+            "prev_cursor": encode_cursor(items[0].timestamp, items[0].id) if items else None,
+            "next_cursor": encode_cursor(items[-1].timestamp, items[-1].id) if items else None,
         }
+
+    def _log_filters(self, action=None, user_id=None, start_date=None, end_date=None):
+        """WHERE clauses for the application log filters, each served by one of APPLICATION_LOG_INDEXES"""
+        where, params = [], {}
+        if action:
+            where.append("l.action = :action")
+            params["action"] = action
+        if user_id:
+            where.append("l.user_id = :user_id")
+            params["user_id"] = user_id
+        if start_date:
+            where.append("l.timestamp >= :start_date")
+            params["start_date"] = start_date
+        if end_date:
+            # end_date is inclusive
+            where.append("l.timestamp < :end_date")
+            params["end_date"] = end_date + timedelta(days=1)
+        return where, params
+
+    def _resolve_log_names(self, rows):
+        """Resolve user and target author names for a page with one batched lookup per kind of target"""
+        user_ids = {row.user_id for row in rows}
+        user_ids.update(row.target_id for row in rows if row.target_type == ReportTarget.USER.value and row.target_id)
+        post_ids = {row.target_id for row in rows
+                    if row.target_type == ReportTarget.POST.value and row.action in POST_AUTHOR_ACTIONS and row.target_id}
+        comment_ids = {row.target_id for row in rows
+                       if row.target_type == ReportTarget.COMMENT.value and row.action in COMMENT_AUTHOR_ACTIONS and row.target_id}
+
+        usernames = self._lookup_names("SELECT userId AS id, username FROM user WHERE userId IN :ids", user_ids)
+        post_authors = self._lookup_names("""
+            SELECT p.postId AS id, u.username FROM post p JOIN user u ON p.authorId = u.userId
+            WHERE p.postId IN :ids
+        """, post_ids)
+        comment_post_authors = self._lookup_names("""
+            SELECT c.commentId AS id, u.username FROM comment c
+            JOIN post p ON c.postId = p.postId
+            JOIN user u ON p.authorId = u.userId
+            WHERE c.commentId IN :ids
+        """, comment_ids)
+
+        items = []
+        for row in rows:
+            if row.target_type == ReportTarget.POST.value and row.action in POST_AUTHOR_ACTIONS:
+                target_author = post_authors.get(row.target_id)
+            elif row.target_type == ReportTarget.COMMENT.value and row.action in COMMENT_AUTHOR_ACTIONS:
+                target_author = comment_post_authors.get(row.target_id)
+            else:
+                target_author = None
+            items.append(LogEntry(
+                id=row.id,
+                user_id=row.user_id,
+                # Rows outlive their user, whose account may since have been deleted
+                user_username=usernames.get(row.user_id) or f"(deleted user #{row.user_id})",
+                action=row.action,
+                target_type=row.target_type,
+                target_id=row.target_id,
+                target_username=usernames.get(row.target_id) if row.target_type == ReportTarget.USER.value else None,
+                target_author_username=target_author,
+                timestamp=row.timestamp
+            ))
+        return items
+
+    def _lookup_names(self, sql, ids):
+        if not ids:
+            return {}
+        query = text(sql).bindparams(bindparam('ids', expanding=True))
+        return {row.id: row.username for row in db.session.execute(query, {"ids": list(ids)})}
+
+    def _application_log_total(self, where, params, action, user_id, start_date, end_date):
+        """
+        Row count including archived entries: approximate for the unfiltered log, exact for filtered views.
+        Archived rows are counted from the archive manifest; cached briefly either way.
+        """
+        cache_key = f"{action}|{user_id}|{start_date}|{end_date}"
+        found, total = self._log_count_cache.get(cache_key)
+        if found:
+            return total
+        filters = [clause for clause in where if ':cursor_' not in clause]
+        if filters:
+            total = db.session.execute(text(
+                "SELECT COUNT(*) FROM application_log l WHERE " + " AND ".join(filters)
+            ), {key: value for key, value in params.items() if not key.startswith('cursor_')}).scalar()
+            total = (total or 0) + archived_log_count(action=action, user_id=user_id, start_date=start_date, end_date=end_date)
+        else:
+            # InnoDB's row estimate avoids scanning millions of rows on every dashboard load
+            total = db.session.execute(text("""
+                SELECT TABLE_ROWS FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'application_log'
+            """)).scalar()
+            total = (total or 0) + archived_log_count()
+        total = total or 0
+        self._log_count_cache.set(cache_key, total)
+        return total
+
+    def ensure_application_log_indexes(self):
+        """Create the composite indexes used by the application log browser; returns the names created"""
+        return [name for name, columns in APPLICATION_LOG_INDEXES if ensure_index('application_log', name, columns)]
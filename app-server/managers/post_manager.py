@@ -1,35 +1,49 @@
 from models import db, Post, Comment, User
 from typing import Dict, Any
 from sqlalchemy import text
+from backend.logging_utils import log_action
 from datetime import datetime
 from models.enums import ReportTarget, LogActionTypes
+from backend.counter_utils import adjust_user_counters
+from backend.like_counter import get_like_counter
+from backend.blob_utils import release_image_url
+from backend.search_utils import fulltext_query, fulltext_available, like_prefix, visible_author_clause
+import os
+
+# Like/unlike with single-purpose statements instead of loading the Post row.
+# Requires the unique (post_id, user_id) key on post_likes, see `flask ensure-like-constraints`.
+ATOMIC_LIKES = os.getenv("ATOMIC_LIKES", "false").lower() == "true"
 
 class PostManager:
     def __init__(self):
-        pass
+        # Write-behind like counts (LIKE_BUFFER_ENABLED) always use the atomic path
+        self.like_counter = get_like_counter()
+        self.atomic_likes = ATOMIC_LIKES or self.like_counter is not None
     def log_action(self, user_id: int, action: str, target_id: int, target_type: str):
         """
         Logs an action to the application_log table.
         """
-        sql = """
-        INSERT INTO application_log 
-        (user_id, action, target_id, target_type, timestamp)
-        VALUES (:user_id, :action, :target_id, :target_type, NOW())
-        """
-
-        db.session.execute(text(sql), {
-            "user_id": user_id,
-            "action": action,
-            "target_id": target_id,
-            "target_type": target_type,
-        })
+        log_action(user_id, action, target_id, target_type)
 
     def create_post(self, title, content, user_id):
         new_post = Post(title=title, content=content, authorId=user_id)
         db.session.add(new_post)
+        adjust_user_counters(user_id, posts=1)
         db.session.commit()
+
+        from managers import get_feed_manager
+        get_feed_manager().publish_post(new_post.postId, user_id, new_post.timeOfPost)
         return new_post
 
+    def attach_post_image(self, post_id: int, image_url: str) -> bool:
+        """Set the image of a post once its upload has finished; False if the post no longer exists"""
+        result = db.session.execute(
+            text("UPDATE post SET image = :image WHERE postId = :post_id"),
+            {"image": image_url, "post_id": post_id}
+        )
+        db.session.commit()
+        return result.rowcount > 0
+
     def delete_post(self, post_id, user_id):
         try:
             post = Post.query.get(post_id)
@@ -49,11 +63,17 @@ class PostManager:
             )
             
             # Delete the post
+            image = post.image
             db.session.delete(post)
+            adjust_user_counters(user_id, posts=-1)
 
             # Create a new log entry
             self.log_action(user_id, LogActionTypes.DELETE_POST.value, post_id, ReportTarget.POST.value)
             db.session.commit()
+            release_image_url(image)
+
+            from managers import get_feed_manager
+            get_feed_manager().retract_post(post_id, user_id)
             return {'success': True, 'message': 'Post deleted successfully'}
             
         except Exception as e:
@@ -63,6 +83,8 @@ class PostManager:
 
     def like_post(self, user_id: int, post_id: int) -> Dict[str, Any]:
         """Like a post using a junction table approach - optimized version"""
+        if self.atomic_likes:
+            return self._like_post_atomic(user_id, post_id)
         try:
             # Check if post exists and if user already liked it in a single query
             post = Post.query.get(post_id)
@@ -107,6 +129,8 @@ class PostManager:
 
     def unlike_post(self, user_id: int, post_id: int) -> Dict[str, Any]:
         """Unlike a post using the junction table approach - optimized version"""
+        if self.atomic_likes:
+            return self._unlike_post_atomic(user_id, post_id)
         try:
             # Check if post exists
             post = Post.query.get(post_id)
@@ -163,6 +187,136 @@ class PostManager:
             db.session.rollback()
             return {'success': False, 'error': f'Failed to unlike post: {str(e)}'}
     
+    def _like_post_atomic(self, user_id: int, post_id: int) -> Dict[str, Any]:
+        """Like without loading the Post; the unique key on post_likes decides duplicates"""
+        try:
+            found, new_count = self._lock_like_delta(post_id, 1)
+            if not found:
+                db.session.rollback()
+                return {'success': False, 'error': 'Post not found'}
+
+            result = db.session.execute(
+                text("INSERT INTO likes (user_userId, timestamp) VALUES (:user_id, NOW())"),
+                {"user_id": user_id}
+            )
+
+            # Concurrent or repeated likes hit the unique key and insert nothing; the rollback undoes the count
+            result = db.session.execute(
+                text("INSERT IGNORE INTO post_likes (post_id, user_id, like_id) VALUES (:post_id, :user_id, :like_id)"),
+                {"post_id": post_id, "user_id": user_id, "like_id": result.lastrowid}
+            )
+            if result.rowcount == 0:
+                db.session.rollback()
+                return {'success': False, 'error': 'You have already liked this post', 'already_liked': True}
+
+            self.log_action(user_id, LogActionTypes.LIKE_POST.value, post_id, ReportTarget.POST.value)
+            new_count = self._commit_like_delta(post_id, 1, new_count)
+
+            return {'success': True, 'message': 'Post liked successfully', 'new_count': new_count}
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': f'Failed to like post: {str(e)}'}
+
+    def _unlike_post_atomic(self, user_id: int, post_id: int) -> Dict[str, Any]:
+        """Unlike without loading the Post; only a deleted junction row keeps the decrement"""
+        try:
+            found, new_count = self._lock_like_delta(post_id, -1)
+            if not found:
+                db.session.rollback()
+                return {'success': False, 'error': 'Post not found'}
+
+            result = db.session.execute(
+                text("DELETE FROM post_likes WHERE user_id = :user_id AND post_id = :post_id"),
+                {"user_id": user_id, "post_id": post_id}
+            )
+            if result.rowcount == 0:
+                db.session.rollback()
+                return {'success': False, 'error': 'You have not liked this post', 'not_liked': True}
+
+            self.log_action(user_id, LogActionTypes.UNLIKE_POST.value, post_id, ReportTarget.POST.value)
+            new_count = self._commit_like_delta(post_id, -1, new_count)
+
+            # Remove this user's like records that nothing references any more, outside the post row lock
+            try:
+                db.session.execute(text("""
+                    DELETE l FROM likes l
+                    LEFT JOIN post_likes pl ON pl.like_id = l.likesId
+                    LEFT JOIN post p ON p.likesId = l.likesId
+                    WHERE l.user_userId = :user_id AND pl.id IS NULL AND p.postId IS NULL
+                """), {"user_id": user_id})
+                db.session.commit()
+            except Exception as cleanup_error:
+                db.session.rollback()
+                print(f"Cleanup warning: {cleanup_error}")
+
+            return {'success': True, 'message': 'Post unliked successfully', 'new_count': new_count}
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': f'Failed to unlike post: {str(e)}'}
+
+    def _lock_like_delta(self, post_id: int, delta: int):
+        """
+        First statement of a like/unlike transaction. Returns (post exists, new count, or None when buffered).
+        The count UPDATE runs before anything else touches the post row, so the transaction takes the row's
+        exclusive lock up front. Reading post first (INSERT ... SELECT FROM post, or the post_likes foreign key
+        check) takes a shared lock, and two concurrent likes upgrading their shared locks on one post deadlock.
+        """
+        if self.like_counter is None:
+            # LAST_INSERT_ID(expr) hands the new count back without another SELECT
+            result = db.session.execute(
+                text("UPDATE post SET `like` = LAST_INSERT_ID(GREATEST(COALESCE(`like`, 0) + :delta, 0)) WHERE postId = :post_id"),
+                {"post_id": post_id, "delta": delta}
+            )
+            return result.rowcount > 0, result.lastrowid
+
+        # Buffered: the post row is never written in this transaction, and a plain read takes no lock
+        found = db.session.execute(text("SELECT 1 FROM post WHERE postId = :post_id"), {"post_id": post_id}).first()
+        return found is not None, None
+
+    def _commit_like_delta(self, post_id: int, delta: int, new_count) -> int:
+        """Commit the pending like/unlike and return the post's new count"""
+        db.session.commit()
+        if self.like_counter is None:
+            return new_count
+
+        # Buffered: the delta is flushed to post.like in a later batch
+        self.like_counter.add(post_id, delta)
+        stored = db.session.execute(text("SELECT `like` FROM post WHERE postId = :post_id"), {"post_id": post_id}).scalar()
+        return max(0, (stored or 0) + self.like_counter.pending([post_id]).get(post_id, 0))
+
+    def ensure_like_constraint(self) -> Dict[str, Any]:
+        """Remove duplicate post_likes rows and add the unique (post_id, user_id) key the atomic path relies on"""
+        try:
+            existing = db.session.execute(text("""
+                SELECT 1 FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = 'post_likes' AND index_name = 'uq_post_likes_post_user'
+                LIMIT 1
+            """)).first()
+            if existing:
+                return {'success': True, 'message': 'Unique key already present', 'duplicates_removed': 0}
+
+            result = db.session.execute(text("""
+                DELETE newer FROM post_likes newer
+                JOIN post_likes older
+                    ON older.post_id = newer.post_id AND older.user_id = newer.user_id AND older.id < newer.id
+            """))
+            duplicates_removed = result.rowcount
+            # Duplicates were counted more than once, so recount the like totals
+            if duplicates_removed:
+                db.session.execute(text("""
+                    UPDATE post p SET p.`like` = (SELECT COUNT(*) FROM post_likes pl WHERE pl.post_id = p.postId)
+                """))
+            db.session.commit()
+
+            db.session.execute(text("ALTER TABLE post_likes ADD UNIQUE KEY uq_post_likes_post_user (post_id, user_id)"))
+            db.session.commit()
+            return {'success': True, 'message': 'Unique key added', 'duplicates_removed': duplicates_removed}
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': f'Failed to add like constraint: {str(e)}'}
+
     def is_post_liked_by_user(self, user_id: int, post_id: int) -> bool:
         """Check if a user has liked a specific post using junction table - optimized"""
         try:
@@ -301,12 +455,38 @@ class PostManager:
             print(f"Error getting posts likes batch: {e}")
             return {post_id: False for post_id in post_ids}
 
-    def search_posts_by_title(self, query: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Search for posts by title"""
-        offset = (page - 1) * per_page
-        search_term = f'%{query}%'
-        posts_query = Post.query.filter(Post.title.like(search_term)).offset(offset).limit(per_page)
-        posts = posts_query.all()
+    def search_posts_by_title(self, query: str, page: int = 1, per_page: int = 20, viewer_id: int = None) -> Dict[str, Any]:
+        """Search for posts by title that viewer_id may see, most relevant first"""
+        params = {"viewer_id": viewer_id, "limit": per_page, "offset": (page - 1) * per_page}
+        indexed = fulltext_available('post')
+        match = fulltext_query(query) if indexed else None
+        if match:
+            score = "MATCH(p.title) AGAINST(:match IN BOOLEAN MODE)"
+            condition, order = score, f"{score} DESC, p.postId DESC"
+            params["match"] = match
+        elif indexed:
+            # Too short for the ngram index: titles starting with the query, a range scan of idx_post_title
+            condition, order = "p.title LIKE :pattern", "p.title, p.postId DESC"
+            params["pattern"] = like_prefix(query)
+        else:
+            condition, order = "p.title LIKE :pattern", "p.postId DESC"
+            params["pattern"] = f'%{query}%'
+
+        try:
+            # Visibility is part of the search query, so a page is complete without filtering afterwards
+            visible = visible_author_clause(viewer_id, 'p.authorId', 'u.visibility')
+            posts = db.session.execute(text(f"""
+                SELECT p.postId, p.title, p.authorId, p.timeOfPost, p.image
+                FROM post p
+                JOIN user u ON p.authorId = u.userId
+                WHERE {condition} AND {visible}
+                ORDER BY {order}
+                LIMIT :limit OFFSET :offset
+            """), params).fetchall()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error searching posts: {e}")
+            return {'success': False, 'error': 'Search failed', 'query': query}
 
         post_results = []
         for post in posts:
@@ -2,44 +2,53 @@ from typing import Optional, List, Dict, Any
 from models import db, User
 from models.enums import VisibilityType, LogActionTypes, ReportTarget
 from sqlalchemy import text
+from backend.logging_utils import log_action
 from backend.hibp_utils import check_password_breach
+from backend.password_utils import get_password_hasher
+from backend.cache_utils import get_cache
+from backend.counter_utils import adjust_user_counters, release_user_counters, get_user_counters
+from backend.like_counter import get_like_counter, merge_pending_likes
+from backend.blob_utils import release_image_url
+from backend.search_utils import (fulltext_query, fulltext_available, like_prefix, followed_author_ids,
+                                  forget_followed_authors, can_see_posts)
+from backend.typeahead_utils import get_username_typeahead
+import os
+
+# Entry caps for the per-process local tier of each profile cache
+USER_STATS_CACHE_SIZE = int(os.environ.get('USER_STATS_CACHE_SIZE', '10000'))
+SUGGESTED_USERS_CACHE_SIZE = int(os.environ.get('SUGGESTED_USERS_CACHE_SIZE', '5000'))
+USER_PROFILE_CACHE_SIZE = int(os.environ.get('USER_PROFILE_CACHE_SIZE', '20000'))
 
 class ProfileManager:
     def __init__(self, current_user: User = None):
         self.current_user = current_user
-        # Simple in-memory cache for frequently accessed data
-        self._user_stats_cache = {}
-        self._suggested_users_cache = {}
-        self._user_profile_cache = {}
         self._cache_timeout = 300  # 5 minutes cache timeout
+        # Shared caches for frequently accessed data: bounded local LRU, Redis when configured
+        self._user_stats_cache = get_cache('user_stats', USER_STATS_CACHE_SIZE, self._cache_timeout)
+        self._suggested_users_cache = get_cache('suggested_users', SUGGESTED_USERS_CACHE_SIZE, self._cache_timeout)
+        self._user_profile_cache = get_cache('user_profile', USER_PROFILE_CACHE_SIZE, self._cache_timeout)
 
     def log_action(self, user_id: int, action: str, target_id: int):
         """
         Logs an action to the application_log table.
         """
-        sql = """
-        INSERT INTO application_log 
-        (user_id, action, target_id, target_type, timestamp)
-        VALUES (:user_id, :action, :target_id, :target_type, NOW())
-        """
-
-        db.session.execute(text(sql), {
-            "user_id": user_id,
-            "action": action,
-            "target_id": target_id,
-            "target_type": ReportTarget.USER.value,
-        })
+        log_action(user_id, action, target_id, ReportTarget.USER.value)
 
     def _clear_user_cache(self, user_id: int):
-        """Clear cache for a specific user"""
-        if user_id in self._user_stats_cache:
-            del self._user_stats_cache[user_id]
-        if user_id in self._suggested_users_cache:
-            del self._suggested_users_cache[user_id]
-        if user_id in self._user_profile_cache:
-            del self._user_profile_cache[user_id]
-        if user_id in self._user_profile_cache:
-            del self._user_profile_cache[user_id]
+        """Clear cache for a specific user in every worker process"""
+        self._user_stats_cache.delete(user_id)
+        self._suggested_users_cache.delete(user_id)
+        self._user_profile_cache.delete(user_id)
+        forget_followed_authors(user_id)
+
+    def cache_stats(self) -> List[Dict[str, Any]]:
+        """Hit/miss counters and sizes of the profile caches in this process"""
+        return [cache.stats() for cache in (self._user_stats_cache, self._suggested_users_cache, self._user_profile_cache)]
+
+    def _feed_manager(self):
+        """Lazily resolve the shared FeedManager (imported here to avoid a circular import)"""
+        from managers import get_feed_manager
+        return get_feed_manager()
 
     def _is_public_visibility(self, visibility: str) -> bool:
         """Check if visibility setting indicates a public profile"""
@@ -61,21 +70,36 @@ class ProfileManager:
 
     def get_user_stats_cached(self, user_id: int) -> Dict[str, int]:
         """Get user stats with caching for better performance"""
-        import time
-        
         # Check cache first
-        if user_id in self._user_stats_cache:
-            cached_data, timestamp = self._user_stats_cache[user_id]
-            if time.time() - timestamp < self._cache_timeout:
-                return cached_data
+        found, cached_data = self._user_stats_cache.get(user_id)
+        if found:
+            return cached_data
         
         # If not in cache or expired, fetch from database
         stats = self.get_user_stats(user_id)
         
         # Cache the result
-        self._user_stats_cache[user_id] = (stats, time.time())
+        self._user_stats_cache.set(user_id, stats)
         return stats
 
+    def set_profile_picture(self, user_id: int, picture_url: str) -> bool:
+        """Set a profile picture once its upload has finished; False if the user no longer exists"""
+        current = db.session.execute(
+            text("SELECT username, profilePicture, visibility FROM user WHERE userId = :user_id"), {"user_id": user_id}
+        ).first()
+        result = db.session.execute(
+            text("UPDATE user SET profilePicture = :picture WHERE userId = :user_id"),
+            {"picture": picture_url, "user_id": user_id}
+        )
+        db.session.commit()
+        self._clear_user_cache(user_id)
+        if result.rowcount == 0 or current is None:
+            return False
+        get_username_typeahead().record(user_id, current.username, picture_url, current.visibility)
+        # The replaced picture held a reference too; re-uploading the same picture just hands it over
+        release_image_url(current.profilePicture)
+        return True
+
     def update_profile(self, user_id: int, display_name: str = None, 
                       bio: str = None, profile_picture_url: str = None, 
                       visibility: str = None) -> Dict[str, Any]:
@@ -99,6 +123,7 @@ class ProfileManager:
             user.bio = bio
         if profile_picture_url is not None:
             user.profilePicture = profile_picture_url
+        visibility_changed = visibility is not None and visibility != user.visibility
         if visibility is not None:
             user.visibility = visibility
         
@@ -106,6 +131,10 @@ class ProfileManager:
             # Create a new log entry
             self.log_action(user_id, LogActionTypes.UPDATE_PROFILE.value, user_id)
             db.session.commit()
+            if display_name is not None or visibility_changed:
+                get_username_typeahead().record(user.userId, user.username, user.profilePicture, user.visibility)
+            if visibility_changed:
+                self._feed_manager().on_visibility_changed(user_id)
             return {
                 'success': True,
                 'message': 'Profile updated successfully',
@@ -157,9 +186,12 @@ class ProfileManager:
                     VALUES (:requester_id, :target_id, NOW(), 'accepted')
                 """)
                 db.session.execute(query, {"requester_id": requester_user_id, "target_id": target_user_id})
+                adjust_user_counters(requester_user_id, following=1)
+                adjust_user_counters(target_user_id, followers=1)
                 # Create a new log entry
                 self.log_action(requester_user_id, LogActionTypes.FOLLOW_USER.value, target_user_id)
                 message = 'Now following user'
+                is_accepted = True
             else:
                 # For private or followers-only accounts, send pending request
                 query = text("""
@@ -170,6 +202,7 @@ class ProfileManager:
                 # Create a new log entry
                 self.log_action(requester_user_id, LogActionTypes.REQUEST_FOLLOW.value, target_user_id)
                 message = 'Follow request sent'
+                is_accepted = False
             
 
             db.session.commit()
@@ -177,6 +210,8 @@ class ProfileManager:
             # Clear cache for both users
             self._clear_user_cache(requester_user_id)
             self._clear_user_cache(target_user_id)
+            if is_accepted:
+                self._feed_manager().on_follow_accepted(requester_user_id, target_user_id)
             
             return {
                 'success': True,
@@ -209,6 +244,8 @@ class ProfileManager:
                     WHERE followerUserId = :requester_id AND followedUserId = :target_id AND status = 'pending'
                 """)
                 db.session.execute(query, {"requester_id": requester_user_id, "target_id": target_user_id})
+                adjust_user_counters(requester_user_id, following=1)
+                adjust_user_counters(target_user_id, followers=1)
                 # Create a new log entry
                 self.log_action(target_user_id, LogActionTypes.ACCEPT_FOLLOW_REQUEST.value, requester_user_id)
                 message = 'Follow request accepted'
@@ -228,6 +265,8 @@ class ProfileManager:
             # Clear cache for both users
             self._clear_user_cache(requester_user_id)
             self._clear_user_cache(target_user_id)
+            if action == 'accept':
+                self._feed_manager().on_follow_accepted(requester_user_id, target_user_id)
             
             return {
                 'success': True,
@@ -348,6 +387,9 @@ class ProfileManager:
             # Remove the relationship regardless of status
             query = text("DELETE FROM followers WHERE followerUserId = :follower_id AND followedUserId = :followed_id")
             db.session.execute(query, {"follower_id": follower_user_id, "followed_id": followed_user_id})
+            if result.status == 'accepted':
+                adjust_user_counters(follower_user_id, following=-1)
+                adjust_user_counters(followed_user_id, followers=-1)
 
             # Create a new log entry
             self.log_action(follower_user_id, LogActionTypes.UNFOLLOW_USER.value, followed_user_id)
@@ -356,6 +398,7 @@ class ProfileManager:
             # Clear cache for both users
             self._clear_user_cache(follower_user_id)
             self._clear_user_cache(followed_user_id)
+            self._feed_manager().on_unfollow(follower_user_id, followed_user_id)
             
             message = 'Successfully unfollowed user' if result.status == 'accepted' else 'Follow request cancelled'
             
@@ -463,18 +506,14 @@ class ProfileManager:
     def get_follower_count(self, user_id: int) -> int:
         """Get total number of followers for a user - only accepted follows"""
         try:
-            query = text("SELECT COUNT(*) as count FROM followers WHERE followedUserId = :user_id AND status = 'accepted'")
-            result = db.session.execute(query, {"user_id": user_id}).fetchone()
-            return result[0] if result else 0
+            return get_user_counters(user_id)['followers_count']
         except Exception:
             return 0
     
     def get_following_count(self, user_id: int) -> int:
         """Get total number of users that this user follows - only accepted follows"""
         try:
-            query = text("SELECT COUNT(*) as count FROM followers WHERE followerUserId = :user_id AND status = 'accepted'")
-            result = db.session.execute(query, {"user_id": user_id}).fetchone()
-            return result[0] if result else 0
+            return get_user_counters(user_id)['following_count']
         except Exception:
             return 0
     
@@ -504,13 +543,10 @@ class ProfileManager:
     
     def get_user_profile_cached(self, user_id: int) -> Dict:
         """Get user profile with caching for better performance"""
-        import time
-        
         # Check cache first
-        if user_id in self._user_profile_cache:
-            cached_data, timestamp = self._user_profile_cache[user_id]
-            if time.time() - timestamp < self._cache_timeout:
-                return cached_data
+        found, cached_data = self._user_profile_cache.get(user_id)
+        if found:
+            return cached_data
         
         # If not in cache or expired, fetch from database
         try:
@@ -524,20 +560,40 @@ class ProfileManager:
                     'visibility': user.visibility
                 }
                 # Cache the result
-                self._user_profile_cache[user_id] = (profile_data, time.time())
+                self._user_profile_cache.set(user_id, profile_data)
                 return profile_data
         except Exception as e:
             print(f"Error getting user profile: {e}")
         
         return None
 
-    def search_users(self, query: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
-        """Search for users by username"""
+    def search_users(self, query: str, page: int = 1, per_page: int = 20, viewer_id: int = None) -> Dict[str, Any]:
+        """
+        Search for users by username, exact and most relevant matches first.
+        Each result says whether viewer_id can see the user's posts, decided from the viewer's followed set.
+        """
         offset = (page - 1) * per_page
-        
-        search_term = f'%{query}%'
-        users_query = User.query.filter(User.username.like(search_term)).offset(offset).limit(per_page)
-        users = users_query.all()
+        users_query = User.query
+        indexed = fulltext_available('user')
+        match = fulltext_query(query) if indexed else None
+        if match:
+            score = "MATCH(username) AGAINST(:match IN BOOLEAN MODE)"
+            users_query = users_query.filter(text(score)).order_by(
+                text(f"username = :exact DESC, {score} DESC, CHAR_LENGTH(username), userId")
+            ).params(match=match, exact=query)
+        elif indexed:
+            # Too short for the ngram index: usernames starting with the query, a range scan of the unique key
+            users_query = users_query.filter(User.username.like(like_prefix(query))).order_by(User.username)
+        else:
+            users_query = users_query.filter(User.username.like(f'%{query}%'))
+
+        try:
+            users = users_query.offset(offset).limit(per_page).all()
+            followed = set(followed_author_ids(viewer_id))
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error searching users: {e}")
+            return {'success': False, 'error': 'Search failed', 'query': query}
         
         user_results = []
         for user in users:
@@ -550,7 +606,8 @@ class ProfileManager:
                     'profile_picture': user.profilePicture,
                     'bio': user.bio,
                     'visibility': user.visibility
-                }
+                },
+                'can_see_posts': can_see_posts(viewer_id, user.userId, user.visibility, followed)
             })
         
         return {
@@ -560,23 +617,9 @@ class ProfileManager:
         }
 
     def get_user_stats(self, user_id: int) -> Dict[str, int]:
-        """Get user statistics with optimized single query - only count accepted follows"""
+        """Get user statistics from the denormalized user_counters row - only count accepted follows"""
         try:
-            # Single query to get all stats at once, counting only accepted follows
-            result = db.session.execute(text("""
-                SELECT 
-                    (SELECT COUNT(*) FROM post WHERE authorId = :user_id) as posts_count,
-                    (SELECT COUNT(*) FROM followers WHERE followedUserId = :user_id AND status = 'accepted') as followers_count,
-                    (SELECT COUNT(*) FROM followers WHERE followerUserId = :user_id AND status = 'accepted') as following_count
-            """), {"user_id": user_id}).fetchone()
-            
-            if result:
-                return {
-                    'posts_count': result.posts_count or 0,
-                    'followers_count': result.followers_count or 0,
-                    'following_count': result.following_count or 0
-                }
-            return {'posts_count': 0, 'followers_count': 0, 'following_count': 0}
+            return get_user_counters(user_id)
         except Exception as e:
             print(f"Error getting user stats: {e}")
             return {'posts_count': 0, 'followers_count': 0, 'following_count': 0}
@@ -614,20 +657,16 @@ class ProfileManager:
     
     def get_suggested_users_cached(self, user_id: int, limit: int = 5) -> List[Dict]:
         """Get suggested users with caching for better performance"""
-        import time
-        
-        # Check cache first
-        cache_key = f"{user_id}_{limit}"
-        if cache_key in self._suggested_users_cache:
-            cached_data, timestamp = self._suggested_users_cache[cache_key]
-            if time.time() - timestamp < self._cache_timeout:
-                return cached_data
+        # Keyed by user only so _clear_user_cache reaches it; a longer cached list also serves smaller limits
+        found, cached_data = self._suggested_users_cache.get(user_id)
+        if found and cached_data['limit'] >= limit:
+            return cached_data['users'][:limit]
         
         # If not in cache or expired, fetch from database
         suggested_users = self.get_suggested_users(user_id, limit)
         
         # Cache the result
-        self._suggested_users_cache[cache_key] = (suggested_users, time.time())
+        self._suggested_users_cache.set(user_id, {'limit': limit, 'users': suggested_users})
         return suggested_users
 
     def get_user_posts(self, user_id: int, viewer_user_id: int = None, page: int = 1, per_page: int = 20) -> List:
@@ -653,7 +692,8 @@ class ProfileManager:
                     .limit(per_page)
                     .all())
             
-            return posts
+            # Include likes still waiting in the write-behind buffer
+            return merge_pending_likes(posts, get_like_counter())
         except Exception as e:
             print(f"Error getting user posts: {e}")
             return []
@@ -696,16 +736,13 @@ class ProfileManager:
     def change_password(self, user_id: int, current_password: str, new_password: str) -> Dict[str, Any]:
         """Change user password with validation"""
         try:
-            from flask_bcrypt import Bcrypt
-            bcrypt = Bcrypt()
-            
             # Get the user
             user = User.query.filter_by(userId=user_id).first()
             if not user:
                 return {'success': False, 'error': 'User not found'}
             
             # Verify current password
-            if not bcrypt.check_password_hash(user.password, current_password):
+            if not get_password_hasher().check(user.password, current_password):
                 return {'success': False, 'error': 'Current password is incorrect'}
             
             # Validate new password (similar to registration) -- can modularize ngl
@@ -719,7 +756,7 @@ class ProfileManager:
                 return {'success': False, 'error': f'New password has been found in data breaches. Please choose a different password.'}
             
             # Hash the new password
-            hashed_password = bcrypt.generate_password_hash(new_password).decode('utf-8')
+            hashed_password = get_password_hasher().hash(new_password)
             
             # Update the password
             user.password = hashed_password
@@ -739,16 +776,13 @@ class ProfileManager:
     def delete_account(self, user_id: int, password: str) -> Dict[str, Any]:
         """Delete user account with password confirmation"""
         try:
-            from flask_bcrypt import Bcrypt
-            bcrypt = Bcrypt()
-            
             # Get the user
             user = User.query.filter_by(userId=user_id).first()
             if not user:
                 return {'success': False, 'error': 'User not found'}
             
             # Verify password before deletion
-            if not bcrypt.check_password_hash(user.password, password):
+            if not get_password_hasher().check(user.password, password):
                 return {'success': False, 'error': 'Password is incorrect'}
             
             # Use a simpler approach: delete in order that respects foreign key constraints
@@ -762,7 +796,8 @@ class ProfileManager:
             # 3. Delete reports made by this user (using correct column name)
             db.session.execute(text("DELETE FROM report WHERE reportedBy = :user_id"), {"user_id": user_id})
             
-            # 4. Delete follower relationships (both following and followers)
+            # 4. Delete follower relationships (both following and followers), releasing the counters first
+            release_user_counters(user_id)
             db.session.execute(text("DELETE FROM followers WHERE followerUserId = :user_id OR followedUserId = :user_id"), {"user_id": user_id})
             
             # 5. Handle posts and likes carefully to avoid foreign key constraints
@@ -804,7 +839,7 @@ class ProfileManager:
             
             # Now get all posts by this user and their associated like IDs
             user_posts = db.session.execute(text("""
-                SELECT postId, likesId FROM post WHERE authorId = :user_id
+                SELECT postId, likesId, image FROM post WHERE authorId = :user_id
             """), {"user_id": user_id}).fetchall()
             
             # Delete the user's posts (this removes the foreign key references from user's own posts)
@@ -824,12 +859,19 @@ class ProfileManager:
             db.session.execute(text("DELETE FROM likes WHERE user_userId = :user_id"), {"user_id": user_id})
             
             # 6. Finally, delete the user account
+            profile_picture = user.profilePicture
             db.session.delete(user)
 
             db.session.commit()
+
+            # Release the account's images; ones shared with other posts or profiles stay in storage
+            for image in [profile_picture] + [post.image for post in user_posts]:
+                release_image_url(image)
             
             # Clear any cached data for this user
             self._clear_user_cache(user_id)
+            get_username_typeahead().forget(user_id)
+            self._feed_manager().retract_author(user_id, [post.postId for post in user_posts])
             
             return {
                 'success': True,
@@ -886,6 +928,9 @@ class ProfileManager:
             db.session.execute(text("""
                 DELETE FROM followers WHERE followerUserId = :follower_id AND followedUserId = :user_id
             """), {"follower_id": follower_user_id, "user_id": user_id})
+            if result.status == 'accepted':
+                adjust_user_counters(follower_user_id, following=-1)
+                adjust_user_counters(user_id, followers=-1)
             # Create a new log entry
             self.log_action(user_id, LogActionTypes.REMOVE_FOLLOWER.value, follower_user_id)
             db.session.commit()
@@ -893,6 +938,7 @@ class ProfileManager:
             # Clear cache for both users
             self._clear_user_cache(user_id)
             self._clear_user_cache(follower_user_id)
+            self._feed_manager().on_unfollow(follower_user_id, user_id)
 
             return {'success': True, 'message': 'Follower removed successfully.'}
         except Exception as e:
@@ -906,16 +952,14 @@ class ProfileManager:
         
         try:
             # Remove duplicates and get uncached users
-            import time
             uncached_ids = []
             cached_profiles = {}
             
             for user_id in set(user_ids):
-                if user_id in self._user_profile_cache:
-                    cached_data, timestamp = self._user_profile_cache[user_id]
-                    if time.time() - timestamp < self._cache_timeout:
-                        cached_profiles[user_id] = cached_data
-                        continue
+                found, cached_data = self._user_profile_cache.get(user_id)
+                if found:
+                    cached_profiles[user_id] = cached_data
+                    continue
                 uncached_ids.append(user_id)
             
             # Fetch uncached profiles in batch
@@ -930,7 +974,7 @@ class ProfileManager:
                         'visibility': user.visibility
                     }
                     # Cache the result
-                    self._user_profile_cache[user.userId] = (profile_data, time.time())
+                    self._user_profile_cache.set(user.userId, profile_data)
                     cached_profiles[user.userId] = profile_data
             
             return cached_profiles
@@ -5,6 +5,8 @@ from .moderator import Moderator
 from .post import Post
 from .comment import Comment
 from .report import Report
+from .user_counters import UserCounters
+from .stored_image import StoredImage
 from .enums import ReportStatus, VisibilityType, ReportTarget, UserDisableDays, LogActionTypes
 
 __all__ = [
@@ -15,6 +17,8 @@ __all__ = [
     "Post",
     "Comment",
     "Report",
+    "UserCounters",
+    "StoredImage",
     "ReportStatus",
     "VisibilityType",
     "ReportTarget",
@@ -3,6 +3,10 @@ import datetime
 
 class Comment(db.Model):
     __tablename__ = 'comment'
+    __table_args__ = (
+        # Comment pages and reply threads are range scans on (postId, parentCommentId, timestamp, commentId)
+        db.Index('idx_comment_thread', 'postId', 'parentCommentId', 'timestamp'),
+    )
 
     commentId = db.Column(db.Integer, primary_key=True, autoincrement=True)
     authorId = db.Column(db.Integer, db.ForeignKey('user.userId'), nullable=False)
@@ -11,6 +15,7 @@ class Comment(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     edited_at = db.Column(db.DateTime, nullable=True)
     parentCommentId = db.Column(db.Integer, db.ForeignKey('comment.commentId'))
+    commentType = db.Column(db.String(20), nullable=False, default='comment', server_default='comment')  # values from CommentType enum
     
     # Relationships
     author = db.relationship('User', backref=db.backref('comments', lazy=True))
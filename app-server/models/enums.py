@@ -11,6 +11,10 @@ class VisibilityType(Enum):
     PRIVATE = "Private"
     FOLLOWERS_ONLY = "FollowersOnly" 
 
+class CommentType(Enum):
+    COMMENT = "comment"
+    LIKE = "like"  # legacy like markers, once stored as comments whose content starts with __LIKE__
+
 class ReportTarget(Enum):
     POST = "Post"
     COMMENT = "Comment"
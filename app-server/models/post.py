@@ -3,6 +3,12 @@ import datetime
 
 class Post(db.Model):
     __tablename__ = 'post'
+    __table_args__ = (
+        # Supports keyset pagination of the feed on (timeOfPost, postId); `flask ensure-feed-indexes` on older databases
+        db.Index('idx_post_time_id', 'timeOfPost', 'postId'),
+        # Prefix title search; the ngram FULLTEXT index comes from `flask ensure-search-indexes`
+        db.Index('idx_post_title', 'title'),
+    )
 
     postId = db.Column(db.Integer, primary_key=True, autoincrement=True)
     authorId = db.Column(db.Integer, db.ForeignKey('user.userId'), nullable=False)
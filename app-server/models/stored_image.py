@@ -0,0 +1,11 @@
+from .database import db
+import datetime
+
+class StoredImage(db.Model):
+    __tablename__ = 'stored_image'
+
+    # One row per content-addressed upload; refCount is the number of posts and profiles that use it
+    imageKey = db.Column(db.String(255), primary_key=True)
+    refCount = db.Column(db.Integer, nullable=False, default=0)
+    stored = db.Column(db.Boolean, nullable=False, default=False)  # original and variants are in storage
+    createdAt = db.Column(db.DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,19 @@
+from .database import db
+import datetime
+
+class UserCounters(db.Model):
+    __tablename__ = 'user_counters'
+
+    # One row per user, kept in sync with post/followers so stats don't need COUNT(*) scans
+    userId = db.Column(db.Integer, db.ForeignKey('user.userId'), primary_key=True)
+    postsCount = db.Column(db.Integer, nullable=False, default=0)
+    followersCount = db.Column(db.Integer, nullable=False, default=0)
+    followingCount = db.Column(db.Integer, nullable=False, default=0)
+    updatedAt = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def to_stats(self):
+        return {
+            'posts_count': self.postsCount or 0,
+            'followers_count': self.followersCount or 0,
+            'following_count': self.followingCount or 0
+        }
@@ -0,0 +1,72 @@
+import json
+import unittest
+from flask import Flask, jsonify
+from sqlalchemy import text
+from models import db
+from backend.api_utils import Listing, listing_args, wants_ndjson
+
+LISTING = Listing('post p', {
+    'postId': 'p.postId',
+    'title': 'p.title',
+    'timeOfPost': 'p.timeOfPost',
+    'hasImage': 'p.image IS NOT NULL',
+}, time_column='p.timeOfPost', id_column='p.postId', converters={'hasImage': bool})
+
+class ListingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+
+        @self.app.route('/posts')
+        def posts():
+            streaming = wants_ndjson()
+            try:
+                fields, cursor, limit = listing_args(streaming)
+                fields = LISTING.parse_fields(fields)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            if streaming:
+                return LISTING.stream(fields, 'p.postId != :hidden', {'hidden': 3}, cursor, limit)
+            items, next_cursor = LISTING.page(fields, 'p.postId != :hidden', {'hidden': 3}, cursor, limit)
+            return jsonify({'success': True, 'posts': items, 'next_cursor': next_cursor})
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.execute(text("CREATE TABLE post (postId INTEGER PRIMARY KEY, title VARCHAR(255), timeOfPost DATETIME, image VARCHAR(255))"))
+        # Posts 4 and 5 share a timestamp, so the id breaks the tie
+        for post_id, time in [(1, '2024-01-01 10:00:00'), (2, '2024-01-02 10:00:00'), (3, '2024-01-03 10:00:00'),
+                              (4, '2024-01-04 10:00:00'), (5, '2024-01-04 10:00:00')]:
+            db.session.execute(text("INSERT INTO post VALUES (:id, :title, :time, :image)"),
+                               {"id": post_id, "title": f"post {post_id}", "time": time, "image": 'a.jpg' if post_id == 2 else None})
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    ## Pages follow the keyset cursor newest first and only contain the requested fields
+    def test_pages(self):
+        first = self.client.get('/posts?limit=2&fields=postId,hasImage').get_json()
+        self.assertEqual(first['posts'], [{'postId': 5, 'hasImage': False}, {'postId': 4, 'hasImage': False}])
+        second = self.client.get(f"/posts?limit=2&fields=postId,hasImage&cursor={first['next_cursor']}").get_json()
+        self.assertEqual(second['posts'], [{'postId': 2, 'hasImage': True}, {'postId': 1, 'hasImage': False}])
+        self.assertIsNone(second['next_cursor'])
+
+    ## Unknown fields and malformed cursors are rejected
+    def test_bad_arguments(self):
+        self.assertEqual(self.client.get('/posts?fields=postId,password').status_code, 400)
+        self.assertEqual(self.client.get('/posts?cursor=garbage').status_code, 400)
+
+    ## NDJSON streams one object per line, each carrying a cursor to resume after it
+    def test_ndjson_stream(self):
+        response = self.client.get('/posts?fields=postId', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([line['postId'] for line in lines], [5, 4, 2, 1])
+        resumed = self.client.get(f"/posts?format=ndjson&fields=postId&cursor={lines[1]['cursor']}")
+        self.assertEqual([json.loads(line)['postId'] for line in resumed.get_data(as_text=True).splitlines()], [2, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest, time
+from backend.cache_utils import LocalCache, TieredCache
+
+class CacheTestCase(unittest.TestCase):
+    ## Least recently used entries are evicted past the cap
+    def test_lru_eviction(self):
+        cache = LocalCache(max_entries=2, ttl=60)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual(cache.get(2), (False, None))
+        self.assertEqual(cache.get(1), (True, 'a'))
+        self.assertEqual(cache.evictions, 1)
+
+    ## Entries expire after the TTL
+    def test_ttl_expiry(self):
+        cache = LocalCache(max_entries=10, ttl=0.01)
+        cache.set('key', 'value')
+        time.sleep(0.02)
+        self.assertEqual(cache.get('key'), (False, None))
+
+    ## Hit and miss counters
+    def test_stats(self):
+        cache = TieredCache('test', max_entries=10, ttl=60, use_redis=False)
+        cache.get(1)
+        cache.set(1, {'posts_count': 3})
+        self.assertEqual(cache.get(1), (True, {'posts_count': 3}))
+        cache.delete(1)
+        cache.get(1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertEqual(stats['hit_rate'], 0.333)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from backend.comment_utils import comment_page, reply_counts
+from backend.cursor_utils import decode_cursor
+
+class CommentPageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.execute(text("CREATE TABLE user (userId INTEGER PRIMARY KEY, username VARCHAR(50), profilePicture VARCHAR(255))"))
+        db.session.execute(text("""
+            CREATE TABLE comment (commentId INTEGER PRIMARY KEY, authorId INT, postId INT, commentContent TEXT,
+                                  timestamp DATETIME, edited_at DATETIME, parentCommentId INT,
+                                  commentType VARCHAR(20) NOT NULL DEFAULT 'comment')
+        """))
+        db.session.execute(text("INSERT INTO user VALUES (1, 'alice', NULL)"))
+        # Post 1: top-level comments 1-3, a like marker (4), replies 5-7 to comment 1; comment 8 is on post 2
+        rows = [(1, 1, None, 'comment', 1), (2, 1, None, 'comment', 2), (3, 1, None, 'comment', 3),
+                (4, 1, None, 'like', 4), (5, 1, 1, 'comment', 5), (6, 1, 1, 'comment', 6), (7, 1, 1, 'comment', 7),
+                (8, 2, None, 'comment', 8)]
+        for comment_id, post_id, parent_id, comment_type, minute in rows:
+            db.session.execute(text("""
+                INSERT INTO comment (commentId, authorId, postId, commentContent, timestamp, parentCommentId, commentType)
+                VALUES (:id, 1, :post_id, :content, :time, :parent_id, :comment_type)
+            """), {"id": comment_id, "post_id": post_id, "content": f"comment {comment_id}",
+                   "time": f"2024-01-01 10:0{minute}:00", "parent_id": parent_id, "comment_type": comment_type})
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+
+    ## Top-level comments page newest first, skip like markers and carry their reply counts
+    def test_top_level_pages(self):
+        comments, next_cursor = comment_page(1, limit=2)
+        self.assertEqual([(c['commentId'], c['reply_count']) for c in comments], [(3, 0), (2, 0)])
+        comments, next_cursor = comment_page(1, cursor=decode_cursor(next_cursor), limit=2)
+        self.assertEqual([(c['commentId'], c['reply_count']) for c in comments], [(1, 3)])
+        self.assertIsNone(next_cursor)
+
+    ## Replies are loaded per thread, oldest first
+    def test_reply_pages(self):
+        replies, next_cursor = comment_page(1, parent_id=1, limit=2)
+        self.assertEqual([c['commentId'] for c in replies], [5, 6])
+        replies, next_cursor = comment_page(1, parent_id=1, cursor=decode_cursor(next_cursor), limit=2)
+        self.assertEqual([c['commentId'] for c in replies], [7])
+        self.assertIsNone(next_cursor)
+
+    ## Reply counts cover only the given comments, and an empty list needs no special case
+    def test_reply_counts(self):
+        self.assertEqual(reply_counts(1, [1, 2]), {1: 3})
+        self.assertEqual(reply_counts(1, []), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from backend.counter_utils import get_user_counters, adjust_user_counters
+
+class CounterUtilsTestCase(unittest.TestCase):
+    ## Stats come from the counters row without counting posts or followers
+    @patch("backend.counter_utils.db")
+    def test_counters_row_is_used(self, mock_db):
+        mock_db.session.execute.return_value.fetchone.return_value = MagicMock(postsCount=4, followersCount=120000, followingCount=7)
+        stats = get_user_counters(1)
+        self.assertEqual(stats, {'posts_count': 4, 'followers_count': 120000, 'following_count': 7})
+        self.assertEqual(mock_db.session.execute.call_count, 1)
+        mock_db.engine.begin.assert_not_called()
+
+    ## Deltas are applied in the caller's transaction, not committed
+    @patch("backend.counter_utils.db")
+    def test_adjust_does_not_commit(self, mock_db):
+        adjust_user_counters(1, followers=-1)
+        params = mock_db.session.execute.call_args[0][1]
+        self.assertEqual((params['posts'], params['followers'], params['following']), (0, -1, 0))
+        mock_db.session.commit.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
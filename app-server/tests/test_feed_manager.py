@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from backend.cursor_utils import encode_cursor, decode_cursor
+from managers.feed_manager import FeedManager, FeedItem
+from backend.timeline_store import LocalTimelineBackend, CELEBRITIES_KEY, author_key, inbox_key
+
+class FeedCursorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.feed_manager = FeedManager()
+
+    ## Cursor round trip
+    def test_cursor_round_trip(self):
+        timestamp = datetime(2025, 7, 10, 12, 30, 15)
+        token = encode_cursor(timestamp, 42)
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token), (timestamp, 42))
+
+    ## Tampered cursors are ignored instead of raising
+    def test_invalid_cursor(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertIsNone(decode_cursor(''))
+        self.assertIsNone(decode_cursor(None))
+
+    ## Keyset clause replaces OFFSET when a cursor is given
+    def test_pagination_clause_uses_keyset(self):
+        token = encode_cursor(datetime(2025, 7, 10), 7)
+        where, limit, params = self.feed_manager._pagination_clause(3, 20, token)
+        self.assertIn(':cursor_time', where)
+        self.assertNotIn('OFFSET', limit)
+        self.assertEqual(params['cursor_id'], 7)
+
+        where, limit, params = self.feed_manager._pagination_clause(3, 20, 'garbage')
+        self.assertEqual(where, '')
+        self.assertEqual(params['offset'], 40)
+
+    ## Next cursor only when the page is full
+    def test_next_cursor(self):
+        post = MagicMock(timeOfPost=datetime(2025, 7, 10), postId=5)
+        self.assertIsNone(self.feed_manager.get_next_cursor([post], per_page=2))
+        token = self.feed_manager.get_next_cursor([post, post], per_page=2)
+        self.assertEqual(decode_cursor(token), (datetime(2025, 7, 10), 5))
+
+    ## Feed items are built from the feed row, including the author
+    def test_feed_item_from_row(self):
+        row = MagicMock(postId=1, authorId=2, title='Title', timeOfPost=datetime(2025, 7, 10), updatedAt=None,
+                        like=3, likesId=None, image='img.png', content='Content',
+                        username='alice', profilePicture='', visibility='Public')
+        item = FeedItem.from_row(row)
+        self.assertEqual(item.author.username, 'alice')
+        self.assertEqual(item.author.userId, 2)
+        self.assertEqual(item.like, 3)
+
+    ## Existing databases get the keyset index on post from ensure_feed_indexes
+    @patch('managers.feed_manager.ensure_index', return_value=True)
+    def test_ensure_feed_indexes(self, mock_ensure_index):
+        self.assertEqual(self.feed_manager.ensure_feed_indexes(), ['idx_post_time_id'])
+        mock_ensure_index.assert_called_once_with('post', 'idx_post_time_id', ['timeOfPost', 'postId'])
+
+class TimelineFanoutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.feed_manager = FeedManager()
+        self.feed_manager.timeline_enabled = True
+        self.feed_manager.fanout_follower_limit = 2
+        self.store = LocalTimelineBackend()
+        patcher = patch('managers.feed_manager.get_timeline_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.feed_manager._accepted_follower_ids = MagicMock(return_value=[10, 11, 12])
+
+    ## Deleting one post of a large FollowersOnly author keeps them merged at read time
+    def test_retract_post_keeps_celebrity(self):
+        entries = [(1, 10.0), (2, 20.0)]
+        self.store.add_many(author_key(5), entries)
+        self.feed_manager._index_author_posts(self.store, 5, 'FollowersOnly', entries)
+        self.assertIn(5, self.store.set_members(CELEBRITIES_KEY))
+        self.assertEqual(self.store.entries(inbox_key(10)), [])
+
+        self.feed_manager.retract_post(2, 5)
+        self.assertIn(5, self.store.set_members(CELEBRITIES_KEY))
+        self.assertEqual(self.store.entries(author_key(5)), [(1, 10.0)])
+
+    ## A cold in-process store is warmed in the background while the feed query serves the request
+    def test_cold_store_falls_back(self):
+        self.feed_manager._warm_local_store = MagicMock()
+        self.assertIsNone(self.feed_manager._generate_feed_from_timeline(1, 20))
+        self.feed_manager._warm_local_store.assert_called_once_with(self.store)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from backend import hibp_utils
+from backend.hibp_utils import BreachCorpus, build_breach_corpus, check_password_breach
+
+BREACHED = ['password', '123456', 'letmein', 'qwerty']
+
+class BreachCorpusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.hashes = sorted((hashlib.sha1(p.encode('utf-8')).hexdigest().upper(), i + 1) for i, p in enumerate(BREACHED))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_dump(self, lines):
+        path = os.path.join(self.tmp, 'dump.txt')
+        with open(path, 'w') as dump:
+            dump.write(''.join(f"{digest}:{count}\n" for digest, count in lines))
+        return path
+
+    ## A single-file dump converts to a corpus answering exact lookups
+    def test_build_and_lookup(self):
+        path = os.path.join(self.tmp, 'corpus.bin')
+        self.assertEqual(build_breach_corpus(self.write_dump(self.hashes), path), 4)
+        corpus = BreachCorpus(path)
+        self.assertEqual(len(corpus), 4)
+        for digest, count in self.hashes:
+            self.assertEqual(corpus.count(bytes.fromhex(digest)), count)
+        self.assertEqual(corpus.count(hashlib.sha1(b'correct horse battery staple').digest()), 0)
+        corpus.close()
+
+    ## Range-file directories give the same corpus
+    def test_build_from_range_files(self):
+        ranges = os.path.join(self.tmp, 'ranges')
+        os.mkdir(ranges)
+        for digest, count in self.hashes:
+            with open(os.path.join(ranges, digest[:5] + '.txt'), 'a') as range_file:
+                range_file.write(f"{digest[5:]}:{count}\n")
+        path = os.path.join(self.tmp, 'corpus.bin')
+        build_breach_corpus(ranges, path)
+        with mock.patch.object(hibp_utils, '_corpus', BreachCorpus(path)):
+            self.assertEqual(check_password_breach('letmein'), 3)
+            self.assertEqual(check_password_breach('not in the dump'), 0)
+
+    ## Unsorted dumps are rejected rather than producing a corpus that can't be searched
+    def test_rejects_unsorted(self):
+        with self.assertRaises(ValueError):
+            build_breach_corpus(self.write_dump(reversed(self.hashes)), os.path.join(self.tmp, 'corpus.bin'))
+
+    ## Online ranges are fetched once and then served from the cache
+    def test_online_range_cache(self):
+        digest = hashlib.sha1(b'password').hexdigest().upper()
+        response = mock.Mock(status_code=200, text=f"{digest[5:]}:42\r\n{'0' * 35}:1")
+        with mock.patch.object(hibp_utils._session, 'get', return_value=response) as get:
+            self.assertEqual(check_password_breach('password'), 42)
+            self.assertEqual(check_password_breach('password'), 42)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args.kwargs['timeout'], hibp_utils.HIBP_TIMEOUT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from managers.home_page_loader import HomePageLoader
+
+class HomePageLoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.feed_manager = MagicMock()
+        self.profile_manager = MagicMock()
+        self.loader = HomePageLoader(self.feed_manager, self.profile_manager, workers=0)
+
+    ## Sections are bundled together with a timing for each
+    @patch.object(HomePageLoader, '_current_user', return_value=None)
+    @patch.object(HomePageLoader, '_engagement', return_value=({1: True}, {1: 2}))
+    def test_load_bundles_sections(self, mock_engagement, mock_current_user):
+        self.feed_manager.generate_feed.return_value = [MagicMock(postId=1)]
+        self.feed_manager.get_next_cursor.return_value = None
+        self.profile_manager.get_user_stats_cached.return_value = {'posts_count': 1, 'followers_count': 0, 'following_count': 0}
+        self.profile_manager.get_suggested_users_cached.return_value = []
+        self.profile_manager.get_pending_follow_requests.return_value = {'success': True, 'requests': [{'requester_id': 3}]}
+
+        page = self.loader.load(7)
+        self.assertEqual(page.liked_posts, {1: True})
+        self.assertEqual(page.comment_counts, {1: 2})
+        self.assertEqual(page.pending_requests, [{'requester_id': 3}])
+        for section in ('feed', 'stats', 'suggestions', 'requests', 'user', 'engagement', 'total'):
+            self.assertIn(section, page.timings)
+        self.assertIn('feed;dur=', page.server_timing())
+
+    ## A failing section falls back to its default instead of breaking the page
+    @patch.object(HomePageLoader, '_current_user', return_value=None)
+    def test_failed_section_uses_default(self, mock_current_user):
+        self.feed_manager.generate_feed.side_effect = Exception('db down')
+        self.feed_manager.get_next_cursor.return_value = None
+        self.profile_manager.get_user_stats_cached.side_effect = Exception('db down')
+
+        page = self.loader.load(7)
+        self.assertEqual(page.posts, [])
+        self.assertEqual(page.user_stats['posts_count'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import io
+import unittest
+from PIL import Image
+from backend.image_utils import (post_image_variants, avatar_variants, variant_keys, image_variant, image_srcset,
+                                 avatar_url, processed_image_key, POST_IMAGE_WIDTHS)
+
+def jpeg_with_exif(width, height, orientation=1):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = 'Camera maker'
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(output, 'JPEG', exif=exif)
+    output.seek(0)
+    return output
+
+class ImageUtilsTestCase(unittest.TestCase):
+    ## Every stored image is re-encoded without EXIF, with the orientation applied
+    def test_metadata_stripped(self):
+        key = processed_image_key('posts', 'a1b2', 'photo.JPG')
+        objects = post_image_variants(jpeg_with_exif(400, 200, orientation=6), key)
+        self.assertEqual(objects[0][0], 'posts/a1b2/original.jpg')
+        for _, data, _ in objects:
+            image = Image.open(data)
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(Image.open(objects[0][1]).size, (200, 400))
+
+    ## Post variants are produced per width without upscaling; avatars are square
+    def test_variant_sizes(self):
+        key = 'posts/a1b2/original.jpg'
+        objects = post_image_variants(jpeg_with_exif(800, 400), key)
+        self.assertEqual([k for k, _, _ in objects[1:]], variant_keys(key))
+        widths = [Image.open(data).width for _, data, _ in objects[1:]]
+        self.assertEqual(widths, [320, 640, 800])
+
+        avatars = avatar_variants(jpeg_with_exif(300, 200), 'profile_pics/c3d4/original.jpg')
+        self.assertEqual([Image.open(data).size for _, data, _ in avatars[1:]], [(64, 64), (160, 160)])
+
+    ## Filters point at the variants and leave URLs from before variants were generated alone
+    def test_template_filters(self):
+        url = '/media/posts/a1b2/original.png'
+        self.assertEqual(image_variant(url, 600), '/media/posts/a1b2/640w.webp')
+        self.assertEqual(image_srcset(url).count('w.webp'), len(POST_IMAGE_WIDTHS))
+        self.assertEqual(avatar_url('/media/profile_pics/c3d4/original.jpg', 40), '/media/profile_pics/c3d4/64px.webp')
+        legacy = 'https://storage.googleapis.com/bucket/posts/1234_photo.png'
+        self.assertEqual(image_variant(legacy, 600), legacy)
+        self.assertEqual(image_srcset(legacy), '')
+        self.assertEqual(avatar_url(None, 64), None)
+
+if __name__ == '__main__':
+    unittest.main()
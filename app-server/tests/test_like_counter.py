@@ -0,0 +1,41 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from backend.like_counter import LocalLikeBuffer, LikeCounter, merge_pending_likes
+from managers.feed_manager import FeedItem, FeedAuthor
+
+class LikeCounterTestCase(unittest.TestCase):
+    ## Deltas accumulate per post and drain empties the buffer
+    def test_local_buffer(self):
+        buffer = LocalLikeBuffer(shards=4)
+        buffer.add(1, 1)
+        buffer.add(1, 1)
+        buffer.add(5, -1)
+        buffer.add(2, 1)
+        buffer.add(2, -1)
+        self.assertEqual(buffer.pending([1, 2, 5]), {1: 2, 5: -1})
+        self.assertEqual(buffer.drain(), {1: 2, 5: -1})
+        self.assertEqual(buffer.drain(), {})
+
+    ## Reads add the pending delta to the stored count
+    @patch("backend.like_counter.get_redis_client", return_value=None)
+    def test_merge_pending_likes(self, mock_redis):
+        counter = LikeCounter()
+        counter._local.add(1, 2)
+        item = FeedItem(1, 2, 'Title', datetime(2025, 7, 10), None, 3, None, None, 'Content', FeedAuthor(2, 'alice', '', 'Public'))
+        merged = merge_pending_likes([item], counter)
+        self.assertEqual(merged[0].like, 5)
+        self.assertEqual(item.like, 3)
+
+    ## A failed flush puts the deltas back for the next attempt
+    @patch("backend.like_counter.get_redis_client", return_value=None)
+    @patch("models.db")
+    def test_failed_flush_restores_deltas(self, mock_db, mock_redis):
+        counter = LikeCounter()
+        counter._local.add(1, 1)
+        mock_db.session.execute.side_effect = Exception('lock wait timeout')
+        self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter._local.pending([1]), {1: 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+from flask import Flask
+from backend.limiter import RateLimiter, rate_limit_required, SLIDING_WINDOW, TOKEN_BUCKET
+
+class RateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(max_keys=2)
+        self.now = 1000.0
+        patcher = mock.patch('backend.limiter.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def hits(self, key, count, algorithm):
+        return [self.limiter.hit(key, 5, 10, algorithm) for _ in range(count)]
+
+    ## The previous window still counts in proportion to how much of it overlaps
+    def test_sliding_window(self):
+        self.assertEqual(self.hits('ip', 6, SLIDING_WINDOW), [True] * 5 + [False])
+        self.now = 1012.0  # 20% into the next window: 5 * 0.8 = 4 still counted
+        self.assertEqual(self.hits('ip', 2, SLIDING_WINDOW), [True, False])
+        self.now = 1030.0
+        self.assertEqual(self.hits('ip', 5, SLIDING_WINDOW), [True] * 5)
+
+    ## Tokens refill continuously at limit / window per second
+    def test_token_bucket(self):
+        self.assertEqual(self.hits('ip', 6, TOKEN_BUCKET), [True] * 5 + [False])
+        self.now += 2  # one token back
+        self.assertEqual(self.hits('ip', 2, TOKEN_BUCKET), [True, False])
+
+    ## State is bounded; the least recently seen keys are dropped
+    def test_bounded_keys(self):
+        for key in ['a', 'b', 'c']:
+            self.limiter.hit(key, 5, 10)
+        self.assertEqual(len(self.limiter._local), 2)
+
+class RateLimitDecoratorTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('backend.limiter._rate_limiter', RateLimiter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.app = Flask(__name__)
+
+        @self.app.route('/shared', methods=['GET', 'POST'])
+        @rate_limit_required
+        def shared():
+            return 'ok'
+
+        @self.app.route('/own', methods=['POST'])
+        @rate_limit_required(limit=1, window=60, scope='own-test')
+        def own():
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    ## Only POSTs are limited, and a scoped route has its own budget
+    def test_policies(self):
+        for _ in range(10):
+            self.assertEqual(self.client.get('/shared').status_code, 200)
+        self.assertEqual(self.client.post('/own').status_code, 200)
+        response = self.client.post('/own')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '60')
+        self.assertEqual(self.client.post('/shared').status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import gzip
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from unittest.mock import patch
+from backend import log_archive
+from backend.log_archive import archive_application_log, archived_log_count, read_archived_log
+
+class LogArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.execute(text("""
+            CREATE TABLE application_log (id INTEGER PRIMARY KEY, user_id INT, action VARCHAR(50),
+            target_id INT, target_type VARCHAR(20), timestamp DATETIME)
+        """))
+        now = datetime.utcnow()
+        # Five rows a day apart, 100 down to 96 days old, plus one recent row
+        for i, age in enumerate([100, 99, 98, 97, 96, 1]):
+            db.session.execute(text("""
+                INSERT INTO application_log (id, user_id, action, target_id, target_type, timestamp)
+                VALUES (:id, :user_id, :action, 1, 'Post', :timestamp)
+            """), {"id": i + 1, "user_id": i % 2 + 1, "action": 'like_post' if i % 2 else 'unlike_post',
+                   "timestamp": now - timedelta(days=age)})
+        db.session.commit()
+        self.archive_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir)
+        db.session.remove()
+        self.ctx.pop()
+
+    ## Old rows move to per-day gzip files and leave the table
+    def test_archive_moves_old_rows(self):
+        self.assertEqual(archive_application_log(90, self.archive_dir, batch_size=2), 5)
+        remaining = db.session.execute(text("SELECT id FROM application_log")).scalars().all()
+        self.assertEqual(remaining, [6])
+        self.assertEqual(archived_log_count(self.archive_dir), 5)
+        self.assertEqual(archive_application_log(90, self.archive_dir), 0)
+
+        # A run interrupted after recording a batch but before deleting it only deletes those rows next time
+        db.session.execute(text("""
+            INSERT INTO application_log (id, user_id, action, target_id, target_type, timestamp)
+            VALUES (1, 1, 'unlike_post', 1, 'Post', :timestamp)
+        """), {"timestamp": read_archived_log(1, direction='newer', archive_dir=self.archive_dir)[0].timestamp})
+        db.session.commit()
+        self.assertEqual(archive_application_log(90, self.archive_dir), 0)
+        self.assertEqual(archived_log_count(self.archive_dir), 5)
+        self.assertIsNone(db.session.execute(text("SELECT id FROM application_log WHERE id = 1")).first())
+
+    ## Archived rows page newest first with the same keyset semantics, skipping repeated rows
+    def test_read_archived_log(self):
+        archive_application_log(90, self.archive_dir)
+        rows = read_archived_log(10, archive_dir=self.archive_dir)
+        self.assertEqual([row.id for row in rows], [5, 4, 3, 2, 1])
+
+        page = read_archived_log(2, archive_dir=self.archive_dir)
+        older = read_archived_log(2, (page[-1].timestamp, page[-1].id), archive_dir=self.archive_dir)
+        self.assertEqual([row.id for row in older], [3, 2])
+        newer = read_archived_log(2, (older[0].timestamp, older[0].id), 'newer', archive_dir=self.archive_dir)
+        self.assertEqual([row.id for row in newer], [4, 5])
+
+        self.assertEqual([row.id for row in read_archived_log(10, action='like_post', archive_dir=self.archive_dir)], [4, 2])
+
+        # A run interrupted after writing but before deleting archives the same rows again
+        path = self.archive_dir + f"/application_log-{rows[0].timestamp.date().isoformat()}.jsonl.gz"
+        with gzip.open(path, 'rt') as archive:
+            duplicate = archive.read()
+        with gzip.open(path, 'at') as archive:
+            archive.write(duplicate)
+        self.assertEqual([row.id for row in read_archived_log(10, archive_dir=self.archive_dir)], [5, 4, 3, 2, 1])
+
+    ## Filtered totals come from the manifest, and members without matching rows are never opened
+    def test_manifest_counts_and_skips(self):
+        archive_application_log(90, self.archive_dir, batch_size=2)
+        self.assertEqual(archived_log_count(self.archive_dir, action='like_post'), 2)
+        self.assertEqual(archived_log_count(self.archive_dir, action='unlike_post', user_id=1), 3)
+        self.assertEqual(archived_log_count(self.archive_dir, user_id=2, action='unlike_post'), 0)
+
+        with patch('backend.log_archive._read_member', wraps=log_archive._read_member) as read_members:
+            self.assertEqual(read_archived_log(10, action='missing', archive_dir=self.archive_dir), [])
+            read_members.assert_not_called()
+            self.assertEqual([row.id for row in read_archived_log(10, user_id=2, archive_dir=self.archive_dir)], [4, 2])
+            self.assertEqual(read_members.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
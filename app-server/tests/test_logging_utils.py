@@ -0,0 +1,70 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from backend import logging_utils
+from backend.logging_utils import AuditLogWriter, log_action
+
+class AuditLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.execute(text("""
+            CREATE TABLE application_log (id INTEGER PRIMARY KEY, user_id INT, action VARCHAR(50),
+            target_id INT, target_type VARCHAR(20), timestamp DATETIME)
+        """))
+        db.session.commit()
+        self.writer = AuditLogWriter(batch_size=2)
+        self.writer._thread = object()  # flushed explicitly below
+        self.original_writer = logging_utils._writer
+        logging_utils._writer = self.writer
+
+    def tearDown(self):
+        logging_utils._writer = self.original_writer
+        db.session.remove()
+        self.ctx.pop()
+
+    def count(self):
+        return db.session.execute(text("SELECT COUNT(*) FROM application_log")).scalar()
+
+    ## Records are queued on commit and written in multi-row batches
+    def test_queued_until_commit(self):
+        for post_id in range(3):
+            log_action(1, 'like_post', post_id, 'Post')
+        self.assertEqual(self.writer.metrics()['queue_depth'], 0)
+        db.session.commit()
+        self.assertEqual(self.writer.metrics()['queue_depth'], 3)
+        self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual(self.count(), 3)
+        self.assertEqual(self.writer.metrics()['queue_depth'], 0)
+
+    ## Rolled back records are never written
+    def test_rollback_discards(self):
+        db.session.execute(text("SELECT 1"))
+        log_action(1, 'like_post', 1, 'Post')
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(self.writer.metrics()['queue_depth'], 0)
+
+    ## Security-relevant actions are written in the caller's transaction
+    def test_sync_actions(self):
+        log_action(1, 'login', 1, 'User')
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(self.writer.metrics()['queue_depth'], 0)
+
+    ## Queued records keep the database server's clock, backdated by the time they spent in the queue
+    def test_queued_timestamp_uses_server_clock(self):
+        self.writer.enqueue([{"user_id": 1, "action": 'like_post', "target_id": 1, "target_type": 'Post',
+                              "queued_at": time.monotonic() - 60}])
+        self.writer.flush()
+        server_now = datetime.fromisoformat(db.session.execute(text("SELECT CURRENT_TIMESTAMP")).scalar())
+        written = datetime.fromisoformat(db.session.execute(text("SELECT timestamp FROM application_log")).scalar())
+        self.assertLess(abs((server_now - timedelta(seconds=60) - written).total_seconds()), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import smtplib
+import unittest
+from unittest import mock
+from email.mime.text import MIMEText
+from backend.mail_utils import LocalSMTPSink, Mailer, SMTPConnectionPool
+
+class MailerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.sink = LocalSMTPSink().start()
+        self.pool = SMTPConnectionPool('localhost', self.sink.port, username='', starttls=False, size=1)
+        self.mailer = Mailer(self.pool, workers=1, backoff=0)
+
+    def tearDown(self):
+        self.mailer.close()
+        self.sink.shutdown()
+        self.sink.server_close()
+
+    def message(self, to):
+        msg = MIMEText('Your code is 123456')
+        msg['From'] = 'noreply@latergram.com'
+        msg['To'] = to
+        msg['Subject'] = 'Code'
+        return msg
+
+    ## Queued messages are delivered over one reused connection
+    def test_delivery_reuses_connection(self):
+        ids = [self.mailer.send(self.message(f'user{i}@example.com')) for i in range(3)]
+        self.mailer.join()
+        self.assertEqual(len(self.sink.received), 3)
+        self.assertIn('123456', self.sink.received[0]['data'])
+        self.assertEqual([self.mailer.status(message_id)['status'] for message_id in ids], ['sent'] * 3)
+        self.assertEqual(self.pool.opened, 1)
+
+    ## A dropped connection is replaced on retry
+    def test_retry_after_disconnect(self):
+        self.mailer.deliver('warmup', self.message('user@example.com'))
+        connection, _ = self.pool._idle[0]
+        connection.close()
+        self.assertTrue(self.mailer.deliver('retry', self.message('user@example.com')))
+        status = self.mailer.status('retry')
+        self.assertEqual((status['status'], status['attempts']), ('sent', 2))
+        self.assertEqual(len(self.sink.received), 2)
+
+    ## Permanent failures are not retried
+    def test_permanent_failure(self):
+        self.pool.send = mock.Mock(side_effect=smtplib.SMTPResponseException(550, b'No such user'))
+        self.assertFalse(self.mailer.deliver('bad', self.message('nobody@example.com')))
+        self.assertEqual(self.mailer.status('bad')['status'], 'failed')
+        self.assertEqual(self.pool.send.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -87,7 +87,7 @@ class MainRouteTestCase(unittest.TestCase):
         self.assertIn(b'Not logged in', response.data)
         
     ## Test creating a post without authentication
-    @patch("backend.routes.main.storage")
+    @patch("backend.routes.main.get_upload_pipeline")
     @patch("backend.routes.main.db")
     @patch("backend.routes.main.is_allowed_file_secure", return_value=True)
     @patch("backend.routes.main.log_to_splunk")
@@ -115,12 +115,13 @@ class MainRouteTestCase(unittest.TestCase):
         self.assertIn(b"login", response.data.lower() or b"not logged in")
 
     ## Test creating a post with authentication
-    @patch("backend.routes.main.storage")
+    @patch("backend.routes.main.adjust_user_counters")
+    @patch("backend.routes.main.get_upload_pipeline")
     @patch("backend.routes.main.db")
     @patch("backend.routes.main.is_allowed_file_secure", return_value=True)
     @patch("backend.routes.main.log_action")
     @patch("backend.routes.main.log_to_splunk")
-    def test_create_post_authenticated(self,mock_log_action,mock_log_to_splunk,mock_is_allowed_file_secure,mock_db,mock_storage):
+    def test_create_post_authenticated(self,mock_log_action,mock_log_to_splunk,mock_is_allowed_file_secure,mock_db,mock_storage,mock_adjust_user_counters):
         self.login_as_user(user_id=99)
 
         # Set up mocks
@@ -143,9 +144,10 @@ class MainRouteTestCase(unittest.TestCase):
         response = self.client.post("/create-post", data=data, content_type="multipart/form-data", follow_redirects=False)
         self.assertEqual(response.status_code, 302)
         self.assertIn("/home", response.headers.get("Location", ""))
+        mock_storage.return_value.submit.assert_called_once()
 
     ## Test creating a post of invalid type with authentication
-    @patch("backend.routes.main.storage")
+    @patch("backend.routes.main.get_upload_pipeline")
     @patch("backend.routes.main.db")
     @patch("backend.routes.main.log_to_splunk")
     def test_file_type_authenticated(self,mock_log_to_splunk,mock_db,mock_storage):
@@ -173,7 +175,7 @@ class MainRouteTestCase(unittest.TestCase):
         self.assertIn(b"Invalid image format", response.data)
 
     ## Test creating a post with no image
-    @patch("backend.routes.main.storage")
+    @patch("backend.routes.main.get_upload_pipeline")
     @patch("backend.routes.main.db")
     @patch("backend.routes.main.log_to_splunk")
     def test_create_post_no_image(self, mock_log_to_splunk, mock_db, mock_storage):
@@ -198,7 +200,7 @@ class MainRouteTestCase(unittest.TestCase):
         self.assertIn(b"no image provided", response.data)
 
     @patch("backend.routes.main.is_allowed_file_secure", return_value=True)
-    @patch("backend.routes.main.storage")
+    @patch("backend.routes.main.get_upload_pipeline")
     @patch("backend.routes.main.db")
     @patch("backend.routes.main.log_to_splunk")
     def test_profanity_in_post_content(self, mock_log_to_splunk, mock_db, mock_storage, mock_is_allowed_file_secure):
@@ -0,0 +1,58 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from backend.cursor_utils import encode_cursor, decode_cursor
+from managers.moderator_manager import ModeratorManager
+
+def log_row(log_id, action='like_post', target_type='Post', target_id=10):
+    return MagicMock(id=log_id, user_id=1, action=action, target_type=target_type, target_id=target_id,
+                     timestamp=datetime(2025, 7, 10, 12, 0, log_id))
+
+class ApplicationLogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = ModeratorManager()
+
+    ## Pages by keyset and resolves names with one lookup per target kind
+    @patch.object(ModeratorManager, '_application_log_total', return_value=1000)
+    @patch("managers.moderator_manager.db")
+    def test_keyset_page(self, mock_db, mock_total):
+        rows = [log_row(3), log_row(2), log_row(1, 'follow_user', 'User', 5)]
+        mock_db.session.execute.side_effect = [
+            MagicMock(fetchall=MagicMock(return_value=rows)),
+            [MagicMock(id=1, username='alice'), MagicMock(id=5, username='bob')],
+            [MagicMock(id=10, username='carol')],
+        ]
+        cursor = encode_cursor(datetime(2025, 7, 10, 12, 0, 4), 4)
+        page = self.manager.get_application_log(per_page=2, cursor=cursor, action='like_post')
+
+        sql, params = str(mock_db.session.execute.call_args_list[0][0][0]), mock_db.session.execute.call_args_list[0][0][1]
+        self.assertNotIn('OFFSET', sql)
+        self.assertEqual((params['cursor_id'], params['action'], params['limit']), (4, 'like_post', 3))
+        self.assertEqual([item.id for item in page['items']], [3, 2])
+        self.assertEqual(page['items'][0].user_username, 'alice')
+        self.assertEqual(page['items'][0].target_author_username, 'carol')
+        self.assertTrue(page['has_prev'])
+        self.assertTrue(page['has_next'])
+        self.assertEqual(decode_cursor(page['next_cursor'])[1], 2)
+
+    ## Rows of deleted users stay on the page with a label instead of a name
+    @patch.object(ModeratorManager, '_application_log_total', return_value=1)
+    @patch("managers.moderator_manager.db")
+    def test_deleted_user(self, mock_db, mock_total):
+        mock_db.session.execute.side_effect = [
+            MagicMock(fetchall=MagicMock(return_value=[log_row(1)])),
+            [],
+            [MagicMock(id=10, username='carol')],
+        ]
+        page = self.manager.get_application_log(per_page=2)
+        self.assertEqual(page['items'][0].user_username, '(deleted user #1)')
+        self.assertEqual(page['items'][0].target_author_username, 'carol')
+
+    ## Date filters include the whole end day
+    def test_date_filters(self):
+        where, params = self.manager._log_filters(start_date=datetime(2025, 7, 1), end_date=datetime(2025, 7, 2))
+        self.assertEqual(len(where), 2)
+        self.assertEqual(params['end_date'], datetime(2025, 7, 3))
+
+if __name__ == '__main__':
+    unittest.main()
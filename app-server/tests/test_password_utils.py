@@ -0,0 +1,51 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+import bcrypt
+from backend.password_utils import PasswordHasher, PasswordHasherBusy
+
+class PasswordHasherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(rounds=5, workers=2, max_pending=2, timeout=0.1)
+
+    ## Hashes verify with bcrypt and with the hasher
+    def test_hash_and_check(self):
+        pw_hash = self.hasher.hash('correct horse')
+        self.assertTrue(bcrypt.checkpw(b'correct horse', pw_hash.encode('utf-8')))
+        self.assertTrue(self.hasher.check(pw_hash, 'correct horse'))
+        self.assertFalse(self.hasher.check(pw_hash, 'wrong'))
+        self.assertFalse(self.hasher.check('not a hash', 'wrong'))
+        self.assertEqual(self.hasher.metrics()['completed'], 4)
+
+    ## A successful check with an outdated cost replaces the stored hash
+    def test_rehash_on_cost_change(self):
+        account = SimpleNamespace(password=bcrypt.hashpw(b'secret', bcrypt.gensalt(4)).decode('utf-8'))
+        self.assertTrue(self.hasher.verify_and_update(account, 'secret'))
+        self.assertTrue(account.password.startswith('$2b$05$'))
+        self.assertTrue(self.hasher.check(account.password, 'secret'))
+        current = account.password
+        self.assertFalse(self.hasher.verify_and_update(account, 'wrong'))
+        self.assertTrue(self.hasher.verify_and_update(account, 'secret'))
+        self.assertEqual(account.password, current)
+        self.assertEqual(self.hasher.metrics()['rehashed'], 1)
+
+    ## Callers are turned away once every slot is taken
+    def test_rejects_when_saturated(self):
+        release = threading.Event()
+        blockers = [threading.Thread(target=self.hasher._run, args=(release.wait,)) for _ in range(2)]
+        for thread in blockers:
+            thread.start()
+        while self.hasher._slots._value:
+            time.sleep(0.01)
+        try:
+            with self.assertRaises(PasswordHasherBusy):
+                self.hasher.hash('password')
+        finally:
+            release.set()
+            for thread in blockers:
+                thread.join()
+        self.assertEqual(self.hasher.metrics()['rejected'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
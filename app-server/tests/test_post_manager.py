@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from managers.post_manager import PostManager
+
+class AtomicLikeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.post_manager = PostManager()
+        self.post_manager.atomic_likes = True
+
+    ## The count UPDATE runs first, taking the post row lock before the inserts, and returns the new count
+    @patch("managers.post_manager.log_action")
+    @patch("managers.post_manager.Post")
+    @patch("managers.post_manager.db")
+    def test_like_returns_count_from_update(self, mock_db, mock_post, mock_log_action):
+        mock_db.session.execute.side_effect = [
+            MagicMock(rowcount=1, lastrowid=8),   # post.like
+            MagicMock(rowcount=1, lastrowid=10),  # likes
+            MagicMock(rowcount=1),                # post_likes
+        ]
+        result = self.post_manager.like_post(1, 2)
+        self.assertEqual(result, {'success': True, 'message': 'Post liked successfully', 'new_count': 8})
+        mock_post.query.get.assert_not_called()
+        mock_log_action.assert_called_once()
+        mock_db.session.commit.assert_called_once()
+
+    ## A duplicate like is ignored by the unique key and rolled back
+    @patch("managers.post_manager.db")
+    def test_duplicate_like(self, mock_db):
+        mock_db.session.execute.side_effect = [
+            MagicMock(rowcount=1, lastrowid=8), MagicMock(rowcount=1, lastrowid=10), MagicMock(rowcount=0)]
+        result = self.post_manager.like_post(1, 2)
+        self.assertTrue(result['already_liked'])
+        mock_db.session.rollback.assert_called_once()
+        mock_db.session.commit.assert_not_called()
+
+    ## A missing post is found by the count UPDATE, before anything is inserted
+    @patch("managers.post_manager.db")
+    def test_like_missing_post(self, mock_db):
+        mock_db.session.execute.side_effect = [MagicMock(rowcount=0)]
+        result = self.post_manager.like_post(1, 2)
+        self.assertEqual(result['error'], 'Post not found')
+        self.assertIn('UPDATE post', str(mock_db.session.execute.call_args_list[0][0][0]))
+        self.assertEqual(mock_db.session.execute.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from backend.profanity_helper import ProfanityMatcher, ReloadingProfanityMatcher, check_profanity
+
+class ProfanityMatcherTestCase(unittest.TestCase):
+    ## Whole words only, in any case
+    def test_whole_words(self):
+        self.assertTrue(check_profanity('you ass!'))
+        self.assertTrue(check_profanity('Good ASS'))
+        self.assertFalse(check_profanity('classic assessment, passing'))
+        self.assertFalse(check_profanity('hello world'))
+        self.assertFalse(check_profanity(''))
+
+    ## Phrases match across any whitespace, and leetspeak spellings match the plain word
+    def test_phrases_and_leetspeak(self):
+        self.assertTrue(check_profanity('an alabama  hot\npocket'))
+        self.assertTrue(check_profanity('a s s'))
+        self.assertTrue(check_profanity('what the 5h1t'))
+        self.assertTrue(check_profanity('@$$'))
+        self.assertFalse(check_profanity('x@$$'))
+
+    ## Editing the word list takes effect without a restart
+    def test_hot_reload(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'words.json')
+            with open(path, 'w') as f:
+                json.dump(['darn'], f)
+            matcher = ReloadingProfanityMatcher(path, reload_interval=0)
+            self.assertTrue(matcher.matches('darn it'))
+            self.assertFalse(matcher.matches('heck'))
+            with open(path, 'w') as f:
+                json.dump(['heck'], f)
+            os.utime(path, (0, matcher._mtime + 1))
+            self.assertTrue(matcher.matches('heck'))
+            self.assertFalse(matcher.matches('darn it'))
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_empty_list(self):
+        self.assertFalse(ProfanityMatcher([]).matches('anything at all!'))
+
+if __name__ == '__main__':
+    unittest.main()
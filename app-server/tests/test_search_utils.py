@@ -0,0 +1,60 @@
+import unittest
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from backend.search_utils import (fulltext_query, like_prefix, visible_author_clause, can_see_posts,
+                                  forget_followed_authors)
+
+class SearchUtilsTestCase(unittest.TestCase):
+    ## Every word becomes a required phrase, so each must appear as a substring
+    def test_fulltext_query_requires_each_word(self):
+        self.assertEqual(fulltext_query('Beach Sunset'), '+"beach" +"sunset"')
+
+    ## Boolean-mode operators typed by users are dropped, not interpreted
+    def test_fulltext_query_strips_operators(self):
+        self.assertEqual(fulltext_query('-sun* +"x" (beach)'), '+"sun" +"beach"')
+
+    ## Queries with no word long enough for the ngram index fall back to a prefix search
+    def test_short_query_has_no_fulltext(self):
+        self.assertIsNone(fulltext_query('a'))
+        self.assertEqual(like_prefix('50%_a'), '50\\%\\_a%')
+
+class VisibleAuthorsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.execute(text("CREATE TABLE user (userId INTEGER PRIMARY KEY, visibility VARCHAR(20))"))
+        db.session.execute(text("CREATE TABLE followers (followerUserId INT, followedUserId INT, status VARCHAR(20))"))
+        # 1 is the viewer; 2 public, 3 followers-only and followed, 4 followers-only with a pending request, 5 private
+        for user_id, visibility in [(1, 'Private'), (2, 'Public'), (3, 'FollowersOnly'), (4, 'FollowersOnly'), (5, 'Private')]:
+            db.session.execute(text("INSERT INTO user VALUES (:id, :visibility)"), {"id": user_id, "visibility": visibility})
+        db.session.execute(text("INSERT INTO followers VALUES (1, 3, 'accepted'), (1, 4, 'pending'), (1, 5, 'accepted')"))
+        db.session.commit()
+        forget_followed_authors(1)
+
+    def tearDown(self):
+        forget_followed_authors(1)
+        db.session.remove()
+        self.ctx.pop()
+
+    def visible_ids(self, viewer_id):
+        clause = visible_author_clause(viewer_id, 'u.userId', 'u.visibility')
+        rows = db.session.execute(text(f"SELECT u.userId FROM user u WHERE {clause} ORDER BY u.userId"),
+                                  {"viewer_id": viewer_id})
+        return [row.userId for row in rows]
+
+    ## The viewer sees public authors, themselves and followers-only authors who accepted them
+    def test_visible_authors(self):
+        self.assertEqual(self.visible_ids(1), [1, 2, 3])
+        self.assertEqual([user_id for user_id in range(1, 6) if can_see_posts(1, user_id, db.session.execute(
+            text("SELECT visibility FROM user WHERE userId = :id"), {"id": user_id}).scalar())], [1, 2, 3])
+
+    ## Anonymous viewers only see public authors
+    def test_anonymous_viewer(self):
+        self.assertEqual(self.visible_ids(None), [2])
+
+if __name__ == '__main__':
+    unittest.main()
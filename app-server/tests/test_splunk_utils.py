@@ -0,0 +1,62 @@
+import unittest, json, threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from backend.splunk_utils import SplunkShipper
+
+class FakeHECHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        self.server.requests.append((self.headers['Authorization'], body))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+class SplunkShipperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeHECHandler)
+        self.server.requests = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/services/collector'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    ## Events are sent in multi-event batches and flushed on close
+    def test_batches_events(self):
+        shipper = SplunkShipper(self.url, 'token', batch_size=5, flush_interval=10)
+        for i in range(12):
+            shipper.enqueue({'event': {'n': i}})
+        shipper.close()
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[0][0], 'Splunk token')
+        events = [json.loads(line)['event']['n'] for _, body in self.server.requests for line in body.split('\n')]
+        self.assertEqual(events, list(range(12)))
+        self.assertEqual(shipper.sent, 12)
+
+    ## Server errors are retried
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 503]
+        shipper = SplunkShipper(self.url, 'token', batch_size=2, flush_interval=10, backoff=0.01)
+        shipper.enqueue({'event': 'a'})
+        shipper.enqueue({'event': 'b'})
+        shipper.close()
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(shipper.sent, 2)
+
+    ## The oldest events are dropped when the buffer is full
+    def test_drop_oldest(self):
+        shipper = SplunkShipper(self.url, 'token', queue_size=3, batch_size=100, flush_interval=10)
+        for i in range(5):
+            shipper.enqueue({'event': i})
+        shipper.close()
+        self.assertEqual(shipper.dropped, 2)
+        self.assertEqual([json.loads(line)['event'] for line in self.server.requests[0][1].split('\n')], [2, 3, 4])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from datetime import datetime, timezone
+from backend.timeline_store import LocalTimelineBackend, to_score
+
+class LocalTimelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = LocalTimelineBackend()
+
+    ## Entries come back newest first and respect the score bound
+    def test_entries_newest_first(self):
+        self.store.add_many('timeline:public', [(1, 10.0), (2, 20.0), (3, 30.0)])
+        self.assertEqual(self.store.entries('timeline:public'), [(3, 30.0), (2, 20.0), (1, 10.0)])
+        self.assertEqual(self.store.entries('timeline:public', max_score=20.0, limit=1), [(2, 20.0)])
+
+    ## Re-adding a post replaces it and removal drops it from every key
+    def test_add_and_remove(self):
+        self.store.add_many('timeline:public', [(5, 50.0)])
+        self.store.add_many('timeline:inbox:1', [(5, 50.0)])
+        self.store.add_many('timeline:public', [(5, 55.0)])
+        self.assertEqual(self.store.entries('timeline:public'), [(5, 55.0)])
+        self.store.remove(['timeline:public', 'timeline:inbox:1'], [5])
+        self.assertEqual(self.store.entries('timeline:public'), [])
+        self.assertEqual(self.store.entries('timeline:inbox:1'), [])
+
+    ## Naive MySQL timestamps are treated as UTC
+    def test_score_naive_is_utc(self):
+        naive = datetime(2025, 7, 10, 12, 0, 0)
+        aware = naive.replace(tzinfo=timezone.utc)
+        self.assertEqual(to_score(naive), to_score(aware))
+
+if __name__ == '__main__':
+    unittest.main()
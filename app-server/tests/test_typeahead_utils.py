@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backend.typeahead_utils import UsernameTrie, UsernameTypeahead
+
+class UsernameTrieTestCase(unittest.TestCase):
+    def setUp(self):
+        self.trie = UsernameTrie()
+        for user_id, username in enumerate(['bob', 'Alice', 'alicia', 'al', 'bobby', 'alex'], start=1):
+            self.trie.add(user_id, username, f'/media/{user_id}.png')
+
+    ## Completions come in name order, case-insensitively, up to the limit
+    def test_complete(self):
+        self.assertEqual([name for _, name, _, _ in self.trie.complete('AL', 10)], ['al', 'alex', 'Alice', 'alicia'])
+        self.assertEqual([name for _, name, _, _ in self.trie.complete('al', 2)], ['al', 'alex'])
+        self.assertEqual(self.trie.complete('bob', 1), [(1, 'bob', '/media/1.png', 'Public')])
+        self.assertEqual(self.trie.complete('carol', 5), [])
+
+    ## Renamed and deleted users stop matching their old names
+    def test_rename_and_remove(self):
+        self.trie.add(5, 'robert')  # was bobby
+        self.trie.remove(2)
+        self.assertEqual([name for _, name, _, _ in self.trie.complete('b', 5)], ['bob'])
+        self.assertEqual([name for _, name, _, _ in self.trie.complete('ali', 5)], ['alicia'])
+        self.assertEqual(self.trie.complete('rob', 5), [(5, 'robert', '', 'Public')])
+        compacted = self.trie.compacted()
+        self.assertLess(len(compacted.label), len(self.trie.label))
+        self.assertEqual(compacted.complete('', 10), self.trie.complete('', 10))
+
+class UsernameTypeaheadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'usernames.trie')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    ## A fresh snapshot is loaded as-is, without reading the user table
+    def test_load_snapshot(self):
+        trie = UsernameTrie()
+        trie.add(7, 'latergrammer', '/media/7.png', 'FollowersOnly')
+        trie.save(self.path, '0-0')
+        typeahead = UsernameTypeahead(self.path)
+        self.assertIsNone(typeahead.complete('later'))
+        typeahead.load()
+        self.assertEqual(typeahead.complete('LATER'), [(7, 'latergrammer', '/media/7.png', 'FollowersOnly')])
+        typeahead.record(8, 'laterbird')
+        typeahead.forget(7)
+        self.assertEqual(typeahead.complete('later'), [(8, 'laterbird', '', 'Public')])
+
+if __name__ == '__main__':
+    unittest.main()
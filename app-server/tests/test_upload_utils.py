@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from flask import Flask
+from models import db, StoredImage
+from backend.blob_utils import release_image, content_hash
+from backend.storage_utils import LocalStorage
+from backend.upload_utils import UploadPipeline
+
+class BlockingStorage(LocalStorage):
+    """Holds uploads of one key until released, so a later upload can overtake it"""
+    def __init__(self, root, blocked_key):
+        super().__init__(root, '/media/')
+        self.release = threading.Event()
+        self.blocked_key = blocked_key
+
+    def put(self, key, file, content_type):
+        if key == self.blocked_key:
+            self.release.wait(5)
+        return super().put(key, file, content_type)
+
+class UploadPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        # A file rather than an in-memory database, so each worker thread gets its own connection
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(self.root, "uploads.db")}'
+        db.init_app(self.app)
+        self.ctx = self.app.test_request_context()
+        self.ctx.push()
+        StoredImage.__table__.create(db.engine)
+        self.attached = []
+
+    def tearDown(self):
+        db.session.remove()
+        self.ctx.pop()
+        shutil.rmtree(self.root)
+
+    def attach(self, url):
+        self.attached.append(url)
+        return True
+
+    ## The file is stored in the background and attached to its target
+    def test_upload_and_attach(self):
+        pipeline = UploadPipeline(LocalStorage(self.root, '/media/'), workers=1)
+        url = pipeline.submit(io.BytesIO(b'image bytes'), 'posts/a.png', 'image/png', ('post', 1), self.attach).result(5)
+        self.assertEqual(url, '/media/posts/a.png')
+        self.assertEqual(self.attached, [url])
+        with open(os.path.join(self.root, 'posts', 'a.png'), 'rb') as stored:
+            self.assertEqual(stored.read(), b'image bytes')
+
+    ## Uploads whose target is gone are deleted again
+    def test_orphaned_upload_deleted(self):
+        pipeline = UploadPipeline(LocalStorage(self.root, '/media/'), workers=1, run_async=False)
+        future = pipeline.submit(io.BytesIO(b'x'), 'posts/b.png', 'image/png', ('post', 2), lambda url: False)
+        self.assertIsNone(future.result())
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'posts', 'b.png')))
+
+    ## A slower, older upload doesn't replace a newer one for the same target
+    def test_superseded_upload_discarded(self):
+        storage = BlockingStorage(self.root, 'profile_pics/old.png')
+        pipeline = UploadPipeline(storage, workers=2)
+        first = pipeline.submit(io.BytesIO(b'old'), 'profile_pics/old.png', 'image/png', ('profile', 1), self.attach)
+        second = pipeline.submit(io.BytesIO(b'new'), 'profile_pics/new.png', 'image/png', ('profile', 1), self.attach)
+        self.assertEqual(second.result(5), '/media/profile_pics/new.png')
+        storage.release.set()
+        self.assertIsNone(first.result(5))
+        self.assertEqual(self.attached, ['/media/profile_pics/new.png'])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'profile_pics', 'old.png')))
+
+    ## Identical content is stored once and deleted only when its last reference is released
+    def test_duplicate_upload_shares_object(self):
+        storage = LocalStorage(self.root, '/media/')
+        pipeline = UploadPipeline(storage, workers=1, run_async=False)
+        key = f"posts/{content_hash(io.BytesIO(b'meme'))}.png"
+        first = pipeline.submit(io.BytesIO(b'meme'), key, 'image/png', ('post', 1), self.attach).result()
+        second = pipeline.submit(io.BytesIO(b'meme'), key, 'image/png', ('post', 2), self.attach).result()
+        self.assertEqual(first, second)
+        self.assertEqual(pipeline.deduplicated, 1)
+        self.assertEqual(db.session.get(StoredImage, key).refCount, 2)
+
+        path = os.path.join(self.root, key)
+        self.assertFalse(release_image(key, storage))
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(release_image(key, storage))
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(db.session.get(StoredImage, key))
+
+    ## A failed upload calls on_failure instead of attaching, and takes no reference
+    def test_failed_upload_calls_on_failure(self):
+        def broken(file, key):
+            raise OSError("cannot decode image")
+        pipeline = UploadPipeline(LocalStorage(self.root, '/media/'), workers=1, run_async=False)
+        failed = []
+        future = pipeline.submit(io.BytesIO(b'x'), 'posts/c.png', 'image/png', ('post', 3), self.attach,
+                                 processor=broken, on_failure=lambda: failed.append(3))
+        self.assertIsNone(future.result())
+        self.assertEqual((failed, self.attached, pipeline.failures), ([3], [], 1))
+        self.assertIsNone(db.session.get(StoredImage, 'posts/c.png'))
+
+    ## Keys can't escape the storage directory
+    def test_local_storage_rejects_traversal(self):
+        with self.assertRaises(ValueError):
+            LocalStorage(self.root).put('../escape.png', io.BytesIO(b'x'), 'image/png')
+
+if __name__ == '__main__':
+    unittest.main()